@@ -8,7 +8,6 @@ if __package__ is None:
 
 
 import asyncio
-import json
 import argparse
 import importlib
 
@@ -25,8 +24,10 @@ from ptpython.repl import embed, PythonRepl
 from ptpython.prompt_style import PromptStyle
 
 
+from porthouse.core.codecs import get_codec
 from porthouse.core.config import load_globals, cfg_path
 from porthouse.core.rpc_async import amqp_connect, send_rpc_request
+from porthouse.core.interface import ModuleInterface
 
 
 def configure(repl: PythonRepl):
@@ -81,7 +82,7 @@ async def logger() -> None:
         Print received message to stdout.
         """
         try:
-            entry = json.loads(message.body)
+            entry = get_codec(message.header.properties.content_type).decode(message.body)
         except:
             return
 
@@ -99,6 +100,17 @@ async def logger() -> None:
     await channel.queue_bind(log_queue, exchange="log", routing_key="*")
 
 
+def module(exchange: str = None, prefix: str = None, module_name: str = None) -> ModuleInterface:
+    """
+    Get interface for the standard commands (metrics, profiling) of any module.
+
+    Example:
+        module("tracking", "tle").profile_start()
+        module(module_name="LogServer").metrics()
+    """
+    return ModuleInterface(exchange, prefix, module_name)
+
+
 async def run_repl() -> None:
     """
     Coroutine for running the Python REPL
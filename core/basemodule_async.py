@@ -2,20 +2,29 @@
 BaseModule is the base class for all the mission control software modules.
 """
 
+import os
 from os.path import join as path_join
+import re
+import time
 import asyncio
 from concurrent.futures import TimeoutError as AsyncIOTimeoutError
-import json
 import uuid
-import datetime
 import logging
 import logging.handlers
-from typing import Optional, Union
+from queue import SimpleQueue
+from typing import Any, Dict, Hashable, Optional, Sequence, Tuple, Union
 from .config import load_globals
 import aiormq
 import aiormq.abc
 
+from .codecs import CodecError, get_codec, json_formatter, DEFAULT_CONTENT_TYPE
 from .log.amqp_handler_async import AMQPLogHandler
+from .metrics import Metrics, SIZE_BUCKETS
+from .watchdog import LoopWatchdog
+from .profiler import ModuleProfiler
+from .publisher import PublishPipeline
+from .rpc_cache import RPCCache
+from .rpc_dispatcher import RPCDispatcher
 
 
 # Define what is being imported by default
@@ -33,6 +42,9 @@ __all__ = [
 #global amqp_queues, amqp_binds
 amqp_queues, amqp_binds = {}, {}
 
+# Matches the standard RPC part (e.g. "rpc.metrics") of a possibly prefixed request name
+BUILTIN_RPC_RE = re.compile(r"^(?:.*?\.)?(rpc\..+)$")
+
 
 class RPCError(Exception):
     """
@@ -50,21 +62,24 @@ class RPCRequestTimeout(Exception):
     """
 
 
-def json_formatter(obj):
-    """
-        Formatter function for json.dumps
-    """
-    if isinstance(obj, datetime.datetime):
-        #return obj.timestamp()
-        return obj.isoformat()
-    return obj
-
-
 class BaseModule:
     """
         The BaseModule
     """
 
+    # Standard RPC requests handled by every module: request name -> method name.
+    # Served on the module's own RPC bindings and as "<module_name>.rpc.<name>" on the "event" exchange.
+    builtin_rpcs = {
+        "rpc.metrics": "_builtin_metrics",
+        "rpc.profile.start": "_builtin_profile_start",
+        "rpc.profile.stop": "_builtin_profile_stop",
+        "rpc.profile.dump": "_builtin_profile_dump",
+        "rpc.ready": "_builtin_ready",
+    }
+
+    # If false, the module is not reported ready after start() but only after calling set_ready()
+    ready_on_start = True
+
     def __init__(self,
                  amqp_url: str,
                  prefix: str = None,
@@ -72,6 +87,15 @@ class BaseModule:
                  module_name: str = None,
                  autocreate: bool = True,
                  debug: bool = False,
+                 publish_pipeline: Union[bool, Dict[str, Any], None] = None,
+                 rpc_dispatcher: Optional[Dict[str, Any]] = None,
+                 content_type: str = DEFAULT_CONTENT_TYPE,
+                 rpc_cache: Union[bool, Dict[str, Any], None] = True,
+                 metrics: Union[bool, Dict[str, Any], None] = True,
+                 watchdog: Union[bool, Dict[str, Any], None] = None,
+                 amqp_connection: Optional[aiormq.abc.AbstractConnection] = None,
+                 heartbeat_interval: Optional[float] = None,
+                 amqp_log: Union[bool, Dict[str, Any]] = True,
                  **kwarg):
         """
         Initialize the Module.
@@ -85,6 +109,24 @@ class BaseModule:
                 If not defined the used name is same as the name of the class.
             autocreate: If true
             debug: If true additional debug features, such as log debug prints, are turned on.
+            publish_pipeline: If true or a dict of PublishPipeline options, published messages
+                are buffered and flushed to the broker in batches.
+            rpc_dispatcher: Optional dict of RPCDispatcher options (max_workers, concurrency, handlers)
+            content_type: Content type (codec) used to encode outgoing messages and RPC requests.
+                Incoming messages are always decoded based on their own content type.
+            rpc_cache: If true or a dict of RPCCache options (ttl, invalidate), responses of
+                idempotent outgoing RPC requests are cached. False disables the cache.
+            metrics: If true or a dict of options (publish_interval, lag_interval), handler latencies,
+                message sizes and event loop lag are collected. If publish_interval is given,
+                the metrics are published periodically to the "metrics" exchange.
+            watchdog: If true or a dict of LoopWatchdog options (threshold, interval, window)
+                plus optional publish_interval, the event loop is monitored for blocking callbacks.
+            amqp_connection: Existing AMQP connection shared with other modules running in the same
+                process. The module opens its own channel on it. If not given, a new connection is opened.
+            heartbeat_interval: If given, a heartbeat including the module's readiness is published
+                to the "event" exchange with this interval and whenever the readiness changes.
+            amqp_log: If true or a dict of AMQPLogHandler options (queue_size, batch_size, rate_limit,
+                rate_period, collapse_repeated), log records are published to the "log" exchange.
             kwargs: Extra configurations
         """
 
@@ -93,18 +135,46 @@ class BaseModule:
         self.autocreate = autocreate
         self.log = None
         self.log_path = log_path
+        self.amqp_log_options = amqp_log
+        self.amqp_log_handler: Optional[AMQPLogHandler] = None
+        self.log_listener: Optional[logging.handlers.QueueListener] = None
         self.module_name = module_name
+        self.codec = get_codec(content_type)
 
         # State variables for RPC calls
         self.rpc_futures = {}
         self.rpc_response_queue = None
+        self.rpc_dispatcher = RPCDispatcher(**(rpc_dispatcher or {}))
+        self.rpc_cache_options = rpc_cache
+        self.rpc_cache: Optional[RPCCache] = None
+        self.cache_channel = None
+
+        # Built-in metrics
+        self.metrics_options = metrics if isinstance(metrics, dict) else {}
+        self.metrics: Optional[Metrics] = Metrics() if metrics else None
+
+        # Optional event loop watchdog
+        self.watchdog_options = watchdog
+        self.watchdog: Optional[LoopWatchdog] = None
+
+        # Optional batched publishing
+        self.publish_pipeline_options = publish_pipeline
+        self.publisher: Optional[PublishPipeline] = None
+
+        self.amqp_url = amqp_url
+        self.connection = amqp_connection
+        self.channel = None
+        self.started = False
+        self._owns_connection = amqp_connection is None
+        self._tasks = []
+
+        # Readiness
+        self.ready = False
+        self.heartbeat_interval = heartbeat_interval
+        self._ready_changed = asyncio.Event()
 
         # Run async connection before returning
-        if amqp_url is None:
-            amqp_url = load_globals()["amqp_url"]
-        asyncio.get_event_loop().run_until_complete(self.__connect(amqp_url))
-
-        #asyncio.get_event_loop().create_task(self.heartbeat_task(10))
+        asyncio.get_event_loop().run_until_complete(self.start())
 
 
     def run(self):
@@ -112,39 +182,182 @@ class BaseModule:
         Start the async loop
         """
         loop = asyncio.get_event_loop()
-        loop.run_forever()
+        try:
+            loop.run_forever()
+        finally:
+            loop.run_until_complete(self.stop())
 
 
-    async def __connect(self, amqp_url):
+    async def start(self):
         """
-        AMQP connection coroutine. Called automatically by the __init__.
-
-        Args:
-            amqp_url: AMQP server URL
+        Connect to the AMQP broker, create the log handlers and autocreate the queues.
+        Called automatically by the __init__. Calling it again has no effect.
         """
+        if self.started:
+            return
 
         # Init AMQP
-        self.connection = await aiormq.connect(amqp_url)
+        if self.connection is None:
+            amqp_url = self.amqp_url if self.amqp_url is not None else load_globals()["amqp_url"]
+            self.connection = await aiormq.connect(amqp_url)
         self.channel = await self.connection.channel()
 
         # Init logging
         if self.module_name is None:
             self.module_name = str(self.__class__.__name__)
         self.create_log_handlers(self.log_path, self.module_name)
+        self.profiler = ModuleProfiler(self.log_path, self.module_name)
+
+        if self.publish_pipeline_options:
+            options = self.publish_pipeline_options if isinstance(self.publish_pipeline_options, dict) else {}
+            self.publisher = PublishPipeline(self.channel, log=self.log, **options)
+            self.publisher.start()
+
+        if self.rpc_cache_options:
+            options = self.rpc_cache_options if isinstance(self.rpc_cache_options, dict) else {}
+            self.rpc_cache = RPCCache(subscriber=self.__subscribe_cache_invalidation, log=self.log, **options)
 
         if self.autocreate:
             await self.__autocreate_queues()
+        await self.__bind_builtin_rpcs()
+
+        if self.metrics is not None:
+            lag_interval = self.metrics_options.get("lag_interval", 1.0)
+            if lag_interval:
+                self.__create_task(self.__loop_lag_task(lag_interval), "loop_lag")
+            publish_interval = self.metrics_options.get("publish_interval")
+            if publish_interval:
+                self.__create_task(self.__metrics_publish_task(publish_interval), "metrics")
+
+        if self.watchdog_options:
+            options = dict(self.watchdog_options) if isinstance(self.watchdog_options, dict) else {}
+            publish_interval = options.pop("publish_interval", None)
+            self.watchdog = LoopWatchdog(log=self.log, metrics=self.metrics, **options)
+            self.watchdog.start()
+            if publish_interval:
+                self.__create_task(self.__watchdog_publish_task(publish_interval), "watchdog")
+
+        if self.heartbeat_interval:
+            self.__create_task(self.heartbeat_task(self.heartbeat_interval), "heartbeat")
 
         # Init done
+        self.started = True
         self.log.info("Module  %r started!", self.module_name)
+        if self.ready_on_start:
+            self.set_ready()
 
 
-    async def heartbeat_task(self, interval):
+    async def stop(self, timeout: float = 5):
         """
-            Heartbeat task transmits
+        Stop the module's background tasks, flush the pending publishes and close the AMQP channel.
+        The connection is closed only if it's not shared with other modules.
+
+        Args:
+            timeout: Maximum time in seconds to wait for the pending publishes
         """
+        if not self.started:
+            return
+        self.started = False
+
+        if self.watchdog is not None:
+            self.watchdog.stop()
+            self.watchdog = None
+
+        for task in self._tasks:
+            task.cancel()
+        self._tasks = []
+
+        if self.publisher is not None:
+            try:
+                await self.publisher.stop(timeout)
+            except asyncio.TimeoutError:
+                self.log.warning("Pending messages not confirmed before stopping")
+            self.publisher = None
+
+        self.log.info("Module %r stopped", self.module_name)
+        await self.close_log_handlers()
+
+        for channel in (self.cache_channel, self.channel):
+            if channel is not None and not channel.is_closed:
+                await channel.close()
+        self.cache_channel = None
+        self.rpc_response_queue = None
+
+        if self._owns_connection and self.connection is not None:
+            await self.connection.close()
+            self.connection = None
+
+
+    def __create_task(self, coro, name: str) -> asyncio.Task:
+        """
+        Create a background task which is cancelled when the module is stopped.
+        """
+        task = asyncio.get_event_loop().create_task(coro, name=f"{self.module_name}.{name}")
+        task.add_done_callback(self.task_done_handler)
+        self._tasks.append(task)
+        return task
+
+
+    def set_ready(self, ready: bool = True) -> None:
+        """
+        Set the module's readiness reported by the rpc.ready request and the heartbeat.
+        Modules which need to load something before they can serve requests shall set
+        ready_on_start to false and call this once they are ready.
+        """
+        if ready != self.ready:
+            self.ready = ready
+            self._ready_changed.set()
+            if ready:
+                self.log.info("Module %r ready", self.module_name)
+
+
+    async def heartbeat_task(self, interval: float):
+        """
+        Heartbeat task publishes the module's readiness to the "event" exchange
+        with routing key "heartbeat.<module_name>" periodically and when the readiness changes.
+        """
+        await self.channel.exchange_declare("event", exchange_type="topic", durable=True, auto_delete=False)
         while True:
-            await self.publish("heartbeat", bool(self.module_name))
+            self._ready_changed.clear()
+            await self.publish({
+                "module": self.module_name,
+                "prefix": self.prefix,
+                "ready": self.ready,
+                "pid": os.getpid(),
+                "time": time.time(),
+            }, exchange="event", routing_key=f"heartbeat.{self.module_name}")
+
+            try:
+                await asyncio.wait_for(self._ready_changed.wait(), interval)
+            except asyncio.TimeoutError:
+                pass
+
+
+    async def wait_for_ready(self, exchange: str, prefix: str = "", timeout: float = 60, interval: float = 1) -> None:
+        """
+        Wait until a remote module reports it's ready via the standard rpc.ready request.
+
+        Args:
+            exchange: Exchange where the remote module's RPC handlers are bound
+            prefix: Routing key prefix of the remote module's RPCs (e.g. "tle" for tle.rpc.*)
+            timeout: Maximum time in seconds to wait
+            interval: Polling interval in seconds
+
+        Raises:
+            RPCRequestTimeout if the module didn't become ready in time.
+        """
+        routing_key = f"{prefix}.rpc.ready" if prefix else "rpc.ready"
+        loop = asyncio.get_event_loop()
+        deadline = loop.time() + timeout
+        while True:
+            try:
+                res = await self.send_rpc_request(exchange, routing_key, timeout=interval, cache=False)
+                if res.get("ready", False):
+                    return
+            except RPCRequestTimeout:
+                pass
+            if loop.time() >= deadline:
+                raise RPCRequestTimeout(f"{exchange}/{routing_key} not ready in {timeout} s")
             await asyncio.sleep(interval)
 
     async def __autocreate_queues(self):
@@ -163,6 +376,10 @@ class BaseModule:
             callback_func = getattr(self, callback.rsplit(".", 1)[1])
             assert(callable(callback_func))
 
+            # RPC handlers are instrumented by the RPC parser
+            if self.metrics is not None and not getattr(callback_func, "rpc_handler", False):
+                callback_func = self.__instrumented_consumer(callback.rsplit(".", 1)[1], callback_func)
+
             # Create queue
             inbox = await self.channel.queue_declare(queue_name, exclusive=True, auto_delete=True, durable=False)
             #await self.channel.basic_qos(prefetch_count=1, prefetch_size=0, connection_global=False)
@@ -178,6 +395,168 @@ class BaseModule:
                     await self.channel.queue_bind(inbox.queue, exchange=exchange, routing_key=routing_key)
 
 
+    async def __bind_builtin_rpcs(self):
+        """
+            Bind a queue for the standard RPC requests addressed with the module name
+            ("<module_name>.rpc.metrics" etc. on the "event" exchange) so that every module
+            answers them, also the modules without own RPC handlers.
+        """
+        await self.channel.exchange_declare("event", exchange_type="topic", durable=True, auto_delete=False)
+        declare_ok = await self.channel.queue_declare(exclusive=True, auto_delete=True)
+        await self.channel.basic_consume(declare_ok.queue, consumer_callback=self.__builtin_rpc_callback, no_ack=True)
+        await self.channel.queue_bind(declare_ok.queue, exchange="event", routing_key=f"{self.module_name}.rpc.#")
+
+
+    async def __builtin_rpc_callback(self, request: aiormq.abc.DeliveredMessage):
+        """
+            Execute a standard RPC request received to the module's builtin RPC queue.
+        """
+        request_name = request.delivery['routing_key'][len(self.module_name) + 1:]
+        try:
+            method = BaseModule.builtin_rpcs.get(request_name)
+            if method is None:
+                raise RPCError(f"Unknown standard request {request_name!r}")
+            try:
+                request_data = self.decode_message(request)
+            except CodecError as exc:
+                raise RPCError("Error while parsing message:\n%s\n%s" % (request.body, exc.args[0])) from exc
+
+            ret = await getattr(self, method)(request_name, request_data)
+            await self.send_rpc_response(request, ret if ret is not None else {})
+
+        except RPCError as exc:
+            self.log.error("RPCError: %s failed: %s", request.delivery['routing_key'], exc)
+            await self.send_rpc_response(request, { "error": "RPC Error: %s" % exc })
+
+        except Exception as exc:
+            self.log.error("RPC %s failed: Unhandled exception %r",
+                request.delivery['routing_key'], exc, exc_info=True)
+            await self.send_rpc_response(request, { "error": "Unhandled exception %r" % exc })
+
+
+    def __instrumented_consumer(self, name: str, callback):
+        """
+        Wrap a queue consumer callback to collect call counts, latencies and message sizes.
+        """
+        metrics = self.metrics
+
+        async def consumer(message: aiormq.abc.DeliveredMessage):
+            metrics.inc(f"queue.{name}.calls")
+            metrics.observe(f"queue.{name}.size", len(message.body), SIZE_BUCKETS)
+            start = time.perf_counter()
+            try:
+                ret = callback(message)
+                if asyncio.iscoroutine(ret):
+                    ret = await ret
+                return ret
+            except Exception:
+                metrics.inc(f"queue.{name}.errors")
+                raise
+            finally:
+                metrics.observe(f"queue.{name}.latency", time.perf_counter() - start)
+
+        return consumer
+
+
+    async def __loop_lag_task(self, interval: float):
+        """
+        Measure how much later than requested the event loop wakes up a sleeping task.
+        """
+        loop = asyncio.get_event_loop()
+        while True:
+            start = loop.time()
+            await asyncio.sleep(interval)
+            self.metrics.observe("loop.lag", max(0.0, loop.time() - start - interval))
+
+
+    async def __metrics_publish_task(self, interval: float):
+        """
+        Periodically publish the metrics snapshot to the "metrics" exchange.
+        """
+        await self.channel.exchange_declare("metrics", exchange_type="topic", durable=True, auto_delete=False)
+        while True:
+            await asyncio.sleep(interval)
+            await self.publish(self.metrics_snapshot(), exchange="metrics", routing_key=self.module_name)
+
+
+    async def __watchdog_publish_task(self, interval: float):
+        """
+        Periodically publish the event loop lag percentiles to the "metrics" exchange.
+        """
+        await self.channel.exchange_declare("metrics", exchange_type="topic", durable=True, auto_delete=False)
+        while True:
+            await asyncio.sleep(interval)
+            await self.publish({"module": self.module_name, **self.watchdog.stats()},
+                               exchange="metrics", routing_key=f"{self.module_name}.watchdog")
+
+
+    def metrics_snapshot(self) -> Dict[str, Any]:
+        """
+        Return the module's metrics including RPC dispatcher, publish pipeline and RPC cache statistics.
+        """
+        if self.metrics is None:
+            return {"module": self.module_name, "enabled": False}
+        return {
+            "module": self.module_name,
+            **self.metrics.snapshot(),
+            "rpc_handlers": self.rpc_stats(),
+            "publisher": self.publish_stats(),
+            "rpc_cache": self.rpc_cache_stats(),
+            "watchdog": self.watchdog.stats() if self.watchdog is not None else {"enabled": False},
+            "log": self.amqp_log_handler.stats() if self.amqp_log_handler is not None else {"enabled": False},
+        }
+
+
+    async def _builtin_metrics(self, request_name: str, request_data: dict):
+        """
+        Built-in rpc.metrics handler
+        """
+        return self.metrics_snapshot()
+
+
+    async def _builtin_ready(self, request_name: str, request_data: dict):
+        """
+        Built-in rpc.ready handler
+        """
+        return {"module": self.module_name, "ready": self.ready}
+
+
+    async def _builtin_profile_start(self, request_name: str, request_data: dict):
+        """
+        Built-in rpc.profile.start handler. Starts CPU (cProfile) and/or memory (tracemalloc) profiling.
+        """
+        try:
+            ret = self.profiler.start(cpu=request_data.get("cpu", True),
+                                      memory=request_data.get("memory", False),
+                                      frames=request_data.get("frames", 1))
+        except RuntimeError as exc:
+            raise RPCError(str(exc)) from exc
+        self.log.info("Profiling started: %r", ret)
+        return ret
+
+
+    async def _builtin_profile_stop(self, request_name: str, request_data: dict):
+        """
+        Built-in rpc.profile.stop handler. Stops profiling and returns the top-N summary.
+        """
+        try:
+            ret = self.profiler.stop(top=request_data.get("top", 20), sort=request_data.get("sort", "cumulative"))
+        except RuntimeError as exc:
+            raise RPCError(str(exc)) from exc
+        self.log.info("Profiling stopped. Results written to %s", self.log_path)
+        return ret
+
+
+    async def _builtin_profile_dump(self, request_name: str, request_data: dict):
+        """
+        Built-in rpc.profile.dump handler. Writes the results so far and returns the top-N summary.
+        """
+        try:
+            return self.profiler.dump(top=request_data.get("top", 20), sort=request_data.get("sort", "cumulative"))
+        except RuntimeError as exc:
+            raise RPCError(str(exc)) from exc
+
+
     def prefixed(self, routing_key: str = "") -> str:
         """
         Return prefixed version of give routing_key.
@@ -185,7 +564,7 @@ class BaseModule:
         return "%s.%s" % (self.prefix, routing_key) if self.prefix else routing_key
 
 
-    async def publish(self, msg, prefixed: bool = False, **kwargs) -> None:
+    async def publish(self, msg, prefixed: bool = False, **kwargs) -> Optional[asyncio.Future]:
         """
         Publish a message to AMQP exchange
 
@@ -193,14 +572,55 @@ class BaseModule:
             msg: Message to be send.
             prefixed: Is the routing_key prefixed
             kwargs: should include routing_key and exchange.
+
+        Returns:
+            If the publish pipeline is enabled, a future which is resolved
+            when the broker has confirmed the message. Otherwise None.
         """
         if prefixed and self.prefix:
             kwargs["routing_key"] = "%s.%s" % (self.prefix, kwargs["routing_key"])
 
-        if isinstance(msg, dict):
-            msg = json.dumps(msg, default=json_formatter).encode("ascii")
+        if isinstance(msg, (dict, list)):
+            msg, content_type = self.encode_message(msg)
+            if "properties" not in kwargs:
+                kwargs["properties"] = aiormq.spec.Basic.Properties(content_type=content_type)
+
+        if self.publisher is not None:
+            return await self.publisher.publish(msg, **kwargs)
 
         await self.channel.basic_publish(msg, **kwargs)
+        return None
+
+
+    async def flush_published(self, timeout: Optional[float] = None) -> None:
+        """
+        Wait until all the messages published via the publish pipeline have been
+        confirmed by the broker. Returns immediately if the pipeline is not enabled.
+
+        Args:
+            timeout: Maximum time in seconds to wait
+
+        Raises:
+            asyncio.TimeoutError if the messages were not confirmed in time.
+        """
+        if self.publisher is not None:
+            await self.publisher.flush(timeout)
+
+
+    def publish_stats(self) -> Dict[str, Any]:
+        """
+        Return publish pipeline statistics such as per-exchange queue depth and flush latency.
+        """
+        if self.publisher is None:
+            return {"enabled": False}
+        return {"enabled": True, **self.publisher.stats()}
+
+
+    def rpc_stats(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Return per-handler queue-wait and execution-time statistics of the incoming RPCs.
+        """
+        return self.rpc_dispatcher.stats()
 
 
     def create_log_handlers(self, log_path: str, module_name: str):
@@ -216,27 +636,55 @@ class BaseModule:
         self.log.setLevel(logging.INFO)
 
         # AMQP log handler
-        amqp_handler = AMQPLogHandler(module_name, self.channel)
-        amqp_handler.setLevel(logging.INFO)
-        self.log.addHandler(amqp_handler)
+        if self.amqp_log_options:
+            options = self.amqp_log_options if isinstance(self.amqp_log_options, dict) else {}
+            self.amqp_log_handler = AMQPLogHandler(module_name, self.channel, **options)
+            self.amqp_log_handler.setLevel(logging.INFO)
+            self.amqp_log_handler.start()
+            self.log.addHandler(self.amqp_log_handler)
 
         # File log handler
         log_file = path_join(log_path, module_name + ".log")
         formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
         file_handler = logging.handlers.RotatingFileHandler(log_file, maxBytes=int(2e6), backupCount=5)
         file_handler.setFormatter(formatter)
-        self.log.addHandler(file_handler)
+        handlers = [ file_handler ]
 
         if True or self.debug:
             # Create stdout log handler
             stdout_handler = logging.StreamHandler()
             stdout_handler.setFormatter(formatter)
-            self.log.addHandler(stdout_handler)
+            handlers.append(stdout_handler)
+
+        # Write the file and stdout outside the event loop in a listener thread
+        log_queue = SimpleQueue()
+        self.log_listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+        self.log_listener.start()
+        self.log.addHandler(logging.handlers.QueueHandler(log_queue))
 
         if self.debug:
             self.log.setLevel(logging.DEBUG)
 
 
+    async def close_log_handlers(self) -> None:
+        """
+        Publish the remaining log records, stop the file log thread and remove the handlers.
+        """
+        if self.amqp_log_handler is not None:
+            await self.amqp_log_handler.stop()
+            self.log.removeHandler(self.amqp_log_handler)
+            self.amqp_log_handler = None
+
+        if self.log_listener is not None:
+            self.log_listener.stop()
+            for handler in list(self.log.handlers):
+                if isinstance(handler, logging.handlers.QueueHandler):
+                    self.log.removeHandler(handler)
+            for handler in self.log_listener.handlers:
+                handler.close()
+            self.log_listener = None
+
+
     def task_done_handler(self, task: asyncio.Task, cancelled_msg: Union[str, bool, None] = None):
         """
         Handle task done callback
@@ -250,6 +698,37 @@ class BaseModule:
             self.log.error(f"Task {task.get_name()} failed:", exc_info=True)
 
 
+    def encode_message(self, data: Any, content_type: Optional[str] = None) -> Tuple[bytes, str]:
+        """
+        Encode data using the codec of the given content type.
+
+        Args:
+            data: Data to be encoded
+            content_type: Content type. If not given the module's default codec is used.
+
+        Returns:
+            Tuple containing the encoded bytes and the used content type.
+        """
+        codec = self.codec if content_type is None else get_codec(content_type)
+        return codec.encode(data), codec.content_type
+
+
+    def decode_message(self, message: aiormq.abc.DeliveredMessage) -> Any:
+        """
+        Decode received AMQP message based on its content_type property.
+
+        Args:
+            message: Received message object
+
+        Returns:
+            Decoded message content
+
+        Raises:
+            CodecError if the message could not be decoded.
+        """
+        return get_codec(message.header.properties.content_type).decode(message.body)
+
+
     async def send_rpc_response(self, request: aiormq.abc.DeliveredMessage, data: dict):
         """
         Helper function to send a response to incoming RPC query.
@@ -267,15 +746,18 @@ class BaseModule:
         if "reply_to" not in request.header.properties:
             raise RuntimeError("RPC request missing the 'reply_to' -field")
 
-        if isinstance(data, (dict, list)):
-            data = json.dumps(data)
+        # Respond using the same codec as the request if possible
+        try:
+            codec = get_codec(request.header.properties.content_type)
+        except CodecError:
+            codec = get_codec()
 
         # Send response and ACK
         await self.channel.basic_publish(
-            data.encode(),
+            codec.encode(data),
             routing_key=request.header.properties.reply_to,
             properties=aiormq.spec.Basic.Properties(
-                content_type='text/plain',
+                content_type=codec.content_type,
                 correlation_id=request.header.properties.correlation_id
             )
         )
@@ -294,13 +776,43 @@ class BaseModule:
         corr_id = message.header.properties.correlation_id
         if corr_id in self.rpc_futures:
             future = self.rpc_futures.pop(corr_id)
-            future.set_result(message.body)
+            future.set_result(message)
         else:
             raise RuntimeError(
                 "Unknown correlation_id on RPC response queue! Possibly a late RPC response.")
 
 
-    async def send_rpc_request(self, exchange: str, routing_key: str, query_data: Optional[dict] = None, timeout: float = 1):
+    async def __subscribe_cache_invalidation(self, exchange: str, routing_key: str):
+        """
+        Start listening a broadcast which invalidates RPC cache entries.
+        A separate channel is used so that a failing bind won't close the main channel.
+        """
+        if self.cache_channel is None or self.cache_channel.is_closed:
+            self.cache_channel = await self.connection.channel()
+
+        async def invalidate(message: aiormq.abc.DeliveredMessage):
+            self.rpc_cache.handle_broadcast(exchange, routing_key)
+
+        try:
+            declare_ok = await self.cache_channel.queue_declare(exclusive=True, auto_delete=True)
+            await self.cache_channel.queue_bind(declare_ok.queue, exchange=exchange, routing_key=routing_key)
+            await self.cache_channel.basic_consume(declare_ok.queue, invalidate, no_ack=True)
+        except aiormq.exceptions.AMQPError:
+            self.cache_channel = None
+            raise
+
+
+    def rpc_cache_stats(self) -> Dict[str, Any]:
+        """
+        Return statistics of the outgoing RPC request cache.
+        """
+        if self.rpc_cache is None:
+            return {"enabled": False}
+        return {"enabled": True, **self.rpc_cache.stats()}
+
+
+    async def send_rpc_request(self, exchange: str, routing_key: str, query_data: Optional[dict] = None, timeout: float = 1,
+                               content_type: Optional[str] = None, cache: bool = True):
         """
         Send a RPC query to remote process and wait for response.
 
@@ -309,6 +821,72 @@ class BaseModule:
             routing_key: Routing key for the RPC request
             query_data: Data to be included to RPC request
             timeout: Requets timeout time in seconds
+            content_type: Content type used for the request. If not given the module's default is used.
+            cache: If false, the RPC cache is bypassed and the request is always sent.
+        """
+        if query_data is None:
+            query_data = {}
+
+        if cache and self.rpc_cache is not None:
+            return await self.rpc_cache.call(exchange, routing_key, query_data,
+                lambda: self.__send_rpc_request(exchange, routing_key, query_data, timeout, content_type))
+        return await self.__send_rpc_request(exchange, routing_key, query_data, timeout, content_type)
+
+
+    async def send_rpc_requests(self,
+            requests: Dict[Hashable, Sequence[Any]],
+            timeout: float = 1,
+            concurrency: int = 16,
+            content_type: Optional[str] = None,
+            cache: bool = True) -> Tuple[Dict[Hashable, Any], Dict[Hashable, Exception]]:
+        """
+        Send multiple RPC queries concurrently and wait for the responses under a shared deadline.
+
+        Args:
+            requests: Requests keyed by an arbitrary target identifier. Each request is a tuple of
+                (exchange, routing_key) or (exchange, routing_key, query_data).
+            timeout: Deadline in seconds for all of the requests
+            concurrency: Maximum number of requests in flight at the same time
+            content_type: Content type used for the requests. If not given the module's default is used.
+            cache: If false, the RPC cache is bypassed.
+
+        Returns:
+            Tuple of (results, errors) where results contains the responses of the successful
+            requests and errors the raised exceptions (e.g. RPCRequestTimeout) keyed by the target.
+        """
+        loop = asyncio.get_event_loop()
+        deadline = loop.time() + timeout
+        semaphore = asyncio.Semaphore(max(1, int(concurrency)))
+
+        async def request(exchange: str, routing_key: str, query_data: Optional[dict] = None):
+            async with semaphore:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    raise RPCRequestTimeout()
+                return await self.send_rpc_request(exchange, routing_key, query_data, timeout=remaining,
+                                                   content_type=content_type, cache=cache)
+
+        tasks = { target: loop.create_task(request(*spec)) for target, spec in requests.items() }
+        try:
+            if tasks:
+                await asyncio.wait(tasks.values())
+        finally:
+            for task in tasks.values():
+                task.cancel()
+
+        results, errors = {}, {}
+        for target, task in tasks.items():
+            if task.exception() is None:
+                results[target] = task.result()
+            else:
+                errors[target] = task.exception()
+        return results, errors
+
+
+    async def __send_rpc_request(self, exchange: str, routing_key: str, query_data: dict, timeout: float,
+                                 content_type: Optional[str]):
+        """
+        Send the RPC request without caching. See send_rpc_request().
         """
 
         # Create RPC response queue if it doesn't exist yet
@@ -317,12 +895,14 @@ class BaseModule:
             self.rpc_response_queue = declare_ok.queue
             await self.channel.basic_consume(self.rpc_response_queue, self.__rpc_response)
 
-        if query_data is None:
-            query_data = {}
+        # Encode the data
+        query_data, content_type = self.encode_message(query_data, content_type)
 
-        # JSON format the data
-        if isinstance(query_data, (dict, list)):
-            query_data = json.dumps(query_data)
+        metrics = self.metrics
+        if metrics is not None:
+            metrics.inc("rpc_client.requests")
+            metrics.observe("rpc_client.request_size", len(query_data), SIZE_BUCKETS)
+        start = time.perf_counter()
 
         try:
             # Create future for the RPC response
@@ -332,11 +912,11 @@ class BaseModule:
 
             # Send the RPC call
             await self.channel.basic_publish(
-                query_data.encode(),
+                query_data,
                 exchange=exchange,
                 routing_key=routing_key,
                 properties=aiormq.spec.Basic.Properties(
-                    content_type='text/plain',
+                    content_type=content_type,
                     correlation_id=corr_id,
                     reply_to=self.rpc_response_queue,
                 )
@@ -348,16 +928,21 @@ class BaseModule:
         try:
             # Wait until the future is fulfilled
             res = await asyncio.wait_for(future, timeout=timeout)
-            res = json.loads(res)
+            if metrics is not None:
+                metrics.observe("rpc_client.latency", time.perf_counter() - start)
+                metrics.observe("rpc_client.response_size", len(res.body), SIZE_BUCKETS)
+            res = self.decode_message(res)
 
             if "error" in res:
                 raise RPCRequestError(res["error"])
             return res
 
-        except ValueError as exc:
-            raise RPCRequestError("Failed to parse JSON RPC response!") from exc
+        except CodecError as exc:
+            raise RPCRequestError("Failed to parse RPC response!") from exc
 
         except AsyncIOTimeoutError as exc:
+            if metrics is not None:
+                metrics.inc("rpc_client.timeouts")
             raise RPCRequestTimeout() from exc
 
         finally:
@@ -410,12 +995,19 @@ def bind(exchange: str, routing_key: str, **kwargs):
     return decorator
 
 
-def rpc():
+def rpc(concurrency: Optional[int] = None, executor: bool = True):
     """
     RPC decorator to autocreate RPC queue and callback.
 
     Remarks:
         See examples about how to use the RPC decorator.
+
+    Args:
+        concurrency: Maximum number of concurrently executed requests for the handler.
+            If not given, the module's default limit is used.
+        executor: If true, a synchronous (non-async) handler is executed in the shared
+            thread pool instead of blocking the event loop. Set to false for handlers
+            which manipulate the event loop or other non-thread-safe state.
     """
 
     def decorator(callback):
@@ -428,24 +1020,32 @@ def rpc():
 
         # When the a message is received call the callback function via __rpc_parser
         def __rpc_wrapper(self, msg):
-            return __rpc_parser(self, callback, msg)
+            return __rpc_parser(self, callback, msg, concurrency, executor)
+        __rpc_wrapper.rpc_handler = True
         return __rpc_wrapper
 
     return decorator
 
 
-async def __rpc_parser(self, callback, request):
+async def __rpc_parser(self, callback, request, concurrency=None, executor=True):
     """
     Helper function used to parse incoming RPC request.
     """
 
+    metrics = self.metrics
+    name = callback.__name__
+    start = time.perf_counter()
+    if metrics is not None:
+        metrics.inc(f"rpc.{name}.calls")
+        metrics.observe(f"rpc.{name}.size", len(request.body), SIZE_BUCKETS)
+
     try:
 
-        # Try to parse JSON payload
+        # Try to parse the payload
         try:
-            request_data = json.loads(request.body)
-        except (ValueError, TypeError) as exc:
-            raise RPCError("Error while parsing json message:\n%s\n%s"
+            request_data = self.decode_message(request)
+        except CodecError as exc:
+            raise RPCError("Error while parsing message:\n%s\n%s"
                 % (request.body, exc.args[0])
             ) from exc
 
@@ -455,15 +1055,21 @@ async def __rpc_parser(self, callback, request):
         if self.prefix and request_name.startswith(self.prefix):
             request_name = request_name[len(self.prefix)+1:]
 
-        ret = callback(self, request_name, request_data)
-        if asyncio.iscoroutine(ret):
-            ret = await ret
+        # Standard RPCs provided by every module (e.g. rpc.metrics)
+        builtin = BUILTIN_RPC_RE.match(request_name)
+        if builtin and builtin.group(1) in BaseModule.builtin_rpcs:
+            ret = await getattr(self, BaseModule.builtin_rpcs[builtin.group(1)])(request_name, request_data)
+        else:
+            ret = await self.rpc_dispatcher.dispatch(name, callback, self, request_name, request_data,
+                                                     concurrency=concurrency, in_executor=executor)
         if ret is None:
             ret = {}
 
         await BaseModule.send_rpc_response(self, request, ret)
 
     except RPCError as exc:
+        if metrics is not None:
+            metrics.inc(f"rpc.{name}.errors")
         self.log.error("RPCError: %s failed: %s",
             request.delivery['routing_key'], exc, exc_info=True)
         await BaseModule.send_rpc_response(self, request, {
@@ -471,8 +1077,14 @@ async def __rpc_parser(self, callback, request):
         })
 
     except Exception as exc:
+        if metrics is not None:
+            metrics.inc(f"rpc.{name}.errors")
         self.log.error("RPC %s failed: Unhandled exception %r",
             request.delivery['routing_key'], exc, exc_info=True)
         await BaseModule.send_rpc_response(self, request, {
             "error": "Unhandled exception %r" % exc
         })
+
+    finally:
+        if metrics is not None:
+            metrics.observe(f"rpc.{name}.latency", time.perf_counter() - start)
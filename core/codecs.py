@@ -0,0 +1,162 @@
+"""
+    Message codecs for AMQP messages and RPCs.
+
+    Codecs are registered by the AMQP ``content_type`` property so that receivers
+    can decode any incoming message based on its content type. JSON is the default
+    codec. If the ``msgpack`` package is available, a compact binary codec which
+    carries raw ``bytes`` natively is registered as ``application/msgpack``.
+"""
+
+import json
+import datetime
+from typing import Any, Dict, Optional
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+
+__all__ = [
+    "Codec",
+    "CodecError",
+    "JSONCodec",
+    "MsgPackCodec",
+    "register_codec",
+    "get_codec",
+    "json_formatter",
+    "DEFAULT_CONTENT_TYPE",
+]
+
+DEFAULT_CONTENT_TYPE = "application/json"
+
+
+class CodecError(ValueError):
+    """
+        Message could not be encoded or decoded
+    """
+
+
+def json_formatter(obj):
+    """
+        Formatter function for json.dumps
+    """
+    if isinstance(obj, datetime.datetime):
+        #return obj.timestamp()
+        return obj.isoformat()
+    if isinstance(obj, (bytes, bytearray, memoryview)):
+        # JSON cannot carry binary so fallback to hex string
+        return bytes(obj).hex()
+    return obj
+
+
+class Codec:
+    """
+    Base class for the message codecs.
+    """
+
+    content_type: str = ""
+
+    def encode(self, obj: Any) -> bytes:
+        """
+        Serialize object to bytes.
+        """
+        raise NotImplementedError()
+
+    def decode(self, body: bytes) -> Any:
+        """
+        Deserialize object from bytes.
+        """
+        raise NotImplementedError()
+
+
+class JSONCodec(Codec):
+    """
+    JSON text codec. Binary values are hex encoded.
+    """
+
+    content_type = "application/json"
+
+    def encode(self, obj: Any) -> bytes:
+        if isinstance(obj, str):
+            return obj.encode()
+        return json.dumps(obj, default=json_formatter).encode()
+
+    def decode(self, body: bytes) -> Any:
+        try:
+            return json.loads(body)
+        except (ValueError, TypeError) as exc:
+            raise CodecError(f"Failed to parse JSON: {exc}") from exc
+
+
+class MsgPackCodec(Codec):
+    """
+    Compact binary codec based on MessagePack. Binary values are carried as raw bytes.
+    """
+
+    content_type = "application/msgpack"
+
+    def encode(self, obj: Any) -> bytes:
+        if msgpack is None:
+            raise CodecError("msgpack package is not installed")
+        return msgpack.packb(obj, default=self._default, use_bin_type=True)
+
+    def decode(self, body: bytes) -> Any:
+        if msgpack is None:
+            raise CodecError("msgpack package is not installed")
+        try:
+            return msgpack.unpackb(body, raw=False)
+        except (ValueError, TypeError, msgpack.ExtraData) as exc:
+            raise CodecError(f"Failed to parse MessagePack: {exc}") from exc
+
+    @staticmethod
+    def _default(obj):
+        if isinstance(obj, datetime.datetime):
+            return obj.isoformat()
+        if isinstance(obj, (bytearray, memoryview)):
+            return bytes(obj)
+        raise TypeError(f"Cannot serialize {type(obj)!r}")
+
+
+# Registered codecs by the content type
+codecs: Dict[str, Codec] = {}
+
+
+def register_codec(codec: Codec, *aliases: str) -> None:
+    """
+    Register a new codec.
+
+    Args:
+        codec: Codec instance
+        aliases: Additional content types decoded with the codec
+    """
+    codecs[codec.content_type] = codec
+    for alias in aliases:
+        codecs[alias] = codec
+
+
+def get_codec(content_type: Optional[str] = None) -> Codec:
+    """
+    Get codec for given content type.
+
+    Args:
+        content_type: AMQP content_type property. If not given the default codec is returned.
+
+    Returns:
+        Codec object
+
+    Raises:
+        CodecError if there's no codec for the content type.
+    """
+    if not content_type:
+        content_type = DEFAULT_CONTENT_TYPE
+    try:
+        return codecs[content_type]
+    except KeyError:
+        raise CodecError(f"No codec for content type {content_type!r}") from None
+
+
+# JSON is used also for messages which are sent as plain text (legacy senders)
+register_codec(JSONCodec(), "text/plain")
+if msgpack is not None:
+    register_codec(MsgPackCodec(), "application/x-msgpack")
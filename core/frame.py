@@ -1,72 +1,261 @@
 """
     This module holds the general implemenation for a Frame class which is used
-    to
+    to pass frames between the packet router, packet storage and the importers.
+
+    Besides the JSON dictionary representation (hex encoded data), a frame has a
+    compact binary wire format:
+
+        header (20 bytes, network byte order):
+            magic           2 bytes  b"PF"
+            version         uint8    FRAME_VERSION
+            flags           uint8    FLAG_* bits
+            timestamp       double   unix time, NaN if not set
+            metadata length uint32
+            payload length  uint32
+        metadata block      satellite, source and metadata dict encoded with
+                            MessagePack (FLAG_MSGPACK) or JSON
+        payload             raw frame data
+
+    Parsing a binary frame doesn't copy the payload; the frame data is a memoryview
+    into the received buffer.
 """
 
-from datetime import datetime
-from typing import Any, Dict, Optional
+import json
+import math
+import struct
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional, Tuple, Union
+
+from .codecs import Codec, CodecError, get_codec, register_codec, json_formatter
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+
+__all__ = [
+    "Frame",
+    "FrameCodec",
+    "FrameParsingError",
+    "FRAME_CONTENT_TYPE",
+]
+
+FRAME_CONTENT_TYPE = "application/x-porthouse-frame"
+FRAME_MAGIC = b"PF"
+FRAME_VERSION = 1
+FRAME_HEADER = struct.Struct("!2sBBdII")
 
-class FrameParsingError(Exception):
+FLAG_MSGPACK = 0x01  # Metadata block is MessagePack instead of JSON
+
+# Fields of the dictionary representation
+FRAME_FIELDS = frozenset(("satellite", "source", "timestamp", "data", "metadata"))
+
+
+class FrameParsingError(ValueError):
     """
-    Blaa
+    Frame could not be parsed
     """
 
+
 class Frame:
     """
-    General
+    General frame object carrying the frame data and its metadata.
     """
 
-    satellite: str
+    __slots__ = ("satellite", "source", "timestamp", "metadata", "data")
+
+    satellite: Optional[str]
     source: Optional[str]
     timestamp: Optional[datetime]
     metadata: Dict[str, Any]
-    data: bytes
+    data: Union[bytes, memoryview]
 
     def __init__(self,
-            satellite: str,
-            source: str,
-            timestamp: datetime,
-            metadata: Dict[str, Any],
-            data: bytes):
+            satellite: Optional[str],
+            source: Optional[str],
+            timestamp: Optional[datetime],
+            metadata: Optional[Dict[str, Any]],
+            data: Union[bytes, memoryview]):
         """
         Construct a new frame object from individual arguments.
 
         Args:
             satellite: Satellite identifier/name
             source: Frame source identifier/name
-            timestamp: Time of creation or reception
-            data: Data contained in the frame as bytes
+            timestamp: Time of creation or reception. Naive timestamps are interpreted as UTC.
+            data: Data contained in the frame as bytes or memoryview
             metadata: Additional metadata as dictionary
         """
         self.satellite = satellite
         self.source = source
         self.timestamp = timestamp
         self.data = data
-        self.metadata = metadata
+        self.metadata = metadata if metadata is not None else {}
+
+
+    def __repr__(self) -> str:
+        return f"Frame({self.satellite!r}, {self.source!r}, {self.timestamp!r}, {len(self.data)} bytes)"
+
+
+    def __eq__(self, other: Any) -> bool:
+        if not isinstance(other, Frame):
+            return NotImplemented
+        return self.satellite == other.satellite and self.source == other.source and \
+            self.timestamp == other.timestamp and self.metadata == other.metadata and \
+            bytes(self.data) == bytes(other.data)
 
 
     @classmethod
-    def from_dict(cls, frm: Dict[str, Any]):
+    def from_dict(cls, frm: Dict[str, Any]) -> "Frame":
         """
-        Parse frame from a dictionary object
+        Parse frame from a dictionary object. The data can be either a hex string, bytes or
+        None for frames without data (e.g. control responses).
+        Other top-level fields than the frame fields (e.g. "vc") are kept in the metadata
+        unless the metadata has a field with the same name.
         """
+        data = frm.get("data") or b""
+        timestamp = frm.get("timestamp")
+        metadata = frm.get("metadata") or {}
+        extra = frm.keys() - FRAME_FIELDS
+        if extra:
+            metadata = { **{ key: frm[key] for key in extra }, **metadata }
         return cls(
             satellite=frm.get("satellite", None),
             source=frm.get("source", None),
-            timestamp=datetime.fromisoformat(frm.get("timestamp")) if "timestamp" in frm else None,
-            data=bytes.fromhex(frm.get("data", "")),
-            metadata=frm.get("metadata", dict())
+            timestamp=datetime.fromisoformat(timestamp) if isinstance(timestamp, str) else timestamp,
+            data=bytes.fromhex(data) if isinstance(data, str) else data,
+            metadata=metadata
         )
 
 
-    def to_dict(self):
+    def to_dict(self) -> Dict[str, Any]:
         """
         Return frame as a dictionary object.
         """
         return {
             "satellite": self.satellite,
             "source": self.source,
-            "timestamp": self.timestamp.fromisoformat(),
+            "timestamp": self.timestamp.isoformat() if self.timestamp is not None else None,
             "data": self.data.hex(),
             "metadata": self.metadata
         }
+
+
+    @classmethod
+    def from_json(cls, raw: Union[str, bytes]) -> "Frame":
+        """
+        Parse frame from a JSON string.
+        """
+        try:
+            return cls.from_dict(json.loads(raw))
+        except (ValueError, TypeError, AttributeError) as e:
+            raise FrameParsingError(f"Invalid JSON frame: {e}") from e
+
+
+    def to_json(self) -> bytes:
+        """
+        Return frame as a JSON string.
+        """
+        return json.dumps(self.to_dict(), default=json_formatter).encode("ascii")
+
+
+    @staticmethod
+    def is_binary(raw: Union[bytes, memoryview]) -> bool:
+        """
+        Check whether the buffer starts with the binary frame header.
+        """
+        return len(raw) >= FRAME_HEADER.size and raw[:2] == FRAME_MAGIC
+
+
+    def to_buffers(self) -> Tuple[bytes, Union[bytes, memoryview]]:
+        """
+        Serialize the frame to the binary format as two buffers: the header with the
+        metadata block and the payload. The payload is not copied so the buffers can
+        be written with scatter/gather I/O or as a multipart message.
+        """
+        meta = { "satellite": self.satellite, "source": self.source, "metadata": self.metadata }
+        if msgpack is not None:
+            flags = FLAG_MSGPACK
+            meta_block = get_codec("application/msgpack").encode(meta)
+        else:
+            flags = 0
+            meta_block = get_codec("application/json").encode(meta)
+
+        if self.timestamp is None:
+            timestamp = math.nan
+        elif self.timestamp.tzinfo is None:
+            timestamp = self.timestamp.replace(tzinfo=timezone.utc).timestamp()
+        else:
+            timestamp = self.timestamp.timestamp()
+
+        header = FRAME_HEADER.pack(FRAME_MAGIC, FRAME_VERSION, flags, timestamp, len(meta_block), len(self.data))
+        return header + meta_block, self.data
+
+
+    def to_bytes(self) -> bytes:
+        """
+        Serialize the frame to the binary format as a single buffer.
+        """
+        return b"".join(self.to_buffers())
+
+
+    @classmethod
+    def from_bytes(cls, raw: Union[bytes, bytearray, memoryview]) -> "Frame":
+        """
+        Parse a frame from the binary format. The frame data will be a memoryview
+        into the given buffer, so the buffer must not be modified while the frame is used.
+
+        Raises:
+            FrameParsingError if the buffer is not a valid binary frame.
+        """
+        view = memoryview(raw)
+        if len(view) < FRAME_HEADER.size:
+            raise FrameParsingError(f"Frame too short ({len(view)} bytes)")
+
+        magic, version, flags, timestamp, meta_len, data_len = FRAME_HEADER.unpack_from(view)
+        if magic != FRAME_MAGIC:
+            raise FrameParsingError(f"Invalid frame magic {magic!r}")
+        if version != FRAME_VERSION:
+            raise FrameParsingError(f"Unsupported frame version {version}")
+
+        meta_start = FRAME_HEADER.size
+        data_start = meta_start + meta_len
+        if len(view) != data_start + data_len:
+            raise FrameParsingError(f"Frame length mismatch: {len(view)} != {data_start + data_len}")
+
+        try:
+            codec = get_codec("application/msgpack" if flags & FLAG_MSGPACK else "application/json")
+            meta = codec.decode(bytes(view[meta_start:data_start]))
+        except CodecError as e:
+            raise FrameParsingError(f"Invalid frame metadata: {e}") from e
+
+        return cls(
+            satellite=meta.get("satellite"),
+            source=meta.get("source"),
+            timestamp=None if math.isnan(timestamp) else datetime.fromtimestamp(timestamp, timezone.utc),
+            metadata=meta.get("metadata") or {},
+            data=view[data_start:]
+        )
+
+
+class FrameCodec(Codec):
+    """
+    Codec for the binary frame format. Decodes AMQP messages to Frame objects.
+    """
+
+    content_type = FRAME_CONTENT_TYPE
+
+    def encode(self, obj: Any) -> bytes:
+        if isinstance(obj, dict):
+            obj = Frame.from_dict(obj)
+        return obj.to_bytes()
+
+    def decode(self, body: bytes) -> Frame:
+        try:
+            return Frame.from_bytes(body)
+        except FrameParsingError as exc:
+            raise CodecError(str(exc)) from exc
+
+
+register_codec(FrameCodec())
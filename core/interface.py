@@ -0,0 +1,109 @@
+from typing import Optional
+
+from porthouse.core.rpc_async import send_rpc_request
+
+
+class ModuleInterface:
+    """
+    Standard commands available on every module
+    """
+
+    def __init__(self, exchange: Optional[str] = None, prefix: Optional[str] = None, module_name: Optional[str] = None):
+        """
+        Args:
+            exchange: Exchange where the module's RPC handlers are bound
+            prefix: Routing key prefix of the module's RPCs (e.g. "tle" for tle.rpc.*)
+            module_name: Name of the module. If given, the requests are sent to the module's
+                standard RPC queue ("<module_name>.rpc.*" on the "event" exchange) which
+                every module has, also the ones without RPC handlers.
+        """
+        if exchange is None and module_name is None:
+            raise ValueError("Either exchange or module_name must be given")
+        self.exchange = "event" if module_name is not None else exchange
+        self.prefix = module_name if module_name is not None else prefix
+
+    def _routing_key(self, name: str) -> str:
+        return f"{self.prefix}.rpc.{name}" if self.prefix else f"rpc.{name}"
+
+    async def metrics(
+            self,
+            verbose: bool = True
+        ):
+        """
+        Get module's metrics.
+        """
+        metrics = await send_rpc_request(self.exchange, self._routing_key("metrics"), cache=False)
+        if verbose:
+            for name, value in sorted(metrics["counters"].items()):
+                print(f"{name:50s} {value}")
+            for name, hist in sorted(metrics["histograms"].items()):
+                print(f"{name:50s} n={hist['count']} avg={hist['avg']:.4g} p90={hist['p90']:.4g} max={hist['max']:.4g}")
+        else:
+            return metrics
+
+    async def profile_start(
+            self,
+            cpu: bool = True,
+            memory: bool = False,
+            frames: int = 1
+        ):
+        """
+        Start profiling the module.
+
+        Args:
+            cpu: Profile CPU time with cProfile
+            memory: Trace memory allocations with tracemalloc
+            frames: Number of stored frames per allocation
+        """
+        await send_rpc_request(self.exchange, self._routing_key("profile.start"), {
+            "cpu": cpu, "memory": memory, "frames": frames
+        }, cache=False)
+
+    async def profile_dump(
+            self,
+            top: int = 20,
+            sort: str = "cumulative",
+            verbose: bool = True
+        ):
+        """
+        Write the profiling results so far to the module's log directory and show the top entries.
+
+        Args:
+            top: Number of entries to show
+            sort: Sort key for the CPU profile (cumulative, tottime, ncalls, ...)
+        """
+        summary = await send_rpc_request(self.exchange, self._routing_key("profile.dump"), {
+            "top": top, "sort": sort
+        }, timeout=10, cache=False)
+        return self._print_summary(summary) if verbose else summary
+
+    async def profile_stop(
+            self,
+            top: int = 20,
+            sort: str = "cumulative",
+            verbose: bool = True
+        ):
+        """
+        Stop profiling, write the results to the module's log directory and show the top entries.
+
+        Args:
+            top: Number of entries to show
+            sort: Sort key for the CPU profile (cumulative, tottime, ncalls, ...)
+        """
+        summary = await send_rpc_request(self.exchange, self._routing_key("profile.stop"), {
+            "top": top, "sort": sort
+        }, timeout=10, cache=False)
+        return self._print_summary(summary) if verbose else summary
+
+    @staticmethod
+    def _print_summary(summary: dict) -> None:
+        print(f"Duration {summary['duration']:.1f} s")
+        if "cpu" in summary:
+            print(f"CPU profile: {summary['cpu_file']}")
+            print(f"{'ncalls':>10s} {'tottime':>10s} {'cumtime':>10s}  function")
+            for entry in summary["cpu"]:
+                print(f"{entry['ncalls']:10d} {entry['tottime']:10.4f} {entry['cumtime']:10.4f}  {entry['function']}")
+        if "memory" in summary:
+            print(f"Memory profile: {summary['memory_file']}")
+            for entry in summary["memory"]:
+                print(f"{entry['size_diff']:+12d} B {entry['count_diff']:+8d}  {entry['location']}")
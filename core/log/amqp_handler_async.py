@@ -2,11 +2,21 @@
     This module implements AMQP logging handler which can be used with expression as target:
     pass the Python's standard logging system. The logging handler publishes all incoming log
     entries to common AMQP log exchange.
+
+    The records are collected to a bounded in-memory queue and a single drain task publishes
+    them in batches. Records are formatted only when they are published, repeated messages
+    are collapsed and each logger is rate limited so that a chatty module can't flood the
+    event loop or the log exchange. Records which don't fit to the queue are counted and
+    reported instead of published.
 """
 
 import json
-import logging
+import time
 import asyncio
+import logging
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
 import aiormq
 
 # TODO: aiologger should be used with asyncio instead of standard logging-module
@@ -18,23 +28,86 @@ class AMQPLogHandler(logging.Handler):
 
     def __init__(self,
             module: str,
-            channel: aiormq.channel.Channel):
+            channel: aiormq.channel.Channel,
+            queue_size: int = 1000,
+            batch_size: int = 100,
+            flush_interval: float = 0.05,
+            rate_limit: Optional[int] = 50,
+            rate_period: float = 1.0,
+            collapse_repeated: bool = True):
         """
         Initialize asynchronous AMQP log handler.
 
         Args:
             module: Name of the module which is outputting logging
             channel: aiormq channel object used to publish log entries
+            queue_size: Maximum number of records waiting to be published.
+                When the queue is full, new records are dropped. Errors and critical
+                records replace the oldest queued record instead.
+            batch_size: Maximum number of records published at once
+            flush_interval: Time in seconds to wait for more records before publishing
+                an incomplete batch. Also the interval for reporting collapsed repeats.
+            rate_limit: Maximum number of records per logger in rate_period seconds.
+                Errors and critical records are never rate limited. None disables the limit.
+            rate_period: Length of the rate limiting window in seconds
+            collapse_repeated: If true, consecutive identical records of a logger are
+                published once followed by a "repeated N times" record.
         """
         logging.Handler.__init__(self)
 
         self.module = module
         self.channel = channel
+        self.loop = asyncio.get_event_loop()
+        self.queue_size = max(1, int(queue_size))
+        self.batch_size = max(1, int(batch_size))
+        self.flush_interval = float(flush_interval)
+        self.rate_limit = rate_limit
+        self.rate_period = float(rate_period)
+        self.collapse_repeated = collapse_repeated
+
+        self._queue: Deque[logging.LogRecord] = deque()
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._rates: Dict[str, List] = {}       # Logger name -> [window start, count, suppressed]
+        self._last: Dict[str, List] = {}        # Logger name -> [record key, repeats, last record]
+
+        # Statistics
+        self.published = 0
+        self.failed = 0
+        self.dropped = 0
+        self.rate_limited = 0
+        self.collapsed = 0
+        self._reported_drops = 0
+
+
+    def start(self) -> None:
+        """
+        Start the drain task. Must be called from the event loop.
+        """
+        if self._task is None or self._task.done():
+            self._task = self.loop.create_task(self._drain(), name=f"{self.module}.log_drain")
+
+
+    async def stop(self, timeout: Optional[float] = 1.0) -> None:
+        """
+        Publish the remaining records and stop the drain task.
+
+        Args:
+            timeout: Maximum time in seconds to wait for the remaining records
+        """
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        self._flush_repeats(force=True)
+        try:
+            await asyncio.wait_for(self._publish_all(), timeout)
+        except asyncio.TimeoutError:
+            pass
 
 
-    def emit(self, record):
+    def emit(self, record: logging.LogRecord):
         """
-        Send the log message to the broadcast queue.
+        Add the log record to the publish queue.
 
         Remarks:
             This functions is requred to be compatible with Python logging system's emit call.
@@ -42,21 +115,148 @@ class AMQPLogHandler(logging.Handler):
         Args:
             record: Log record object
         """
-
         # If amqp connection has been closed
         if not self.channel or not self.channel.connection:
             return
 
-        msg = json.dumps({
+        try:
+            running_loop = asyncio.get_running_loop()
+        except RuntimeError:
+            running_loop = None
+
+        if running_loop is self.loop or not self.loop.is_running():
+            self._enqueue(record)
+        else:
+            # Logging from an executor thread
+            self.loop.call_soon_threadsafe(self._enqueue, record)
+
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Return handler statistics.
+        """
+        return {
+            "queued": len(self._queue),
+            "published": self.published,
+            "failed": self.failed,
+            "dropped": self.dropped,
+            "rate_limited": self.rate_limited,
+            "collapsed": self.collapsed,
+        }
+
+
+    def _enqueue(self, record: logging.LogRecord) -> None:
+        """
+        Apply the collapsing and rate limiting and add the record to the queue.
+        Always executed in the event loop thread.
+        """
+        if self.collapse_repeated:
+            key = (record.levelno, record.msg, record.args)
+            last = self._last.get(record.name)
+            if last is not None and last[0] == key:
+                last[1] += 1
+                last[2] = record
+                self.collapsed += 1
+                return
+            self._flush_repeats(record.name)
+            self._last[record.name] = [key, 0, record]
+
+        if self.rate_limit is not None and record.levelno < logging.ERROR:
+            rate = self._rates.get(record.name)
+            if rate is None or record.created - rate[0] >= self.rate_period:
+                if rate is not None and rate[2]:
+                    self._put(self._summary(record.name, logging.WARNING,
+                                            "%d log messages suppressed by rate limit", rate[2]))
+                rate = self._rates[record.name] = [record.created, 0, 0]
+            rate[1] += 1
+            if rate[1] > self.rate_limit:
+                rate[2] += 1
+                self.rate_limited += 1
+                return
+
+        self._put(record)
+
+
+    def _put(self, record: logging.LogRecord) -> None:
+        """ Add a record to the bounded queue """
+        if len(self._queue) >= self.queue_size:
+            self.dropped += 1
+            if record.levelno < logging.ERROR:
+                return
+            self._queue.popleft()
+        self._queue.append(record)
+        if len(self._queue) >= self.batch_size:
+            self._wakeup.set()
+
+
+    def _flush_repeats(self, name: Optional[str] = None, force: bool = False) -> None:
+        """
+        Queue the "repeated N times" records for the given logger or for all the loggers
+        whose last record is older than the flush interval.
+        """
+        now = time.time()
+        for logger_name in ([ name ] if name is not None else list(self._last)):
+            _, repeats, record = self._last.get(logger_name, (None, 0, None))
+            if repeats and (name is not None or force or now - record.created > self.flush_interval):
+                self._put(self._summary(logger_name, record.levelno, "Last message repeated %d times", repeats))
+                self._last.pop(logger_name)
+
+
+    def _summary(self, name: str, level: int, msg: str, *args) -> logging.LogRecord:
+        """ Create a log record generated by the handler itself """
+        return logging.LogRecord(name, level, __file__, 0, msg, args, None)
+
+
+    async def _drain(self) -> None:
+        """
+        Background task publishing the queued records in batches.
+        """
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+            if self.collapse_repeated:
+                self._flush_repeats()
+            if self.dropped > self._reported_drops:
+                dropped, self._reported_drops = self.dropped - self._reported_drops, self.dropped
+                self._queue.append(self._summary(self.module, logging.WARNING,
+                                                 "%d log messages dropped due to full queue", dropped))
+
+            await self._publish_all()
+
+
+    async def _publish_all(self) -> None:
+        """ Publish all the queued records """
+        while self._queue and self.channel and self.channel.connection:
+            batch = [ self._queue.popleft() for _ in range(min(self.batch_size, len(self._queue))) ]
+            results = await asyncio.gather(*[
+                self.channel.basic_publish(body, exchange="log", routing_key=routing_key)
+                for routing_key, body in map(self._serialize, batch)
+            ], return_exceptions=True)
+
+            # Don't log the failures to avoid feeding back to the handler
+            failed = sum(isinstance(result, BaseException) for result in results)
+            self.failed += failed
+            self.published += len(results) - failed
+
+
+    def _serialize(self, record: logging.LogRecord) -> Tuple[str, bytes]:
+        """ Format the record and return the routing key and the message body """
+        try:
+            message = record.getMessage()
+        except Exception:
+            message = str(record.msg)
+        level = record.levelname.lower()
+        return level, json.dumps({
             "module": self.module,
-            "level": record.levelname.lower(),
+            "level": level,
             "created": record.created,
-            "message": record.msg % record.args
+            "message": message
         }).encode("ascii")
 
-        # TODO: The ugly part!
-        asyncio.create_task(self.channel.basic_publish(msg, exchange='log', routing_key=record.levelname.lower()))
-
 
 if __name__ == "__main__":
     """
@@ -75,6 +275,7 @@ if __name__ == "__main__":
         logger = logging.getLogger("mcc")
         logger.setLevel(logging.DEBUG)
         handler_messages = AMQPLogHandler("test", channel)
+        handler_messages.start()
         logger.addHandler(handler_messages)
 
         # Announce messages
@@ -83,7 +284,7 @@ if __name__ == "__main__":
         logger.error("Ouch! This must hurt!")
         logger.critical("Nooo! No I'm dying!")
 
-        # Wait a bit before dying because the publish calls are not waiting
-        await asyncio.sleep(0.5)
+        # Publish the remaining messages before dying
+        await handler_messages.stop()
 
     asyncio.run(main())
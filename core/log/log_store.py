@@ -0,0 +1,289 @@
+"""
+    Persistent log store for the LogServer.
+
+    The log entries are appended to JSON lines segment files. Each entry gets a
+    sequence number which is used as its ID and as the pagination cursor. An
+    in-memory index holds the time, file offset and level of every stored entry
+    in compact arrays and the per-module and per-level postings lists of
+    sequence numbers, so the queries are answered with binary searches and only
+    the returned entries are read from the disk. The newest entries are also kept
+    in a ring buffer which serves most of the queries without disk access.
+"""
+
+import os
+import json
+import glob
+import heapq
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import deque
+from typing import Any, Deque, Dict, Iterable, List, Optional, Union
+
+
+__all__ = [
+    "LogStore",
+]
+
+
+class LogStore:
+    """
+    Append-only segmented log store with time, module and level indices.
+    """
+
+    SEGMENT_PATTERN = "log_%012d.jsonl"
+
+    def __init__(self,
+            path: str,
+            segment_size: int = 10000,
+            max_segments: int = 100,
+            cache_size: int = 500):
+        """
+        Open the store and rebuild the index from the existing segments.
+
+        Args:
+            path: Directory for the segment files. Created if it doesn't exist.
+            segment_size: Number of entries in a segment before a new segment is started
+            max_segments: Number of segments kept. The oldest segment is deleted when exceeded.
+            cache_size: Number of newest entries kept in memory
+        """
+        self.path = path
+        self.segment_size = max(1, int(segment_size))
+        self.max_segments = max(1, int(max_segments))
+        os.makedirs(path, exist_ok=True)
+
+        self.cache: Deque[Dict[str, Any]] = deque(maxlen=max(1, int(cache_size)))
+
+        # Index arrays; position is the sequence number minus first_seq
+        self.first_seq = 0
+        self.next_seq = 0
+        self._times = array("d")     # Entry times made non-decreasing for binary searching
+        self._offsets = array("q")   # Byte offset in the segment file
+        self._levels = array("H")    # Interned level name
+        self._names: List[str] = []
+        self._name_ids: Dict[str, int] = {}
+        self._postings: Dict[int, array] = {}  # Interned module/level -> sequence numbers
+
+        self._segments: List[int] = []  # First sequence number of each segment
+        self._file = None
+
+        self._load()
+
+
+    def __len__(self) -> int:
+        return self.next_seq - self.first_seq
+
+
+    def append(self, entry: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Append a new entry to the store.
+
+        Args:
+            entry: Log entry containing at least "created", "module" and "level"
+
+        Returns:
+            The stored entry with the assigned "id".
+        """
+        entry = dict(entry, id=self.next_seq)
+        if self._file is None or self.next_seq - self._segments[-1] >= self.segment_size:
+            self._start_segment(self.next_seq)
+
+        offset = self._file.tell()
+        self._file.write(json.dumps(entry).encode("ascii") + b"\n")
+        self._index(entry, offset)
+        self.cache.append(entry)
+
+        if len(self._segments) > self.max_segments:
+            self._drop_oldest_segment()
+        return entry
+
+
+    def flush(self) -> None:
+        """
+        Flush the written entries to the disk.
+        """
+        if self._file is not None:
+            self._file.flush()
+
+
+    def close(self) -> None:
+        """
+        Close the current segment file.
+        """
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+    def query(self,
+            start: Optional[float] = None,
+            end: Optional[float] = None,
+            module: Union[str, Iterable[str], None] = None,
+            level: Union[str, Iterable[str], None] = None,
+            before: Optional[int] = None,
+            after: Optional[int] = None,
+            limit: int = 60) -> List[Dict[str, Any]]:
+        """
+        Find entries matching the given filters.
+
+        Args:
+            start: Earliest entry time (unix timestamp)
+            end: Latest entry time (unix timestamp)
+            module: Module name or a list of module names
+            level: Level name or a list of level names
+            before: Return entries older than the entry with this ID
+            after: Return entries newer than the entry with this ID
+            limit: Maximum number of returned entries. Without the after cursor the newest
+                matching entries are returned, otherwise the oldest ones after the cursor.
+
+        Returns:
+            List of entries in chronological order.
+        """
+        # Sequence number range [lo, hi) from the time range and the cursors
+        lo, hi = self.first_seq, self.next_seq
+        if start is not None:
+            lo = max(lo, self.first_seq + bisect_left(self._times, float(start)))
+        if end is not None:
+            hi = min(hi, self.first_seq + bisect_right(self._times, float(end)))
+        if before is not None:
+            hi = min(hi, int(before))
+        if after is not None:
+            lo = max(lo, int(after) + 1)
+        if lo >= hi or limit <= 0:
+            return []
+
+        modules = self._lookup("module:", module)
+        levels = self._lookup("level:", level)
+        newest = after is None
+
+        if modules is None and levels is None:
+            seqs = range(hi - 1, lo - 1, -1) if newest else range(lo, hi)
+            seqs = seqs[:limit]
+        else:
+            # Walk the postings lists of the module (or level) filter from the cursor end of
+            # the range and check the level of each candidate
+            primary, secondary = (modules, levels) if modules is not None else (levels, None)
+            ranges = []
+            for name_id in primary:
+                postings = self._postings[name_id]
+                i, j = bisect_left(postings, lo), bisect_left(postings, hi)
+                indices = range(j - 1, i - 1, -1) if newest else range(i, j)
+                ranges.append(map(postings.__getitem__, indices))
+
+            seqs = []
+            for seq in heapq.merge(*ranges, reverse=newest):
+                if secondary is not None and self._levels[seq - self.first_seq] not in secondary:
+                    continue
+                seqs.append(seq)
+                if len(seqs) >= limit:
+                    break
+
+        return [ self.get(seq) for seq in sorted(seqs) ]
+
+
+    def get(self, seq: int) -> Dict[str, Any]:
+        """
+        Read an entry by its ID.
+
+        Raises:
+            KeyError if the entry doesn't exist.
+        """
+        if not self.first_seq <= seq < self.next_seq:
+            raise KeyError(seq)
+
+        if self.cache and seq >= self.cache[0]["id"]:
+            return self.cache[seq - self.cache[0]["id"]]
+
+        self.flush()
+        segment = self._segments[bisect_right(self._segments, seq) - 1]
+        with open(os.path.join(self.path, self.SEGMENT_PATTERN % segment), "rb") as f:
+            f.seek(self._offsets[seq - self.first_seq])
+            return json.loads(f.readline())
+
+
+    def _lookup(self, kind: str, names: Union[str, Iterable[str], None]) -> Optional[set]:
+        """ Convert a module/level filter to a set of interned IDs """
+        if names is None:
+            return None
+        if isinstance(names, str):
+            names = [ names ]
+        return { self._name_ids[kind + name] for name in names if kind + name in self._name_ids }
+
+
+    def _intern(self, name: str) -> int:
+        """ Return the ID of an interned module or level name """
+        name_id = self._name_ids.get(name)
+        if name_id is None:
+            name_id = self._name_ids[name] = len(self._names)
+            self._names.append(name)
+            self._postings[name_id] = array("q")
+        return name_id
+
+
+    def _index(self, entry: Dict[str, Any], offset: int) -> None:
+        """ Add an entry to the index """
+        created = float(entry.get("created", 0))
+        if self._times and created < self._times[-1]:
+            # Entries arriving out of order are indexed at the time of the previous entry
+            created = self._times[-1]
+
+        module_id = self._intern("module:" + str(entry.get("module")))
+        level_id = self._intern("level:" + str(entry.get("level")))
+        self._times.append(created)
+        self._offsets.append(offset)
+        self._levels.append(level_id)
+        self._postings[module_id].append(entry["id"])
+        self._postings[level_id].append(entry["id"])
+        self.next_seq = entry["id"] + 1
+
+
+    def _start_segment(self, first_seq: int) -> None:
+        """ Close the current segment and start a new one """
+        self.close()
+        self._segments.append(first_seq)
+        self._file = open(os.path.join(self.path, self.SEGMENT_PATTERN % first_seq), "ab")
+
+
+    def _drop_oldest_segment(self) -> None:
+        """ Delete the oldest segment file and remove its entries from the index """
+        removed = self._segments.pop(0)
+        os.remove(os.path.join(self.path, self.SEGMENT_PATTERN % removed))
+
+        new_first = self._segments[0]
+        count = new_first - self.first_seq
+        for column in (self._times, self._offsets, self._levels):
+            del column[:count]
+        for postings in self._postings.values():
+            del postings[:bisect_left(postings, new_first)]
+        self.first_seq = new_first
+
+
+    def _load(self) -> None:
+        """ Rebuild the index from the segment files """
+        files = sorted(glob.glob(os.path.join(self.path, "log_*.jsonl")))
+        for file_path in files:
+            first_seq = int(os.path.basename(file_path)[4:-6])
+            if not self._segments:
+                self.first_seq = self.next_seq = first_seq
+            self._segments.append(first_seq)
+
+            with open(file_path, "rb") as f:
+                offset = 0
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        # Partially written last line
+                        break
+                    self._index(entry, offset)
+                    self.cache.append(entry)
+                    offset += len(line)
+
+            if offset != os.path.getsize(file_path):
+                with open(file_path, "r+b") as f:
+                    f.truncate(offset)
+
+        if self._segments:
+            self._file = open(os.path.join(self.path, self.SEGMENT_PATTERN % self._segments[-1]), "ab")
+
+        while len(self._segments) > self.max_segments:
+            self._drop_oldest_segment()
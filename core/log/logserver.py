@@ -1,16 +1,16 @@
 """
-    Simple Log message cache to serve old log messages for the GUI
-    Maybe could also do something else...
-
+    Log message store to serve old log messages for the GUI.
+    The log entries are stored persistently to segment files in the log directory.
 """
 
-import json
-import uuid
+import asyncio
 import logging
 from os.path import join as path_join
+from typing import Optional
 
 import aiormq
-from porthouse.core.basemodule_async import BaseModule, rpc, queue, bind
+from porthouse.core.basemodule_async import BaseModule, RPCError, rpc, queue, bind
+from porthouse.core.log.log_store import LogStore
 
 
 class LogServer(BaseModule):
@@ -21,13 +21,36 @@ class LogServer(BaseModule):
     LOG_LEVELS = ["debug", "info", "warning", "error", "critical"]
     HISTORY_SIZE = 500
 
-    def __init__(self, log_path: str, **kwarg):
+    def __init__(self,
+            log_path: str,
+            store_path: Optional[str] = None,
+            segment_size: int = 10000,
+            max_segments: int = 100,
+            **kwarg):
         """
         Initialize module privates.
+
+        Args:
+            log_path: Directory for log files
+            store_path: Directory for the log store segments. Defaults to "log_store" in the log_path.
+            segment_size: Number of log entries per segment file
+            max_segments: Number of segment files kept
         """
-        self.log_list = []
         self.log_path = log_path
+        self.store = LogStore(store_path or path_join(log_path, "log_store"),
+                              segment_size=segment_size, max_segments=max_segments,
+                              cache_size=self.HISTORY_SIZE)
         BaseModule.__init__(self, log_path=log_path, **kwarg)
+        asyncio.get_event_loop().create_task(self.flush_task())
+
+
+    async def flush_task(self, interval: float = 1.0):
+        """
+        Flush the written log entries to the disk periodically.
+        """
+        while True:
+            await asyncio.sleep(interval)
+            self.store.flush()
 
 
     def create_log_handlers(self, log_path, module_name):
@@ -55,20 +78,13 @@ class LogServer(BaseModule):
         """
 
         try:
-            log_entry = json.loads(msg.body)
+            log_entry = self.decode_message(msg)
         except:
-            self.log.error('Error while parsing json message %s', msg.body, exc_info=True)
+            self.log.error('Error while decoding message %s', msg.body, exc_info=True)
             return
 
-        # Assign ID for the entry
-        log_entry["id"] = str(uuid.uuid4())
-
-        # Append to log cache
-        self.log_list.append(log_entry)
-
-        #
-        if len(self.log_list) > self.HISTORY_SIZE:
-            self.log_list.pop(0)
+        # Store the entry. The ID is assigned by the store.
+        self.store.append(log_entry)
 
 
     @rpc()
@@ -79,23 +95,25 @@ class LogServer(BaseModule):
 
         Args:
             request_name: Name of the RPC command
-            request_data: Command arguments
+            request_data: Command arguments. All optional:
+                start, end: Time range as unix timestamps
+                module, level: Module or level name or a list of them
+                before, after: ID of an entry used as a pagination cursor
+                limit: Maximum number of returned entries (default 60)
         """
-
-        if "before" in request_data:
-            try:
-                idx = [c["id"] for c in self.log_list].index(request_data["before"])
-                entries = self.log_list[:idx]
-            except (ValueError, KeyError):
-                entries = []
-
-        else:
-            entries = self.log_list
-
-        # Limit maximum number of items
-        limit = int(request_data.get("limit", 60))
-
-        return {"entries": entries[-limit:]}
+        try:
+            entries = self.store.query(
+                start=request_data.get("start"),
+                end=request_data.get("end"),
+                module=request_data.get("module"),
+                level=request_data.get("level"),
+                before=request_data.get("before"),
+                after=request_data.get("after"),
+                limit=int(request_data.get("limit", 60)))
+        except (TypeError, ValueError) as e:
+            raise RPCError(f"Invalid history request: {e}")
+
+        return {"entries": entries}
 
 
 if __name__ == "__main__":
@@ -0,0 +1,118 @@
+import json
+import asyncio
+import logging
+import unittest
+
+from porthouse.core.log.amqp_handler_async import AMQPLogHandler
+
+
+class FakeChannel:
+    """ Channel recording the published log messages """
+
+    def __init__(self):
+        self.connection = True
+        self.published = []
+
+    async def basic_publish(self, body, exchange="", routing_key=""):
+        self.published.append((routing_key, json.loads(body)["message"]))
+
+
+class TestAMQPLogHandler(unittest.IsolatedAsyncioTestCase):
+
+    def make_logger(self, name, **kwargs):
+        self.channel = FakeChannel()
+        self.handler = AMQPLogHandler("tester", self.channel, **kwargs)
+        logger = logging.getLogger(f"test_amqp_handler.{name}")
+        logger.setLevel(logging.DEBUG)
+        logger.propagate = False
+        logger.addHandler(self.handler)
+        self.addCleanup(logger.removeHandler, self.handler)
+        return logger
+
+    def messages(self):
+        return [ message for _, message in self.channel.published ]
+
+    async def test_queue_bound(self):
+        log = self.make_logger("bound", queue_size=3, rate_limit=None, collapse_repeated=False)
+        for i in range(5):
+            log.info("info %d", i)
+        self.assertEqual(self.handler.stats()["queued"], 3)
+        self.assertEqual(self.handler.dropped, 2)
+
+        # Errors replace the oldest queued record
+        log.error("error")
+        self.assertEqual(self.handler.dropped, 3)
+
+        self.handler.start()
+        await asyncio.sleep(0.1)
+        await self.handler.stop()
+        self.assertEqual(self.messages(), [ "info 1", "info 2", "error", "3 log messages dropped due to full queue" ])
+        self.assertEqual(self.channel.published[2][0], "error")
+        self.assertEqual(self.handler.published, 4)
+
+    async def test_batching(self):
+        log = self.make_logger("batching", batch_size=5, flush_interval=10, rate_limit=None, collapse_repeated=False)
+        self.handler.start()
+
+        # A full batch is published right away
+        for i in range(5):
+            log.info("message %d", i)
+        await asyncio.sleep(0.01)
+        self.assertEqual(self.handler.published, 5)
+
+        # An incomplete batch waits for the flush interval or the stop
+        log.warning("message 5")
+        log.warning("message 6")
+        await asyncio.sleep(0.01)
+        self.assertEqual(self.handler.published, 5)
+        await self.handler.stop()
+        self.assertEqual(self.messages(), [ f"message {i}" for i in range(7) ])
+        self.assertEqual(self.channel.published[-1][0], "warning")
+
+    async def test_rate_limit(self):
+        log = self.make_logger("rate", rate_limit=3, rate_period=0.05, collapse_repeated=False)
+        for i in range(10):
+            log.info("info %d", i)
+        log.error("error 1")
+        log.critical("critical 1")
+        self.assertEqual(self.handler.rate_limited, 7)
+
+        # The number of suppressed records is reported when the next period starts
+        await asyncio.sleep(0.06)
+        log.info("info 10")
+        await self.handler.stop()
+        self.assertEqual(self.messages(), [ "info 0", "info 1", "info 2", "error 1", "critical 1",
+                                            "7 log messages suppressed by rate limit", "info 10" ])
+
+        # The loggers are limited separately
+        other = logging.getLogger("test_amqp_handler.rate.other")
+        for i in range(3):
+            other.info("other %d", i)
+        self.assertEqual(self.handler.rate_limited, 7)
+
+    async def test_collapse_repeated(self):
+        log = self.make_logger("collapse", flush_interval=0.02, rate_limit=None)
+        for _ in range(5):
+            log.warning("Rotator %s not responding", "uhf")
+        log.warning("Rotator %s not responding", "vhf")
+        self.assertEqual(self.handler.collapsed, 4)
+
+        # Repeats of the last message are reported after the flush interval
+        self.handler.start()
+        for _ in range(3):
+            log.warning("Rotator %s not responding", "vhf")
+        await asyncio.sleep(0.1)
+        await self.handler.stop()
+        self.assertEqual(self.messages(), [
+            "Rotator uhf not responding", "Last message repeated 4 times",
+            "Rotator vhf not responding", "Last message repeated 3 times" ])
+
+    async def test_closed_channel(self):
+        log = self.make_logger("closed")
+        self.channel.connection = None
+        log.error("lost")
+        self.assertEqual(self.handler.stats()["queued"], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
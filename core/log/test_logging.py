@@ -3,7 +3,9 @@ import unittest
 import time
 import json
 import socket
+import tempfile
 from porthouse.core.static_basemodule import BaseModule, rpc, queue, bind
+from porthouse.core.log.log_store import LogStore
 
 
 class LogServerTester(BaseModule):
@@ -78,5 +80,49 @@ class TestTLEServer(unittest.TestCase):
         self.assertEqual(first_request["entries"][1]["id"], second_request["entries"][-1]["id"])
 
 
+class TestLogStore(unittest.TestCase):
+    """
+        Testcase for the persistent log store
+    """
+
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        self.store = LogStore(self.path, segment_size=100, max_segments=5, cache_size=10)
+        for i in range(1000):
+            self.store.append({
+                "created": 1000 + i,
+                "module": "odd" if i % 2 else "even",
+                "level": "info" if i % 3 else "error",
+                "message": "testing #%d" % i
+            })
+
+    def tearDown(self):
+        self.store.close()
+
+    def test_retention(self):
+        self.assertEqual(len(self.store), 500)
+        self.assertEqual([e["id"] for e in self.store.query(limit=3)], [997, 998, 999])
+
+    def test_pagination(self):
+        first = self.store.query(limit=20)
+        second = self.store.query(before=first[0]["id"], limit=20)
+        self.assertEqual(second[-1]["id"], first[0]["id"] - 1)
+        self.assertEqual([e["id"] for e in self.store.query(after=second[-1]["id"], limit=20)],
+                         [e["id"] for e in first])
+
+    def test_filters(self):
+        entries = self.store.query(start=1600, end=1700, module="odd", level="error", limit=100)
+        self.assertEqual([e["id"] for e in entries], list(range(603, 700, 6)))
+        self.assertEqual(self.store.query(module="unknown"), [])
+
+    def test_reopen(self):
+        self.store.close()
+        store = LogStore(self.path, segment_size=100, max_segments=5, cache_size=10)
+        self.assertEqual(len(store), 500)
+        self.assertEqual(store.query(before=550, limit=1)[0]["message"], "testing #549")
+        self.assertEqual(store.append({"created": 2000, "module": "odd", "level": "info"})["id"], 1000)
+        store.close()
+
+
 if __name__ == "__main__":
     unittest.main()
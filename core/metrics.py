@@ -0,0 +1,130 @@
+"""
+    Lightweight in-process metrics for the BaseModule.
+
+    Counters and fixed-bucket histograms are collected for the queue consumers,
+    RPC handlers, outgoing RPC requests and the event loop lag. A snapshot of the
+    metrics can be requested with the standard ``rpc.metrics`` call or published
+    periodically to the ``metrics`` exchange.
+"""
+
+import time
+from bisect import bisect_left
+from collections import defaultdict
+from typing import Any, Dict, Optional, Sequence
+
+
+__all__ = [
+    "Histogram",
+    "Metrics",
+    "LATENCY_BUCKETS",
+    "SIZE_BUCKETS",
+]
+
+# Histogram bucket upper bounds for latencies in seconds
+LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+                   0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Histogram bucket upper bounds for message sizes in bytes
+SIZE_BUCKETS = (64, 256, 1024, 4096, 16384, 65536, 262144, 1048576)
+
+
+class Histogram:
+    """
+    Histogram with fixed bucket boundaries.
+    """
+
+    __slots__ = ("buckets", "counts", "count", "sum", "max")
+
+    def __init__(self, buckets: Sequence[float] = LATENCY_BUCKETS):
+        """
+        Args:
+            buckets: Sorted upper bounds of the buckets. Values larger than the last
+                bound are counted to an overflow bucket.
+        """
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float) -> None:
+        """ Add a new value to the histogram """
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        if value > self.max:
+            self.max = value
+
+    def percentile(self, q: float) -> float:
+        """
+        Estimate the q:th percentile (0-100) as the upper bound of the bucket containing it.
+        """
+        if self.count == 0:
+            return 0.0
+        rank = q / 100 * self.count
+        cumulative = 0
+        for bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            if cumulative >= rank:
+                return min(bound, self.max)
+        return self.max
+
+    def to_dict(self) -> Dict[str, Any]:
+        """ Return histogram as a dictionary """
+        return {
+            "count": self.count,
+            "sum": self.sum,
+            "avg": self.sum / self.count if self.count else 0.0,
+            "max": self.max,
+            "p50": self.percentile(50),
+            "p90": self.percentile(90),
+            "p99": self.percentile(99),
+            "buckets": { str(bound): count for bound, count in zip(self.buckets, self.counts) if count },
+            "overflow": self.counts[-1],
+        }
+
+
+class Metrics:
+    """
+    Collection of named counters and histograms.
+    """
+
+    def __init__(self):
+        self.started = time.time()
+        self.counters: Dict[str, int] = defaultdict(int)
+        self.histograms: Dict[str, Histogram] = {}
+
+    def inc(self, name: str, value: int = 1) -> None:
+        """
+        Increment a counter.
+
+        Args:
+            name: Name of the counter
+            value: Increment
+        """
+        self.counters[name] += value
+
+    def observe(self, name: str, value: float, buckets: Optional[Sequence[float]] = None) -> None:
+        """
+        Add a value to a histogram. The histogram is created on the first call.
+
+        Args:
+            name: Name of the histogram
+            value: Observed value
+            buckets: Bucket bounds used if the histogram is created. Defaults to LATENCY_BUCKETS.
+        """
+        histogram = self.histograms.get(name)
+        if histogram is None:
+            histogram = self.histograms[name] = Histogram(buckets or LATENCY_BUCKETS)
+        histogram.observe(value)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        Return current values of all the metrics.
+        """
+        return {
+            "time": time.time(),
+            "uptime": time.time() - self.started,
+            "counters": dict(self.counters),
+            "histograms": { name: histogram.to_dict() for name, histogram in self.histograms.items() },
+        }
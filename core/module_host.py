@@ -0,0 +1,90 @@
+"""
+    Host for running several modules in one process.
+
+    The co-located modules share the process, the asyncio event loop and the
+    AMQP connection. Each module still has its own AMQP channel so a failing
+    channel operation in one module won't affect the others.
+"""
+
+import asyncio
+import logging
+from typing import Any, Dict, List, Optional
+
+import aiormq
+
+from .basemodule_async import BaseModule
+
+
+__all__ = [
+    "ModuleHost",
+]
+
+
+class ModuleHost:
+    """
+    Runs multiple asynchronous BaseModules in a single event loop with a shared AMQP connection.
+    """
+
+    def __init__(self, amqp_url: str, name: str = "ModuleHost", log: Optional[logging.Logger] = None):
+        """
+        Args:
+            amqp_url: AMQP server URL for the shared connection
+            name: Name of the host used in the log messages
+            log: Logger for the host's own messages
+        """
+        self.amqp_url = amqp_url
+        self.name = name
+        self.log = log or logging.getLogger(name)
+        self.loop = asyncio.get_event_loop()
+        self.connection: Optional[aiormq.abc.AbstractConnection] = None
+        self.modules: List[BaseModule] = []
+
+
+    def add_module(self, class_object: type, params: Dict[str, Any]) -> BaseModule:
+        """
+        Create a new module instance using the shared connection.
+        Must be called before run() since the module constructors run the event loop.
+
+        Args:
+            class_object: Module class. Must be a subclass of the asynchronous BaseModule.
+            params: Constructor arguments of the module
+
+        Returns:
+            The created module instance
+        """
+        if not (isinstance(class_object, type) and issubclass(class_object, BaseModule)):
+            raise TypeError(f"{class_object!r} is not an asynchronous BaseModule and can't be co-located")
+
+        if self.connection is None:
+            self.connection = self.loop.run_until_complete(aiormq.connect(self.amqp_url))
+
+        instance = class_object(**params, amqp_connection=self.connection)
+        self.modules.append(instance)
+        return instance
+
+
+    def run(self) -> None:
+        """
+        Run the event loop until interrupted and stop all the modules after that.
+        """
+        self.log.info("%s running %d modules: %s", self.name, len(self.modules),
+                      ", ".join(module.module_name for module in self.modules))
+        try:
+            self.loop.run_forever()
+        finally:
+            self.loop.run_until_complete(self.stop())
+
+
+    async def stop(self) -> None:
+        """
+        Stop all the modules in reverse creation order and close the shared connection.
+        """
+        for module in reversed(self.modules):
+            try:
+                await module.stop()
+            except Exception:
+                self.log.error("Failed to stop module %s", module.module_name, exc_info=True)
+
+        if self.connection is not None:
+            await self.connection.close()
+            self.connection = None
@@ -0,0 +1,184 @@
+"""
+    On-demand profiler for running modules.
+
+    The profiler is controlled with the standard ``rpc.profile.start``,
+    ``rpc.profile.stop`` and ``rpc.profile.dump`` requests. CPU time is profiled
+    with the deterministic ``cProfile`` profiler on the event loop thread and memory
+    allocations with ``tracemalloc`` snapshots. The results are written to the
+    module's log directory and a top-N summary is returned in the RPC response.
+"""
+
+import io
+import time
+import pstats
+import cProfile
+import tracemalloc
+from os.path import join as path_join
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+
+__all__ = [
+    "ModuleProfiler",
+]
+
+
+class ModuleProfiler:
+    """
+    CPU and memory profiler controller for a module.
+    """
+
+    def __init__(self, log_path: str, module_name: str):
+        """
+        Args:
+            log_path: Directory where the profiling results are written
+            module_name: Name of the module used in the file names
+        """
+        self.log_path = log_path
+        self.module_name = module_name
+
+        self.profile: Optional[cProfile.Profile] = None
+        self.started: Optional[float] = None
+        self._tracemalloc_started = False
+        self._memory_baseline: Optional[tracemalloc.Snapshot] = None
+
+
+    @property
+    def running(self) -> bool:
+        """ Is a profiling session active """
+        return self.started is not None
+
+
+    def start(self, cpu: bool = True, memory: bool = False, frames: int = 1) -> Dict[str, Any]:
+        """
+        Start a profiling session. Must be called from the thread to be profiled (the event loop).
+
+        Args:
+            cpu: Enable cProfile CPU profiling
+            memory: Enable tracemalloc memory allocation tracing
+            frames: Number of frames stored per allocation traceback
+
+        Raises:
+            RuntimeError if the profiling is already running.
+        """
+        if self.running:
+            raise RuntimeError("Profiler already running")
+
+        if cpu:
+            self.profile = cProfile.Profile()
+            self.profile.enable()
+
+        if memory:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start(int(frames))
+                self._tracemalloc_started = True
+            self._memory_baseline = tracemalloc.take_snapshot()
+
+        self.started = time.time()
+        return { "cpu": cpu, "memory": memory, "started": self.started }
+
+
+    def dump(self, top: int = 20, sort: str = "cumulative") -> Dict[str, Any]:
+        """
+        Write the current profiling results to the log directory without stopping the session.
+
+        Args:
+            top: Number of entries in the returned summary
+            sort: pstats sort key for the CPU summary (e.g. cumulative, tottime, ncalls)
+
+        Returns:
+            Summary containing the written file names and the top-N entries.
+
+        Raises:
+            RuntimeError if the profiling is not running.
+        """
+        if not self.running:
+            raise RuntimeError("Profiler not running")
+
+        stamp = datetime.utcnow().strftime("%Y%m%d_%H%M%S_%f")
+        base = path_join(self.log_path, f"{self.module_name}_{stamp}")
+        summary: Dict[str, Any] = { "duration": time.time() - self.started }
+
+        # Don't profile the dumping itself
+        if self.profile is not None:
+            self.profile.disable()
+
+        try:
+            self._dump(base, summary, top, sort)
+        finally:
+            if self.profile is not None:
+                self.profile.enable()
+        return summary
+
+
+    def _dump(self, base: str, summary: Dict[str, Any], top: int, sort: str) -> None:
+        """ Write the results to files starting with the given base path and fill the summary """
+        if self.profile is not None:
+            stats = pstats.Stats(self.profile)
+            stats.dump_stats(base + ".prof")
+            summary["cpu_file"] = base + ".prof"
+            summary["cpu"] = self._cpu_summary(stats, top, sort)
+
+        if self._memory_baseline is not None:
+            snapshot = tracemalloc.take_snapshot()
+            diff = snapshot.compare_to(self._memory_baseline, "lineno")
+            with open(base + "_memory.txt", "w") as f:
+                for entry in diff:
+                    f.write(f"{entry}\n")
+            summary["memory_file"] = base + "_memory.txt"
+            summary["memory"] = [
+                {
+                    "location": str(entry.traceback),
+                    "size_diff": entry.size_diff,
+                    "size": entry.size,
+                    "count_diff": entry.count_diff,
+                }
+                for entry in diff[:top]
+            ]
+
+
+    def stop(self, top: int = 20, sort: str = "cumulative") -> Dict[str, Any]:
+        """
+        Stop the profiling session and write the results to the log directory.
+
+        Args:
+            top: Number of entries in the returned summary
+            sort: pstats sort key for the CPU summary
+
+        Returns:
+            Summary containing the written file names and the top-N entries.
+
+        Raises:
+            RuntimeError if the profiling is not running.
+        """
+        summary = self.dump(top, sort)
+
+        if self.profile is not None:
+            self.profile.disable()
+            self.profile = None
+
+        if self._tracemalloc_started:
+            tracemalloc.stop()
+            self._tracemalloc_started = False
+        self._memory_baseline = None
+        self.started = None
+        return summary
+
+
+    @staticmethod
+    def _cpu_summary(stats: pstats.Stats, top: int, sort: str) -> List[Dict[str, Any]]:
+        """ Convert top-N entries of pstats to a list of dicts """
+        stats.stream = io.StringIO() # Silence the prints
+        stats.sort_stats(sort)
+        summary = []
+        for func in stats.fcn_list[:top]:
+            primitive_calls, ncalls, tottime, cumtime, _ = stats.stats[func]
+            filename, line, name = func
+            summary.append({
+                "function": f"{filename}:{line}({name})",
+                "ncalls": ncalls,
+                "primitive_calls": primitive_calls,
+                "tottime": tottime,
+                "cumtime": cumtime,
+            })
+        return summary
@@ -0,0 +1,220 @@
+"""
+    Batched publish pipeline for the BaseModule.
+
+    Instead of doing one broker round trip per published message, the pipeline
+    collects outgoing messages to a bounded buffer and flushes them to the broker
+    in batches. All messages of a batch are written to the channel back to back
+    and their publisher confirms are awaited together.
+"""
+
+import time
+import asyncio
+import logging
+from collections import defaultdict
+from typing import Any, Dict, List, Optional, Tuple
+
+import aiormq
+
+
+__all__ = [
+    "PublishPipeline",
+]
+
+# (exchange, routing_key, body, publish kwargs, confirm future, enqueue time)
+QueuedMessage = Tuple[str, str, bytes, Dict[str, Any], asyncio.Future, float]
+
+
+class PublishPipeline:
+    """
+    Bounded and batching publisher for an aiormq channel.
+    """
+
+    def __init__(self,
+            channel: aiormq.abc.AbstractChannel,
+            queue_size: int = 1000,
+            batch_size: int = 100,
+            flush_interval: float = 0.005,
+            log: Optional[logging.Logger] = None):
+        """
+        Initialize publish pipeline.
+
+        Args:
+            channel: aiormq channel used for publishing
+            queue_size: Maximum number of messages waiting in the buffer.
+                If the buffer is full, publish() will block until there is space.
+            batch_size: Maximum number of messages flushed at once
+            flush_interval: Time in seconds to wait for more messages before
+                flushing an incomplete batch.
+            log: Logger used to report failed publishes
+        """
+        self.channel = channel
+        self.batch_size = max(1, int(batch_size))
+        self.flush_interval = float(flush_interval)
+        self.log = log
+
+        self._queue: "asyncio.Queue[QueuedMessage]" = asyncio.Queue(maxsize=int(queue_size))
+        self._depth: Dict[str, int] = defaultdict(int)
+        self._unconfirmed = 0
+        self._idle = asyncio.Event()
+        self._idle.set()
+        self._task: Optional[asyncio.Task] = None
+
+        # Statistics
+        self.published = 0
+        self.failed = 0
+        self.flushes = 0
+        self.last_flush_latency = 0.0
+        self.max_flush_latency = 0.0
+        self._total_flush_latency = 0.0
+        self._total_confirm_latency = 0.0
+
+
+    def start(self) -> None:
+        """
+        Start the background flusher task.
+        """
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_event_loop().create_task(self._flusher(), name="publish_pipeline.flusher")
+
+
+    async def stop(self, timeout: Optional[float] = None) -> None:
+        """
+        Flush all the pending messages and stop the flusher task.
+
+        Args:
+            timeout: Maximum time in seconds to wait for the pending messages
+        """
+        try:
+            await self.flush(timeout)
+        finally:
+            if self._task is not None:
+                self._task.cancel()
+                self._task = None
+
+
+    async def publish(self,
+            body: bytes,
+            exchange: str = "",
+            routing_key: str = "",
+            **kwargs) -> asyncio.Future:
+        """
+        Add a message to the publish buffer.
+
+        Args:
+            body: Message body as bytes
+            exchange: Name of the target exchange
+            routing_key: Routing key of the message
+            kwargs: Additional arguments for the aiormq's basic_publish (e.g. properties)
+
+        Returns:
+            A future which will be resolved when the broker has confirmed the message.
+            Awaiting it is optional.
+        """
+        future = asyncio.get_event_loop().create_future()
+        # Mark a possible exception retrieved so that unawaited futures won't spam the log
+        future.add_done_callback(lambda f: f.cancelled() or f.exception())
+
+        self._idle.clear()
+        self._depth[exchange] += 1
+        self._unconfirmed += 1
+        try:
+            await self._queue.put((exchange, routing_key, body, kwargs, future, time.monotonic()))
+        except BaseException:
+            self._message_done(exchange)
+            raise
+        return future
+
+
+    async def flush(self, timeout: Optional[float] = None) -> None:
+        """
+        Wait until all the messages published so far have been confirmed by the broker.
+
+        Args:
+            timeout: Maximum time in seconds to wait.
+
+        Raises:
+            asyncio.TimeoutError if the messages were not confirmed in time.
+        """
+        await asyncio.wait_for(self._idle.wait(), timeout)
+
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Return pipeline statistics.
+
+        Returns:
+            Dictionary containing per-exchange queue depths and flush statistics.
+        """
+        return {
+            "queue_depth": {exchange: depth for exchange, depth in self._depth.items() if depth > 0},
+            "queued": self._queue.qsize(),
+            "unconfirmed": self._unconfirmed,
+            "published": self.published,
+            "failed": self.failed,
+            "flushes": self.flushes,
+            "avg_batch_size": (self.published + self.failed) / self.flushes if self.flushes else 0.0,
+            "last_flush_latency": self.last_flush_latency,
+            "avg_flush_latency": self._total_flush_latency / self.flushes if self.flushes else 0.0,
+            "max_flush_latency": self.max_flush_latency,
+            "avg_confirm_latency": self._total_confirm_latency / self.published if self.published else 0.0,
+        }
+
+
+    def _message_done(self, exchange: str) -> None:
+        """ Book-keeping when a message has left the pipeline """
+        self._depth[exchange] -= 1
+        self._unconfirmed -= 1
+        if self._unconfirmed == 0:
+            self._idle.set()
+
+
+    async def _flusher(self) -> None:
+        """
+        Background task collecting batches from the buffer and flushing them.
+        """
+        while True:
+            batch: List[QueuedMessage] = [await self._queue.get()]
+
+            # Give more messages a short time window to arrive unless the batch is already full
+            if self._queue.qsize() + 1 < self.batch_size and self.flush_interval > 0:
+                await asyncio.sleep(self.flush_interval)
+
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except asyncio.QueueEmpty:
+                    break
+
+            await self._flush_batch(batch)
+
+
+    async def _flush_batch(self, batch: List[QueuedMessage]) -> None:
+        """
+        Write a batch of messages to the channel and wait for their confirms.
+        """
+        start = time.monotonic()
+        results = await asyncio.gather(*[
+            self.channel.basic_publish(body, exchange=exchange, routing_key=routing_key, **kwargs)
+            for exchange, routing_key, body, kwargs, _, _ in batch
+        ], return_exceptions=True)
+        now = time.monotonic()
+
+        latency = now - start
+        self.flushes += 1
+        self.last_flush_latency = latency
+        self.max_flush_latency = max(self.max_flush_latency, latency)
+        self._total_flush_latency += latency
+
+        for (exchange, routing_key, _, _, future, queued), result in zip(batch, results):
+            if isinstance(result, BaseException):
+                self.failed += 1
+                if self.log:
+                    self.log.error("Failed to publish message to %s/%s: %r", exchange, routing_key, result)
+                if not future.done():
+                    future.set_exception(result)
+            else:
+                self.published += 1
+                self._total_confirm_latency += now - queued
+                if not future.done():
+                    future.set_result(result)
+            self._message_done(exchange)
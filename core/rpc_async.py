@@ -2,7 +2,6 @@
     Utility functions for creating RPC requests.
 """
 
-import json
 import uuid
 import asyncio
 from os import environ
@@ -13,12 +12,41 @@ import aiormq
 import aiormq.abc
 
 from .config import load_globals
+from .codecs import CodecError, get_codec
+from .rpc_cache import RPCCache
 from .basemodule_async import RPCRequestError, RPCRequestTimeout
 
 connection = None
 channel = None
 rpc_futures = {}
 rpc_response_queue = None
+cache_channel = None
+
+
+async def __subscribe_cache_invalidation(exchange: str, routing_key: str) -> None:
+    """
+    Start listening a broadcast which invalidates RPC cache entries.
+    A separate channel is used so that a failing bind won't close the main channel.
+    """
+    global cache_channel
+
+    if cache_channel is None or cache_channel.is_closed:
+        cache_channel = await connection.channel()
+
+    async def invalidate(message: aiormq.abc.DeliveredMessage):
+        rpc_cache.handle_broadcast(exchange, routing_key)
+
+    try:
+        declare_ok = await cache_channel.queue_declare(exclusive=True, auto_delete=True)
+        await cache_channel.queue_bind(declare_ok.queue, exchange=exchange, routing_key=routing_key)
+        await cache_channel.basic_consume(declare_ok.queue, invalidate, no_ack=True)
+    except aiormq.exceptions.AMQPError:
+        cache_channel = None
+        raise
+
+
+# Cache for idempotent requests such as tle.rpc.get_tle
+rpc_cache = RPCCache(subscriber=__subscribe_cache_invalidation)
 
 
 async def amqp_connect(
@@ -56,7 +84,7 @@ def __rpc_response(
     corr_id = message.header.properties.correlation_id
     if corr_id in rpc_futures:
         future = rpc_futures.pop(corr_id)
-        future.set_result(message.body)
+        future.set_result(message)
     else:
         raise RuntimeError(
             "Unknown correlation_id on RPC response queue!" \
@@ -67,7 +95,9 @@ async def send_rpc_request(
         exchange: str,
         routing_key: str,
         args: Optional[dict] = None,
-        timeout: Optional[float] = 1
+        timeout: Optional[float] = 1,
+        content_type: Optional[str] = None,
+        cache: bool = True
     ) -> Dict[str, Any]:
     """
     Send a RPC query to remote process and wait for response.
@@ -77,6 +107,8 @@ async def send_rpc_request(
         routing_key: Routing key for the RPC request
         query_data: Data to be included to RPC request
         timeout: Requets timeout time in seconds
+        content_type: Content type (codec) used for the request. Defaults to JSON.
+        cache: If false, the RPC cache is bypassed and the request is always sent.
 
     Returns:
         RPC response data as a dict.
@@ -84,6 +116,25 @@ async def send_rpc_request(
     Raises:
         RPCRequestError, RPCRequestTimeout
     """
+    if args is None:
+        args = {}
+
+    if cache:
+        return await rpc_cache.call(exchange, routing_key, args,
+            lambda: __send_rpc_request(exchange, routing_key, args, timeout, content_type))
+    return await __send_rpc_request(exchange, routing_key, args, timeout, content_type)
+
+
+async def __send_rpc_request(
+        exchange: str,
+        routing_key: str,
+        args: dict,
+        timeout: Optional[float],
+        content_type: Optional[str]
+    ) -> Dict[str, Any]:
+    """
+    Send the RPC request without caching. See send_rpc_request().
+    """
     global channel, rpc_futures, rpc_response_queue
 
     # Create RPC response queue if it doesn't exist yet
@@ -92,12 +143,9 @@ async def send_rpc_request(
         rpc_response_queue = declare_ok.queue
         await channel.basic_consume(rpc_response_queue, __rpc_response)
 
-    if args is None:
-        args = {}
-
-    # JSON format the data
-    if isinstance(args, (dict, list)):
-        args = json.dumps(args)
+    # Encode the data
+    codec = get_codec(content_type)
+    args = codec.encode(args)
 
     try:
         # Create future for the RPC response
@@ -107,11 +155,11 @@ async def send_rpc_request(
 
         # Send the RPC call
         await channel.basic_publish(
-            args.encode(),
+            args,
             exchange=exchange,
             routing_key=routing_key,
             properties=aiormq.spec.Basic.Properties(
-                content_type='text/plain',
+                content_type=codec.content_type,
                 correlation_id=corr_id,
                 reply_to=rpc_response_queue,
             )
@@ -123,14 +171,14 @@ async def send_rpc_request(
     try:
         # Wait until the future is fulfilled
         res = await asyncio.wait_for(future, timeout=timeout)
-        res = json.loads(res)
+        res = get_codec(res.header.properties.content_type).decode(res.body)
 
         if "error" in res:
             raise RPCRequestError(res["error"])
         return res
 
-    except ValueError as exc:
-        raise RPCRequestError("Failed to parse JSON RPC response!") from exc
+    except CodecError as exc:
+        raise RPCRequestError("Failed to parse RPC response!") from exc
 
     except (AsyncIOTimeoutError, asyncio.exceptions.TimeoutError) as exc:
         raise RPCRequestTimeout() from exc
@@ -0,0 +1,241 @@
+"""
+    Client-side cache for idempotent RPC requests.
+
+    Responses of the configured routing keys are cached for a per-routing-key
+    time-to-live. Identical requests which are already in flight are merged so
+    that only one request is sent to the broker. Cached entries can be dropped
+    when a named broadcast (e.g. ``tracking/tle.updated``) is received.
+"""
+
+import copy
+import json
+import time
+import asyncio
+import logging
+from fnmatch import fnmatchcase
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+
+from .codecs import json_formatter
+
+
+__all__ = [
+    "RPCCache",
+    "DEFAULT_TTL",
+    "DEFAULT_INVALIDATE",
+]
+
+# Default cache time-to-live in seconds per RPC routing key
+DEFAULT_TTL: Dict[str, float] = {
+    "tle.rpc.get_tle": 3600,
+}
+
+# Default invalidating broadcasts ("exchange/routing_key") and the routing keys they invalidate
+DEFAULT_INVALIDATE: Dict[str, List[str]] = {
+    "tracking/tle.updated": [ "tle.rpc.get_tle" ],
+}
+
+CacheKey = Tuple[str, str, str]
+
+
+class RPCCache:
+    """
+    TTL cache and in-flight request merger for RPC requests.
+    """
+
+    def __init__(self,
+            ttl: Optional[Dict[str, float]] = None,
+            invalidate: Optional[Dict[str, Iterable[str]]] = None,
+            subscriber: Optional[Callable[[str, str], Awaitable[None]]] = None,
+            max_entries: int = 1000,
+            log: Optional[logging.Logger] = None):
+        """
+        Initialize RPC cache.
+
+        Args:
+            ttl: Time-to-live in seconds keyed by the RPC routing key.
+                Routing keys may contain shell-style wildcards. Only the requests
+                matching one of the keys are cached.
+            invalidate: Broadcasts given as "exchange/routing_key" mapped to the list of
+                RPC routing keys (or wildcards) whose cached entries are dropped when
+                the broadcast is received.
+            subscriber: Coroutine function subscribe(exchange, routing_key) used to start listening
+                an invalidating broadcast. Called lazily when the first entry is cached.
+            max_entries: When the number of cached entries exceeds this, the expired entries
+                are pruned and if needed the entries closest to expiry are dropped.
+            log: Logger for reporting failed subscriptions
+        """
+        self.ttl = DEFAULT_TTL.copy() if ttl is None else dict(ttl)
+        self.invalidate_on = DEFAULT_INVALIDATE.copy() if invalidate is None else dict(invalidate)
+        self.subscriber = subscriber
+        self.max_entries = max(1, int(max_entries))
+        self.log = log
+
+        self._entries: Dict[CacheKey, Tuple[float, Any]] = {}
+        self._in_flight: Dict[CacheKey, asyncio.Future] = {}
+        self._stale = set()
+        self._subscribed = set()
+
+        # Statistics
+        self.hits = 0
+        self.misses = 0
+        self.merged = 0
+        self.invalidations = 0
+
+
+    def get_ttl(self, routing_key: str) -> Optional[float]:
+        """
+        Get time-to-live for the given routing key or None if the requests shall not be cached.
+        """
+        ttl = self.ttl.get(routing_key)
+        if ttl is None:
+            for pattern, value in self.ttl.items():
+                if fnmatchcase(routing_key, pattern):
+                    ttl = value
+                    break
+        return ttl if ttl is not None and ttl > 0 else None
+
+
+    @staticmethod
+    def make_key(exchange: str, routing_key: str, query_data: Any) -> CacheKey:
+        """
+        Create a cache key from the request. The arguments are serialized in canonical form.
+        """
+        return exchange, routing_key, json.dumps(query_data, sort_keys=True, default=json_formatter)
+
+
+    async def call(self,
+            exchange: str,
+            routing_key: str,
+            query_data: Any,
+            fetch: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Return a cached response or call fetch() to send the request.
+
+        Args:
+            exchange: Exchange of the RPC request
+            routing_key: Routing key of the RPC request
+            query_data: Arguments of the request
+            fetch: Coroutine function sending the actual request
+
+        Returns:
+            RPC response. A copy is returned so modifying it won't affect the cache.
+        """
+        ttl = self.get_ttl(routing_key)
+        if ttl is None:
+            return await fetch()
+
+        key = self.make_key(exchange, routing_key, query_data)
+
+        entry = self._entries.get(key)
+        if entry is not None:
+            if entry[0] > time.monotonic():
+                self.hits += 1
+                return copy.deepcopy(entry[1])
+            del self._entries[key]
+
+        # Merge with an identical request already in flight
+        future = self._in_flight.get(key)
+        if future is not None:
+            self.merged += 1
+            return copy.deepcopy(await asyncio.shield(future))
+
+        self.misses += 1
+        future = self._in_flight[key] = asyncio.get_event_loop().create_future()
+        # Mark a possible exception retrieved if no one else was waiting for it
+        future.add_done_callback(lambda f: f.cancelled() or f.exception())
+        try:
+            result = await fetch()
+        except BaseException as exc:
+            self._stale.discard(key)
+            future.set_exception(exc)
+            raise
+        else:
+            future.set_result(result)
+        finally:
+            del self._in_flight[key]
+
+        # Store only if the entry was not invalidated while the request was in flight
+        if key in self._stale:
+            self._stale.discard(key)
+        else:
+            self._entries[key] = (time.monotonic() + ttl, result)
+            if len(self._entries) > self.max_entries:
+                self._prune()
+            await self._subscribe(routing_key)
+        return copy.deepcopy(result)
+
+
+    def _prune(self) -> None:
+        """ Drop expired entries and the entries closest to expiry if the cache is still full """
+        now = time.monotonic()
+        entries = sorted(((expires, key) for key, (expires, _) in self._entries.items()), key=lambda e: e[0])
+        for i, (expires, key) in enumerate(entries):
+            if expires > now and len(entries) - i <= self.max_entries:
+                break
+            del self._entries[key]
+
+
+    async def _subscribe(self, routing_key: str) -> None:
+        """ Make sure the broadcasts invalidating the given routing key are listened """
+        if self.subscriber is None:
+            return
+
+        for source, targets in self.invalidate_on.items():
+            if source in self._subscribed or not any(fnmatchcase(routing_key, t) for t in targets):
+                continue
+            exchange, _, broadcast_key = source.partition("/")
+            try:
+                await self.subscriber(exchange, broadcast_key)
+                self._subscribed.add(source)
+            except Exception:
+                # Retried when the next entry is cached. Meanwhile the TTL limits staleness.
+                if self.log:
+                    self.log.warning("Failed to subscribe cache invalidation broadcast %r", source, exc_info=True)
+
+
+    def handle_broadcast(self, exchange: str, routing_key: str) -> None:
+        """
+        Drop the cached entries invalidated by the received broadcast.
+
+        Args:
+            exchange: Exchange of the received broadcast
+            routing_key: Routing key of the received broadcast
+        """
+        targets = self.invalidate_on.get(f"{exchange}/{routing_key}")
+        if targets:
+            for target in targets:
+                self.invalidate(routing_key=target)
+
+
+    def invalidate(self, exchange: Optional[str] = None, routing_key: Optional[str] = None) -> None:
+        """
+        Drop cached entries. If no arguments are given the whole cache is cleared.
+
+        Args:
+            exchange: Drop only entries of this exchange
+            routing_key: Drop only entries matching this routing key (wildcards allowed)
+        """
+        def matches(key: CacheKey) -> bool:
+            return (exchange is None or key[0] == exchange) and \
+                (routing_key is None or fnmatchcase(key[1], routing_key))
+
+        for key in [ key for key in self._entries if matches(key) ]:
+            del self._entries[key]
+            self.invalidations += 1
+
+        # Responses of requests in flight might already be stale so prevent storing them
+        self._stale.update(key for key in self._in_flight if matches(key))
+
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Return cache statistics.
+        """
+        return {
+            "entries": len(self._entries),
+            "in_flight": len(self._in_flight),
+            "hits": self.hits,
+            "misses": self.misses,
+            "merged": self.merged,
+            "invalidations": self.invalidations,
+        }
@@ -0,0 +1,169 @@
+"""
+    RPC dispatcher executing incoming RPC requests concurrently.
+
+    Coroutine handlers are executed on the event loop while plain synchronous
+    handlers are offloaded to a shared bounded thread pool so that blocking
+    handlers (e.g. database queries) do not stall the other consumers of the module.
+    Each handler has its own concurrency limit and the dispatcher keeps queue-wait
+    and execution-time statistics per handler.
+"""
+
+import time
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+
+__all__ = [
+    "RPCDispatcher",
+]
+
+
+class HandlerStats:
+    """
+    Execution statistics of a single RPC handler.
+    """
+
+    __slots__ = ("calls", "errors", "waiting", "running",
+                 "total_wait", "max_wait", "total_exec", "max_exec")
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.waiting = 0
+        self.running = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self.total_exec = 0.0
+        self.max_exec = 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        """ Return statistics as a dictionary """
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "waiting": self.waiting,
+            "running": self.running,
+            "avg_wait": self.total_wait / self.calls if self.calls else 0.0,
+            "max_wait": self.max_wait,
+            "avg_exec": self.total_exec / self.calls if self.calls else 0.0,
+            "max_exec": self.max_exec,
+        }
+
+
+class RPCDispatcher:
+    """
+    Dispatcher for executing RPC handlers.
+    """
+
+    # Thread pool shared by all the dispatchers in the process
+    _shared_executor: Optional[ThreadPoolExecutor] = None
+    _shared_max_workers: int = 4
+
+    def __init__(self,
+            max_workers: int = 4,
+            concurrency: int = 4,
+            handlers: Optional[Dict[str, int]] = None):
+        """
+        Initialize RPC dispatcher.
+
+        Args:
+            max_workers: Size of the shared thread pool used for synchronous handlers.
+                If multiple dispatchers are created the largest requested size is used.
+            concurrency: Default maximum number of concurrently executed requests per handler
+            handlers: Optional per-handler concurrency limits keyed by the handler name.
+                Overrides the limit given in the rpc() decorator.
+        """
+        self.default_concurrency = max(1, int(concurrency))
+        self.handler_concurrency = dict(handlers or {})
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+        self._stats: Dict[str, HandlerStats] = {}
+
+        RPCDispatcher._shared_max_workers = max(RPCDispatcher._shared_max_workers, int(max_workers))
+
+
+    @classmethod
+    def executor(cls) -> ThreadPoolExecutor:
+        """
+        Return the shared thread pool executor. The executor is created on the first call.
+        """
+        if cls._shared_executor is None:
+            cls._shared_executor = ThreadPoolExecutor(max_workers=cls._shared_max_workers,
+                                                      thread_name_prefix="rpc")
+        return cls._shared_executor
+
+
+    def _semaphore(self, name: str, concurrency: Optional[int]) -> asyncio.Semaphore:
+        """ Get or create the concurrency limiting semaphore for the handler """
+        semaphore = self._semaphores.get(name)
+        if semaphore is None:
+            limit = self.handler_concurrency.get(name, concurrency or self.default_concurrency)
+            semaphore = self._semaphores[name] = asyncio.Semaphore(max(1, int(limit)))
+        return semaphore
+
+
+    async def dispatch(self,
+            name: str,
+            func: Callable,
+            *args,
+            concurrency: Optional[int] = None,
+            in_executor: bool = True) -> Any:
+        """
+        Execute a RPC handler.
+
+        Args:
+            name: Name of the handler used for the statistics and limits
+            func: Handler function or coroutine function
+            args: Arguments passed to the handler
+            concurrency: Concurrency limit for the handler if not given in the dispatcher configuration
+            in_executor: If true, synchronous handlers are executed in the shared thread pool.
+                Otherwise they are called directly on the event loop.
+
+        Returns:
+            Value returned by the handler.
+        """
+        stats = self._stats.get(name)
+        if stats is None:
+            stats = self._stats[name] = HandlerStats()
+
+        queued = time.monotonic()
+        stats.waiting += 1
+        try:
+            await self._semaphore(name, concurrency).acquire()
+        finally:
+            stats.waiting -= 1
+
+        started = time.monotonic()
+        stats.running += 1
+        try:
+            if in_executor and not asyncio.iscoroutinefunction(func):
+                loop = asyncio.get_event_loop()
+                ret = await loop.run_in_executor(self.executor(), functools.partial(func, *args))
+            else:
+                ret = func(*args)
+
+            if asyncio.iscoroutine(ret):
+                ret = await ret
+            return ret
+
+        except Exception:
+            stats.errors += 1
+            raise
+
+        finally:
+            finished = time.monotonic()
+            stats.running -= 1
+            stats.calls += 1
+            stats.total_wait += started - queued
+            stats.max_wait = max(stats.max_wait, started - queued)
+            stats.total_exec += finished - started
+            stats.max_exec = max(stats.max_exec, finished - started)
+            self._semaphores[name].release()
+
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Return per-handler queue-wait and execution-time statistics.
+        """
+        return {name: stats.to_dict() for name, stats in self._stats.items()}
@@ -0,0 +1,106 @@
+import json
+import types
+import asyncio
+import logging
+import os
+import tempfile
+import unittest
+
+import aiormq
+
+from porthouse.core.basemodule_async import BaseModule
+from porthouse.core.codecs import get_codec
+from porthouse.core.profiler import ModuleProfiler
+
+
+class TestLogHandlers(unittest.TestCase):
+
+    def test_create_log_handlers(self):
+        # Skip the AMQP connection of the __init__
+        module = BaseModule.__new__(BaseModule)
+        module.debug = False
+        module.amqp_log_options = False
+        module.amqp_log_handler = None
+        module.log_listener = None
+
+        with tempfile.TemporaryDirectory() as log_path:
+            module.create_log_handlers(log_path, "test_log_handlers")
+            self.assertIsNotNone(module.log_listener)
+            module.log.info("Hello from the log listener")
+
+            asyncio.run(module.close_log_handlers())
+            self.assertIsNone(module.log_listener)
+            self.assertFalse(any(isinstance(h, logging.handlers.QueueHandler) for h in module.log.handlers))
+            with open(os.path.join(log_path, "test_log_handlers.log")) as f:
+                self.assertIn("Hello from the log listener", f.read())
+
+
+class FakeChannel:
+    """ Channel recording the declarations and the published messages """
+
+    def __init__(self):
+        self.calls = []
+        self.published = []
+
+    async def exchange_declare(self, exchange, **kwargs):
+        self.calls.append(("exchange_declare", exchange))
+
+    async def queue_declare(self, queue="", **kwargs):
+        self.calls.append(("queue_declare", queue))
+        return aiormq.spec.Queue.DeclareOk(queue="builtin-queue")
+
+    async def basic_consume(self, queue, consumer_callback, **kwargs):
+        self.calls.append(("basic_consume", queue))
+        self.consumer = consumer_callback
+
+    async def queue_bind(self, queue, exchange, routing_key, **kwargs):
+        self.calls.append(("queue_bind", queue, exchange, routing_key))
+
+    async def basic_publish(self, body, routing_key="", properties=None, **kwargs):
+        self.published.append((routing_key, get_codec(properties.content_type).decode(body)))
+
+
+class TestBuiltinRPCs(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        # Module without RPC handlers and without the AMQP connection of the __init__
+        self.module = BaseModule.__new__(BaseModule)
+        self.module.module_name = "Tester"
+        self.module.log = logging.getLogger("test_builtin_rpcs")
+        self.module.metrics = None
+        self.module.ready = True
+        self.module.channel = FakeChannel()
+        await self.module._BaseModule__bind_builtin_rpcs()
+
+    async def request(self, routing_key, data=None):
+        request = types.SimpleNamespace(
+            delivery={ "routing_key": routing_key },
+            body=json.dumps(data or {}).encode(),
+            header=types.SimpleNamespace(properties=aiormq.spec.Basic.Properties(
+                content_type="application/json", reply_to="reply", correlation_id="123")))
+        await self.module.channel.consumer(request)
+        routing_key, response = self.module.channel.published.pop()
+        self.assertEqual(routing_key, "reply")
+        return response
+
+    async def test_binding(self):
+        self.assertIn(("queue_bind", "builtin-queue", "event", "Tester.rpc.#"), self.module.channel.calls)
+
+    async def test_requests(self):
+        self.assertEqual(await self.request("Tester.rpc.ready"), { "module": "Tester", "ready": True })
+        self.assertEqual(await self.request("Tester.rpc.metrics"), { "module": "Tester", "enabled": False })
+        self.assertIn("Unknown standard request", (await self.request("Tester.rpc.nonexistent"))["error"])
+
+    async def test_profiler(self):
+        with tempfile.TemporaryDirectory() as log_path:
+            self.module.log_path = log_path
+            self.module.profiler = ModuleProfiler(log_path, "Tester")
+            self.assertTrue((await self.request("Tester.rpc.profile.start", { "cpu": True }))["cpu"])
+            self.assertIn("error", await self.request("Tester.rpc.profile.start"))
+            summary = await self.request("Tester.rpc.profile.stop", { "top": 5 })
+            self.assertTrue(os.path.exists(summary["cpu_file"]))
+            self.assertIn("error", await self.request("Tester.rpc.profile.stop"))
+
+
+if __name__ == '__main__':
+    unittest.main()
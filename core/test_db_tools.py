@@ -0,0 +1,128 @@
+import logging
+import unittest
+from datetime import datetime, timezone, timedelta
+
+from porthouse.core import db_tools
+from porthouse.core.db_tools import AsyncDatabase, get_database, query_shape, to_timestamp
+from porthouse.core.metrics import Metrics
+
+
+class FakeConnection:
+    def __init__(self, fail=False):
+        self.fail = fail
+        self.queries = []
+
+    async def fetch(self, query, *args, timeout=None):
+        self.queries.append((query, args))
+        if self.fail:
+            raise OSError("connection lost")
+        return [ { "value": arg } for arg in args ]
+
+
+class FakePool:
+    """ Pool handing out the same fake connection """
+
+    def __init__(self, connection):
+        self.connection = connection
+
+    def acquire(self):
+        return self
+
+    async def __aenter__(self):
+        return self.connection
+
+    async def __aexit__(self, *exc):
+        return False
+
+    def get_size(self):
+        return 1
+
+    def get_idle_size(self):
+        return 1
+
+
+class TestDatabaseTools(unittest.TestCase):
+
+    def test_to_timestamp(self):
+        expected = datetime(2026, 10, 15, 12, 0, 0)
+        for t in (expected,
+                  datetime(2026, 10, 15, 15, 0, 0, tzinfo=timezone(timedelta(hours=3))),
+                  expected.replace(tzinfo=timezone.utc).timestamp(),
+                  int(expected.replace(tzinfo=timezone.utc).timestamp()),
+                  "2026-10-15T12:00:00",
+                  "2026-10-15T12:00:00Z",
+                  "2026-10-15T14:00:00+02:00"):
+            ts = to_timestamp(t)
+            self.assertEqual(ts, expected, t)
+            self.assertIsNone(ts.tzinfo)
+
+        with self.assertRaises(ValueError):
+            to_timestamp("yesterday")
+        with self.assertRaises(ValueError):
+            to_timestamp(None)
+
+    def test_query_shape(self):
+        self.assertEqual(query_shape("""
+            SELECT timestamp, data
+            FROM packets\tWHERE satellite = $1
+            LIMIT $2;
+        """), "SELECT timestamp, data FROM packets WHERE satellite = $1 LIMIT $2;")
+
+        shape = query_shape("SELECT " + ", ".join(f"field_{i}" for i in range(100)) + " FROM obc", max_length=50)
+        self.assertEqual(len(shape), 53)
+        self.assertTrue(shape.endswith("..."))
+
+    def test_get_database(self):
+        url = "postgres://test@localhost/test_get_database"
+        self.addCleanup(db_tools._databases.pop, url, None)
+        log = logging.getLogger("test_get_database")
+
+        db = get_database(url, pool_size=3, log=log)
+        self.assertEqual(db.pool_size, 3)
+
+        # Same options or only a different logger and metrics
+        with self.assertNoLogs(log):
+            self.assertIs(get_database(url, pool_size="3", metrics=Metrics()), db)
+            self.assertIs(get_database(url), db)
+
+        with self.assertLogs(log, "WARNING") as logs:
+            self.assertIs(get_database(url, pool_size=5, slow_query=1.0), db)
+        self.assertEqual(len(logs.output), 1)
+        self.assertIn("pool_size=3, ignoring pool_size=5", logs.output[0])
+        self.assertEqual(db.pool_size, 3)
+
+
+class TestAsyncDatabase(unittest.IsolatedAsyncioTestCase):
+
+    async def test_query_times(self):
+        metrics = Metrics()
+        db = AsyncDatabase("postgres://test@localhost/test", metrics=metrics, slow_query=None)
+        connection = FakeConnection()
+        db.pool = FakePool(connection)
+
+        rows = await db.fetch("SELECT  $1,\n $2", 1, 2)
+        self.assertEqual(rows, [ { "value": 1 }, { "value": 2 } ])
+        await db.fetch("SELECT $1, $2", 3, 4)
+        self.assertEqual(connection.queries[1], ("SELECT $1, $2", (3, 4)))
+
+        connection.fail = True
+        with self.assertRaises(OSError):
+            await db.fetch("SELECT $1, $2", 5, 6)
+
+        stats = db.stats()
+        self.assertEqual(stats["errors"], 1)
+        self.assertEqual(list(stats["queries"]), [ "SELECT $1, $2" ])
+        self.assertEqual(stats["queries"]["SELECT $1, $2"]["count"], 3)
+        self.assertEqual(metrics.snapshot()["histograms"]["db.query_time"]["count"], 3)
+
+    async def test_slow_query(self):
+        log = logging.getLogger("test_slow_query")
+        db = AsyncDatabase("postgres://test@localhost/test", slow_query=0.0, log=log)
+        db.pool = FakePool(FakeConnection())
+        with self.assertLogs(log, "WARNING") as logs:
+            await db.fetch("SELECT 1")
+        self.assertIn("Slow database query", logs.output[0])
+
+
+if __name__ == '__main__':
+    unittest.main()
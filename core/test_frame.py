@@ -0,0 +1,133 @@
+import json
+import struct
+import unittest
+from datetime import datetime, timezone, timedelta
+
+from porthouse.core.codecs import CodecError, get_codec
+from porthouse.core.frame import Frame, FrameCodec, FrameParsingError, FRAME_CONTENT_TYPE, FRAME_HEADER
+
+
+class TestFrame(unittest.TestCase):
+
+    def setUp(self):
+        self.frame = Frame(
+            satellite="Foresail-1",
+            source="uhf",
+            timestamp=datetime(2026, 10, 15, 12, 30, 15, 250000, tzinfo=timezone.utc),
+            metadata={ "rssi": -101.5, "vc": 2 },
+            data=bytes(range(256)))
+
+    def test_bytes_roundtrip(self):
+        raw = self.frame.to_bytes()
+        self.assertTrue(Frame.is_binary(raw))
+        self.assertEqual(Frame.from_bytes(raw), self.frame)
+        self.assertEqual(Frame.from_bytes(bytearray(raw)), self.frame)
+
+        header, payload = self.frame.to_buffers()
+        self.assertIs(payload, self.frame.data)
+        self.assertEqual(header + payload, raw)
+
+        # Empty frame without timestamp
+        empty = Frame(None, None, None, None, b"")
+        parsed = Frame.from_bytes(empty.to_bytes())
+        self.assertEqual(parsed, empty)
+        self.assertIsNone(parsed.timestamp)
+        self.assertEqual(parsed.metadata, {})
+
+    def test_json_roundtrip(self):
+        raw = self.frame.to_json()
+        self.assertFalse(Frame.is_binary(raw))
+        self.assertEqual(json.loads(raw)["data"], self.frame.data.hex())
+        self.assertEqual(Frame.from_json(raw), self.frame)
+        self.assertEqual(Frame.from_json(raw.decode()), self.frame)
+
+        # Extra top-level fields are kept in the metadata without overriding it
+        frame = Frame.from_dict({ "satellite": "Foresail-1", "data": "cafe", "vc": 1, "crc": True,
+                                  "metadata": { "vc": 2 } })
+        self.assertEqual(frame.metadata, { "vc": 2, "crc": True })
+        self.assertEqual(Frame.from_json(frame.to_json()), frame)
+
+        # Frame without data
+        for frm in ({ "source": "exec" }, { "source": "exec", "data": None }):
+            frame = Frame.from_dict(frm)
+            self.assertEqual(frame.data, b"")
+            self.assertIsNone(frame.timestamp)
+            self.assertEqual(Frame.from_bytes(frame.to_bytes()), frame)
+
+        with self.assertRaises(FrameParsingError):
+            Frame.from_json(b"{")
+        with self.assertRaises(FrameParsingError):
+            Frame.from_json(b'{ "data": "not hex" }')
+
+    def test_invalid_bytes(self):
+        raw = self.frame.to_bytes()
+
+        with self.assertRaisesRegex(FrameParsingError, "too short"):
+            Frame.from_bytes(raw[:FRAME_HEADER.size - 1])
+        with self.assertRaisesRegex(FrameParsingError, "magic"):
+            Frame.from_bytes(b"XX" + raw[2:])
+        with self.assertRaisesRegex(FrameParsingError, "version"):
+            Frame.from_bytes(raw[:2] + bytes([ 99 ]) + raw[3:])
+        with self.assertRaisesRegex(FrameParsingError, "length mismatch"):
+            Frame.from_bytes(raw[:-1])
+        with self.assertRaisesRegex(FrameParsingError, "length mismatch"):
+            Frame.from_bytes(raw + b"\x00")
+
+        # Metadata block which doesn't decode
+        header = FRAME_HEADER.pack(b"PF", 1, 0, 0.0, 3, 0)
+        with self.assertRaisesRegex(FrameParsingError, "metadata"):
+            Frame.from_bytes(header + b"{{{")
+        self.assertFalse(Frame.is_binary(b"PF"))
+
+    def test_timestamps(self):
+        naive = datetime(2026, 10, 15, 12, 0, 0)
+        aware = datetime(2026, 10, 15, 15, 0, 0, tzinfo=timezone(timedelta(hours=3)))
+        expected = datetime(2026, 10, 15, 12, 0, 0, tzinfo=timezone.utc)
+
+        # Naive timestamps are interpreted as UTC and all are parsed to UTC
+        for timestamp in (naive, aware):
+            frame = Frame(None, None, timestamp, None, b"")
+            parsed = Frame.from_bytes(frame.to_bytes())
+            self.assertEqual(parsed.timestamp, expected)
+            self.assertEqual(parsed.timestamp.tzinfo, timezone.utc)
+            ts = struct.unpack_from("!d", frame.to_bytes(), 4)[0]
+            self.assertEqual(ts, expected.timestamp())
+
+        # The JSON format keeps the timestamp as is
+        frame = Frame.from_json(Frame(None, None, naive, None, b"").to_json())
+        self.assertEqual(frame.timestamp, naive)
+
+    def test_zero_copy(self):
+        raw = bytearray(self.frame.to_bytes())
+        frame = Frame.from_bytes(raw)
+        self.assertIsInstance(frame.data, memoryview)
+        self.assertEqual(frame.data.obj, raw)
+        self.assertEqual(frame.data.tobytes(), self.frame.data)
+
+        # The payload refers to the original buffer
+        raw[-1] = 0
+        self.assertEqual(frame.data[-1], 0)
+
+        # A memoryview payload is serialized without copying
+        header, payload = frame.to_buffers()
+        self.assertIs(payload, frame.data)
+        self.assertEqual(frame.to_dict()["data"], bytes(raw[-256:]).hex())
+
+
+class TestFrameCodec(unittest.TestCase):
+
+    def test_codec(self):
+        codec = get_codec(FRAME_CONTENT_TYPE)
+        self.assertIsInstance(codec, FrameCodec)
+
+        frame = Frame("Foresail-1", "uhf", None, { "vc": 1 }, b"\x01\x02")
+        body = codec.encode(frame)
+        self.assertEqual(codec.decode(body), frame)
+        self.assertEqual(codec.encode(frame.to_dict()), body)
+
+        with self.assertRaises(CodecError):
+            codec.decode(b"not a frame")
+
+
+if __name__ == '__main__':
+    unittest.main()
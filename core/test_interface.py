@@ -0,0 +1,67 @@
+import io
+import unittest
+import contextlib
+from unittest import mock
+
+from porthouse.core.interface import ModuleInterface
+
+
+class TestModuleInterface(unittest.IsolatedAsyncioTestCase):
+
+    async def call(self, interface, method, response, **kwargs):
+        """ Call an interface method and return the sent request and the printed output """
+        request = mock.AsyncMock(return_value=response)
+        output = io.StringIO()
+        with mock.patch("porthouse.core.interface.send_rpc_request", request), contextlib.redirect_stdout(output):
+            ret = await getattr(interface, method)(**kwargs)
+        return request.call_args, ret, output.getvalue()
+
+    async def test_routing_keys(self):
+        summary = { "duration": 1.0 }
+        for interface, exchange, routing_key in (
+                (ModuleInterface("tracking", "tle"), "tracking", "tle.rpc.profile.start"),
+                (ModuleInterface("scheduler"), "scheduler", "rpc.profile.start"),
+                (ModuleInterface(module_name="LogServer"), "event", "LogServer.rpc.profile.start")):
+            call, _, _ = await self.call(interface, "profile_start", summary, memory=True)
+            self.assertEqual(call.args[:2], (exchange, routing_key))
+            self.assertEqual(call.args[2], { "cpu": True, "memory": True, "frames": 1 })
+            self.assertFalse(call.kwargs["cache"])
+
+        with self.assertRaises(ValueError):
+            ModuleInterface()
+
+    async def test_metrics(self):
+        metrics = {
+            "counters": { "rpc.get_tle.calls": 3 },
+            "histograms": { "rpc.get_tle.latency": { "count": 3, "avg": 0.001, "p90": 0.0025, "max": 0.002 } },
+        }
+        interface = ModuleInterface("tracking", "tle")
+        call, ret, output = await self.call(interface, "metrics", metrics)
+        self.assertEqual(call.args[1], "tle.rpc.metrics")
+        self.assertIsNone(ret)
+        self.assertIn("rpc.get_tle.calls", output)
+        self.assertIn("n=3", output)
+
+        _, ret, output = await self.call(interface, "metrics", metrics, verbose=False)
+        self.assertEqual((ret, output), (metrics, ""))
+
+    async def test_profile_summary(self):
+        summary = {
+            "duration": 2.5,
+            "cpu_file": "/tmp/tle.prof",
+            "cpu": [ { "function": "tle.py:10(get_tle)", "ncalls": 4, "tottime": 0.1, "cumtime": 0.2 } ],
+            "memory_file": "/tmp/tle_memory.txt",
+            "memory": [ { "location": "tle.py:20", "size_diff": 1024, "count_diff": 2 } ],
+        }
+        call, _, output = await self.call(ModuleInterface("tracking", "tle"), "profile_stop", summary, top=5)
+        self.assertEqual(call.args[1:], ("tle.rpc.profile.stop", { "top": 5, "sort": "cumulative" }))
+        for text in ("Duration 2.5 s", "/tmp/tle.prof", "tle.py:10(get_tle)", "/tmp/tle_memory.txt", "+1024 B"):
+            self.assertIn(text, output)
+
+        call, ret, output = await self.call(ModuleInterface("tracking", "tle"), "profile_dump", summary, verbose=False)
+        self.assertEqual(call.args[1], "tle.rpc.profile.dump")
+        self.assertEqual((ret, output), (summary, ""))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,53 @@
+import unittest
+
+from porthouse.core.metrics import Histogram, Metrics
+
+
+class TestHistogram(unittest.TestCase):
+
+    def test_percentiles(self):
+        histogram = Histogram((1, 2, 5, 10))
+        for value, count in ((0.5, 50), (1.5, 40), (4, 9), (20, 1)):
+            for _ in range(count):
+                histogram.observe(value)
+
+        self.assertEqual(histogram.count, 100)
+        self.assertEqual(histogram.percentile(50), 1)
+        self.assertEqual(histogram.percentile(90), 2)
+        self.assertEqual(histogram.percentile(99), 5)
+        # Values beyond the last bucket are estimated with the maximum
+        self.assertEqual(histogram.percentile(100), 20)
+
+        d = histogram.to_dict()
+        self.assertEqual((d["p50"], d["p90"], d["p99"]), (1, 2, 5))
+        self.assertEqual(d["buckets"], { "1": 50, "2": 40, "5": 9 })
+        self.assertEqual(d["overflow"], 1)
+        self.assertAlmostEqual(d["avg"], (25 + 60 + 36 + 20) / 100)
+
+    def test_bounded_by_max(self):
+        histogram = Histogram((1, 2, 5, 10))
+        self.assertEqual(histogram.percentile(50), 0.0)
+        histogram.observe(0.25)
+        histogram.observe(1)
+        self.assertEqual(histogram.percentile(50), 1)
+        self.assertEqual(histogram.percentile(99), 1)
+        self.assertEqual(histogram.to_dict()["buckets"], { "1": 2 })
+
+
+class TestMetrics(unittest.TestCase):
+
+    def test_snapshot(self):
+        metrics = Metrics()
+        metrics.inc("rpc.calls")
+        metrics.inc("rpc.calls", 2)
+        metrics.observe("rpc.latency", 0.003)
+        metrics.observe("frame.size", 100, (64, 256))
+
+        snapshot = metrics.snapshot()
+        self.assertEqual(snapshot["counters"], { "rpc.calls": 3 })
+        self.assertEqual(snapshot["histograms"]["rpc.latency"]["p50"], 0.003)
+        self.assertEqual(snapshot["histograms"]["frame.size"]["buckets"], { "256": 1 })
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,82 @@
+import asyncio
+import unittest
+from unittest import mock
+
+from porthouse.core.basemodule_async import BaseModule
+from porthouse.core.module_host import ModuleHost
+
+
+class FakeConnection:
+    def __init__(self):
+        self.closed = False
+
+    async def close(self):
+        self.closed = True
+
+
+class HostedModule(BaseModule):
+    """ Module recording its life cycle without connecting to the broker """
+
+    stopped = []
+
+    def __init__(self, module_name, amqp_connection, fail_stop=False):
+        self.module_name = module_name
+        self.connection = amqp_connection
+        self.fail_stop = fail_stop
+
+    async def stop(self):
+        if self.fail_stop:
+            raise RuntimeError("stop failed")
+        HostedModule.stopped.append(self.module_name)
+
+
+class TestModuleHost(unittest.TestCase):
+
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        HostedModule.stopped = []
+        self.connect = mock.AsyncMock(side_effect=lambda url: FakeConnection())
+        patcher = mock.patch("porthouse.core.module_host.aiormq.connect", self.connect)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        asyncio.set_event_loop(None)
+        self.loop.close()
+
+    def test_shared_connection(self):
+        host = ModuleHost("amqp://localhost/")
+        a = host.add_module(HostedModule, { "module_name": "a" })
+        b = host.add_module(HostedModule, { "module_name": "b" })
+
+        self.connect.assert_called_once_with("amqp://localhost/")
+        self.assertIs(a.connection, host.connection)
+        self.assertIs(b.connection, host.connection)
+        self.assertEqual(host.modules, [ a, b ])
+
+    def test_reject_non_async_modules(self):
+        host = ModuleHost("amqp://localhost/")
+        for class_object in (object, HostedModule("x", None)):
+            with self.assertRaises(TypeError):
+                host.add_module(class_object, { })
+        self.connect.assert_not_called()
+
+    def test_run_and_stop(self):
+        host = ModuleHost("amqp://localhost/")
+        for name, fail_stop in (("a", False), ("b", True), ("c", False)):
+            host.add_module(HostedModule, { "module_name": name, "fail_stop": fail_stop })
+        connection = host.connection
+
+        self.loop.call_soon(self.loop.stop)
+        with self.assertLogs(host.log, "ERROR"):
+            host.run()
+
+        # Stopped in reverse order despite the failing module and the connection is closed last
+        self.assertEqual(HostedModule.stopped, [ "c", "a" ])
+        self.assertTrue(connection.closed)
+        self.assertIsNone(host.connection)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,67 @@
+import os
+import pstats
+import tempfile
+import tracemalloc
+import unittest
+
+from porthouse.core.profiler import ModuleProfiler
+
+
+def busy_function():
+    return sum(i * i for i in range(20000))
+
+
+class TestModuleProfiler(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.profiler = ModuleProfiler(self.tmp.name, "Tester")
+
+    def tearDown(self):
+        if self.profiler.running:
+            self.profiler.stop()
+        self.tmp.cleanup()
+
+    def test_cpu(self):
+        self.assertFalse(self.profiler.running)
+        ret = self.profiler.start()
+        self.assertEqual((ret["cpu"], ret["memory"]), (True, False))
+        self.assertTrue(self.profiler.running)
+        with self.assertRaises(RuntimeError):
+            self.profiler.start()
+
+        busy_function()
+        summary = self.profiler.dump(top=50, sort="tottime")
+        self.assertTrue(self.profiler.running)
+        self.assertTrue(any("busy_function" in entry["function"] for entry in summary["cpu"]))
+        self.assertLessEqual(len(summary["cpu"]), 50)
+        self.assertNotIn("memory", summary)
+
+        summary = self.profiler.stop(top=5)
+        self.assertFalse(self.profiler.running)
+        self.assertEqual(len(summary["cpu"]), 5)
+        self.assertTrue(summary["cpu_file"].startswith(os.path.join(self.tmp.name, "Tester_")))
+        pstats.Stats(summary["cpu_file"]) # Readable by pstats
+
+        with self.assertRaises(RuntimeError):
+            self.profiler.stop()
+        with self.assertRaises(RuntimeError):
+            self.profiler.dump()
+
+    def test_memory(self):
+        tracing = tracemalloc.is_tracing()
+        self.profiler.start(cpu=False, memory=True)
+        data = [ bytearray(1000) for _ in range(1000) ]
+        summary = self.profiler.stop(top=3)
+
+        self.assertNotIn("cpu", summary)
+        self.assertEqual(len(summary["memory"]), 3)
+        self.assertGreater(sum(entry["size_diff"] for entry in summary["memory"]), 900000)
+        self.assertTrue(os.path.exists(summary["memory_file"]))
+        # Tracing is stopped only if the profiler started it
+        self.assertEqual(tracemalloc.is_tracing(), tracing)
+        del data
+
+
+if __name__ == '__main__':
+    unittest.main()
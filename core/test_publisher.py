@@ -0,0 +1,83 @@
+import asyncio
+import unittest
+
+from porthouse.core.publisher import PublishPipeline
+
+
+class FakeChannel:
+    """ Channel recording the published messages. Publishing blocks while `gate` is cleared. """
+
+    def __init__(self):
+        self.published = []
+        self.gate = asyncio.Event()
+        self.gate.set()
+        self.fail = set()
+
+    async def basic_publish(self, body, exchange="", routing_key="", **kwargs):
+        await self.gate.wait()
+        if body in self.fail:
+            raise ConnectionError("nack")
+        self.published.append((exchange, routing_key, body))
+        return "ack"
+
+
+class TestPublishPipeline(unittest.IsolatedAsyncioTestCase):
+
+    async def test_flush_batches(self):
+        channel = FakeChannel()
+        pipeline = PublishPipeline(channel, batch_size=10, flush_interval=0.01)
+        pipeline.start()
+
+        futures = [ await pipeline.publish(b"%d" % i, exchange="ex", routing_key="key") for i in range(25) ]
+        await pipeline.flush(timeout=1)
+
+        self.assertEqual([ body for _, _, body in channel.published ], [ b"%d" % i for i in range(25) ])
+        self.assertTrue(all(f.result() == "ack" for f in futures))
+        stats = pipeline.stats()
+        self.assertEqual(stats["published"], 25)
+        self.assertEqual(stats["flushes"], 3)
+        self.assertEqual(stats["unconfirmed"], 0)
+        self.assertEqual(stats["queue_depth"], {})
+        await pipeline.stop()
+
+    async def test_failed_publish(self):
+        channel = FakeChannel()
+        channel.fail.add(b"bad")
+        pipeline = PublishPipeline(channel, flush_interval=0)
+        pipeline.start()
+
+        good = await pipeline.publish(b"good", exchange="ex")
+        bad = await pipeline.publish(b"bad", exchange="ex")
+        await pipeline.flush(timeout=1)
+
+        self.assertEqual(good.result(), "ack")
+        self.assertIsInstance(bad.exception(), ConnectionError)
+        self.assertEqual((pipeline.published, pipeline.failed), (1, 1))
+        await pipeline.stop()
+
+    async def test_queue_bound(self):
+        channel = FakeChannel()
+        channel.gate.clear()
+        pipeline = PublishPipeline(channel, queue_size=2, batch_size=1, flush_interval=0)
+        pipeline.start()
+
+        # One message is being flushed and two fill the buffer
+        for i in range(3):
+            await pipeline.publish(b"%d" % i, exchange="ex")
+        await asyncio.sleep(0.01)
+        self.assertEqual(pipeline.stats()["queue_depth"], { "ex": 3 })
+
+        blocked = asyncio.ensure_future(pipeline.publish(b"3", exchange="ex"))
+        await asyncio.sleep(0.01)
+        self.assertFalse(blocked.done())
+        with self.assertRaises(asyncio.TimeoutError):
+            await pipeline.flush(timeout=0.01)
+
+        channel.gate.set()
+        await blocked
+        await pipeline.stop(timeout=1)
+        self.assertEqual(len(channel.published), 4)
+
+
+if __name__ == '__main__':
+    unittest.main()
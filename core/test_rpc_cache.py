@@ -0,0 +1,100 @@
+import asyncio
+import unittest
+
+from porthouse.core.rpc_cache import RPCCache
+
+
+class TestRPCCache(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.requests = []
+
+    def fetcher(self, response, delay=0):
+        async def fetch():
+            self.requests.append(response)
+            await asyncio.sleep(delay)
+            return { "response": response }
+        return fetch
+
+    async def test_ttl(self):
+        cache = RPCCache(ttl={ "tle.rpc.*": 0.05 }, invalidate={})
+
+        self.assertEqual(await cache.call("tle", "tle.rpc.get_tle", { "a": 1 }, self.fetcher(1)), { "response": 1 })
+        self.assertEqual(await cache.call("tle", "tle.rpc.get_tle", { "a": 1 }, self.fetcher(2)), { "response": 1 })
+        # Different arguments and uncached routing keys are requested
+        self.assertEqual(await cache.call("tle", "tle.rpc.get_tle", { "a": 2 }, self.fetcher(3)), { "response": 3 })
+        self.assertEqual(await cache.call("rotator", "uhf.rpc.status", { }, self.fetcher(4)), { "response": 4 })
+        self.assertEqual(await cache.call("rotator", "uhf.rpc.status", { }, self.fetcher(5)), { "response": 5 })
+
+        await asyncio.sleep(0.06)
+        self.assertEqual(await cache.call("tle", "tle.rpc.get_tle", { "a": 1 }, self.fetcher(6)), { "response": 6 })
+        self.assertEqual(self.requests, [ 1, 3, 4, 5, 6 ])
+        self.assertEqual((cache.hits, cache.misses), (1, 3))
+
+    async def test_returns_copies(self):
+        cache = RPCCache(ttl={ "tle.rpc.get_tle": 10 }, invalidate={})
+        response = await cache.call("tle", "tle.rpc.get_tle", { }, self.fetcher(1))
+        response["response"] = "modified"
+        self.assertEqual(await cache.call("tle", "tle.rpc.get_tle", { }, self.fetcher(2)), { "response": 1 })
+
+    async def test_invalidation(self):
+        subscribed = []
+        async def subscriber(exchange, routing_key):
+            subscribed.append((exchange, routing_key))
+
+        cache = RPCCache(subscriber=subscriber)
+        await cache.call("tle", "tle.rpc.get_tle", { }, self.fetcher(1))
+        await cache.call("tle", "tle.rpc.get_tle", { "x": 1 }, self.fetcher(2))
+        self.assertEqual(subscribed, [ ("tracking", "tle.updated") ])
+
+        cache.handle_broadcast("tracking", "other")
+        self.assertEqual(await cache.call("tle", "tle.rpc.get_tle", { }, self.fetcher(3)), { "response": 1 })
+
+        cache.handle_broadcast("tracking", "tle.updated")
+        self.assertEqual(cache.invalidations, 2)
+        self.assertEqual(await cache.call("tle", "tle.rpc.get_tle", { }, self.fetcher(4)), { "response": 4 })
+
+        # A response of a request in flight during the invalidation is not stored
+        pending = asyncio.ensure_future(cache.call("tle", "tle.rpc.get_tle", { "x": 1 }, self.fetcher(5, delay=0.01)))
+        await asyncio.sleep(0)
+        cache.invalidate(routing_key="tle.rpc.*")
+        self.assertEqual(await pending, { "response": 5 })
+        self.assertEqual(await cache.call("tle", "tle.rpc.get_tle", { "x": 1 }, self.fetcher(6)), { "response": 6 })
+
+    async def test_merge_in_flight(self):
+        cache = RPCCache(ttl={ "tle.rpc.get_tle": 10 }, invalidate={})
+        results = await asyncio.gather(*[
+            cache.call("tle", "tle.rpc.get_tle", { "a": 1 }, self.fetcher(i, delay=0.01)) for i in range(5) ])
+        self.assertEqual(results, [ { "response": 0 } ] * 5)
+        self.assertEqual(self.requests, [ 0 ])
+        self.assertEqual(cache.merged, 4)
+
+        # A failure is passed to the merged requests and not cached
+        async def failing():
+            await asyncio.sleep(0.01)
+            raise TimeoutError()
+        results = await asyncio.gather(*[ cache.call("tle", "tle.rpc.get_tle", { "a": 2 }, failing) for _ in range(2) ],
+                                       return_exceptions=True)
+        self.assertTrue(all(isinstance(r, TimeoutError) for r in results))
+        self.assertEqual(cache.stats()["in_flight"], 0)
+        self.assertEqual(await cache.call("tle", "tle.rpc.get_tle", { "a": 2 }, self.fetcher(7)), { "response": 7 })
+
+    async def test_max_entries(self):
+        cache = RPCCache(ttl={ "short": 0.02, "long": 10 }, invalidate={}, max_entries=3)
+        await cache.call("x", "short", 1, self.fetcher(1))
+        await cache.call("x", "long", 1, self.fetcher(2))
+        await cache.call("x", "long", 2, self.fetcher(3))
+        await asyncio.sleep(0.03)
+
+        # The expired entry is pruned first
+        await cache.call("x", "long", 3, self.fetcher(4))
+        await cache.call("x", "long", 4, self.fetcher(5))
+        self.assertEqual(cache.stats()["entries"], 3)
+
+        # The entry closest to expiry was dropped
+        self.assertEqual(await cache.call("x", "long", 2, self.fetcher(6)), { "response": 3 })
+        self.assertEqual(await cache.call("x", "long", 1, self.fetcher(7)), { "response": 7 })
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,71 @@
+import time
+import asyncio
+import threading
+import unittest
+
+from porthouse.core.rpc_dispatcher import RPCDispatcher
+
+
+class TestRPCDispatcher(unittest.IsolatedAsyncioTestCase):
+
+    async def test_concurrency_limit(self):
+        dispatcher = RPCDispatcher(concurrency=2, handlers={ "limited": 1 })
+        running, peak = { "default": 0, "limited": 0 }, { "default": 0, "limited": 0 }
+
+        async def handler(name):
+            running[name] += 1
+            peak[name] = max(peak[name], running[name])
+            await asyncio.sleep(0.01)
+            running[name] -= 1
+            return name
+
+        results = await asyncio.gather(
+            *[ dispatcher.dispatch("default", handler, "default") for _ in range(5) ],
+            *[ dispatcher.dispatch("limited", handler, "limited", concurrency=3) for _ in range(3) ])
+
+        self.assertEqual(results, [ "default" ] * 5 + [ "limited" ] * 3)
+        self.assertEqual(peak, { "default": 2, "limited": 1 })
+        stats = dispatcher.stats()
+        self.assertEqual(stats["default"]["calls"], 5)
+        self.assertGreater(stats["limited"]["max_wait"], 0.015)
+        self.assertEqual((stats["limited"]["waiting"], stats["limited"]["running"]), (0, 0))
+
+    async def test_executor_offload(self):
+        dispatcher = RPCDispatcher(concurrency=4)
+        loop_thread = threading.get_ident()
+
+        def blocking():
+            time.sleep(0.05)
+            return threading.get_ident()
+
+        # The event loop keeps running while the synchronous handler blocks
+        ticks = 0
+        async def ticker():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.005)
+                ticks += 1
+        task = asyncio.ensure_future(ticker())
+        thread = await dispatcher.dispatch("blocking", blocking)
+        task.cancel()
+
+        self.assertNotEqual(thread, loop_thread)
+        self.assertGreater(ticks, 3)
+        self.assertEqual(await dispatcher.dispatch("direct", threading.get_ident, in_executor=False), loop_thread)
+
+    async def test_errors(self):
+        dispatcher = RPCDispatcher()
+
+        def failing():
+            raise ValueError("fail")
+
+        with self.assertRaises(ValueError):
+            await dispatcher.dispatch("failing", failing)
+        self.assertEqual(dispatcher.stats()["failing"]["errors"], 1)
+
+        # The semaphore was released
+        self.assertEqual(await dispatcher.dispatch("failing", lambda: 1), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
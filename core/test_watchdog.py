@@ -0,0 +1,55 @@
+import time
+import asyncio
+import logging
+import unittest
+
+from porthouse.core.metrics import Metrics
+from porthouse.core.watchdog import LoopWatchdog
+
+
+def blocking_callback(duration):
+    time.sleep(duration)
+
+
+class TestLoopWatchdog(unittest.IsolatedAsyncioTestCase):
+
+    async def test_detect_blocked_loop(self):
+        metrics = Metrics()
+        watchdog = LoopWatchdog(threshold=0.05, interval=0.01, metrics=metrics,
+                                log=logging.getLogger("test_watchdog"))
+        watchdog.start()
+        try:
+            await asyncio.sleep(0.05)
+            self.assertEqual(watchdog.slow_callbacks, 0)
+
+            with self.assertLogs("test_watchdog", level="WARNING") as logs:
+                blocking_callback(0.2)
+                await asyncio.sleep(0.05)
+        finally:
+            watchdog.stop()
+
+        self.assertEqual(watchdog.slow_callbacks, 1)
+        self.assertGreaterEqual(watchdog.max_lag, 0.15)
+        self.assertEqual(metrics.counters["loop.slow_callbacks"], 1)
+
+        # The monitor thread sampled the stack while the loop was blocked
+        self.assertIn("blocking_callback", watchdog.last_stack)
+        self.assertTrue(any("Stack sample" in line for line in logs.output))
+
+        stats = watchdog.stats()
+        self.assertGreater(stats["samples"], 5)
+        self.assertLess(stats["p50"], 0.05)
+        self.assertEqual(stats["max"], watchdog.max_lag)
+
+    async def test_stop(self):
+        watchdog = LoopWatchdog(threshold=0.05, interval=0.01)
+        watchdog.start()
+        watchdog.stop()
+        samples = len(watchdog.samples)
+        await asyncio.sleep(0.03)
+        self.assertEqual(len(watchdog.samples), samples)
+        self.assertIsNone(watchdog._thread)
+
+
+if __name__ == '__main__':
+    unittest.main()
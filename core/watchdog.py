@@ -0,0 +1,158 @@
+"""
+    Event loop watchdog.
+
+    The watchdog measures the event loop scheduling delay continuously with a
+    periodic heartbeat callback. A separate monitor thread notices when the
+    heartbeat stops advancing, meaning that a callback or a task step is blocking
+    the loop, and logs a stack sample of the loop thread while it is still blocked.
+"""
+
+import sys
+import time
+import asyncio
+import logging
+import threading
+import traceback
+from collections import deque
+from typing import Any, Dict, List, Optional
+
+from .metrics import Metrics
+
+
+__all__ = [
+    "LoopWatchdog",
+]
+
+
+class LoopWatchdog:
+    """
+    Event loop lag monitor and slow callback detector.
+    """
+
+    def __init__(self,
+            loop: Optional[asyncio.AbstractEventLoop] = None,
+            threshold: float = 0.1,
+            interval: float = 0.05,
+            window: int = 1200,
+            stack_limit: int = 25,
+            log: Optional[logging.Logger] = None,
+            metrics: Optional[Metrics] = None):
+        """
+        Initialize watchdog.
+
+        Args:
+            loop: Monitored event loop. Defaults to the current event loop.
+            threshold: Time in seconds a callback can block the loop before it's reported as slow
+            interval: Heartbeat interval in seconds
+            window: Number of latest lag samples used for the percentiles
+            stack_limit: Maximum number of frames in the logged stack sample
+            log: Logger for the slow callback reports
+            metrics: Optional metrics collection where the lag histogram and counters are recorded
+        """
+        self.loop = loop or asyncio.get_event_loop()
+        self.threshold = float(threshold)
+        self.interval = float(interval)
+        self.stack_limit = stack_limit
+        self.log = log or logging.getLogger(__name__)
+        self.metrics = metrics
+
+        self.samples = deque(maxlen=int(window))
+        self.slow_callbacks = 0
+        self.max_lag = 0.0
+        self.last_stack: Optional[str] = None
+
+        self._expected = 0.0
+        self._beat = 0.0
+        self._reported = False
+        self._handle: Optional[asyncio.TimerHandle] = None
+        self._thread: Optional[threading.Thread] = None
+        self._thread_id: Optional[int] = None
+        self._stop = threading.Event()
+
+
+    def start(self) -> None:
+        """
+        Start the watchdog. Must be called from the thread running the event loop.
+        """
+        if self._thread is not None:
+            return
+        self._thread_id = threading.get_ident()
+        self._stop.clear()
+        self._beat = time.monotonic()
+        self._expected = self.loop.time() + self.interval
+        self._handle = self.loop.call_later(self.interval, self._tick)
+        self._thread = threading.Thread(target=self._monitor, name="loop_watchdog", daemon=True)
+        self._thread.start()
+
+
+    def stop(self) -> None:
+        """
+        Stop the watchdog.
+        """
+        self._stop.set()
+        if self._handle is not None:
+            self._handle.cancel()
+            self._handle = None
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+
+    def _tick(self) -> None:
+        """ Heartbeat callback executed on the event loop """
+        now = self.loop.time()
+        lag = max(0.0, now - self._expected)
+        self._beat = time.monotonic()
+
+        self.samples.append(lag)
+        self.max_lag = max(self.max_lag, lag)
+        if self.metrics is not None:
+            self.metrics.observe("loop.scheduling_delay", lag)
+
+        if lag > self.threshold:
+            self.slow_callbacks += 1
+            if self.metrics is not None:
+                self.metrics.inc("loop.slow_callbacks")
+            self.log.warning("Event loop was blocked for %.3f s", lag)
+        self._reported = False
+
+        self._expected = now + self.interval
+        self._handle = self.loop.call_later(self.interval, self._tick)
+
+
+    def _monitor(self) -> None:
+        """ Monitor thread sampling the loop thread's stack when the heartbeat is late """
+        while not self._stop.wait(self.threshold / 2):
+            blocked = time.monotonic() - self._beat - self.interval
+            if blocked > self.threshold and not self._reported:
+                self._reported = True
+                frame = sys._current_frames().get(self._thread_id)
+                if frame is None:
+                    continue
+                self.last_stack = "".join(traceback.format_stack(frame, limit=self.stack_limit))
+                self.log.warning("Event loop blocked for over %.3f s. Stack sample of the loop thread:\n%s",
+                                 blocked, self.last_stack)
+
+
+    def percentiles(self, qs: List[float] = (50, 90, 99)) -> Dict[str, float]:
+        """
+        Return the lag percentiles over the sample window.
+        """
+        samples = sorted(self.samples)
+        if not samples:
+            return { f"p{q:g}": 0.0 for q in qs }
+        return { f"p{q:g}": samples[min(len(samples) - 1, int(q / 100 * len(samples)))] for q in qs }
+
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Return watchdog statistics.
+        """
+        return {
+            "samples": len(self.samples),
+            **self.percentiles(),
+            "max": self.max_lag,
+            "slow_callbacks": self.slow_callbacks,
+            "threshold": self.threshold,
+            "last_stack": self.last_stack,
+        }
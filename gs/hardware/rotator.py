@@ -5,7 +5,6 @@
 
 import os
 import time
-import json
 import asyncio
 
 import aiormq.abc
@@ -475,9 +474,9 @@ class Rotator(BaseModule):
             return
 
         try:
-            event_body = json.loads(message.body)
+            event_body = self.decode_message(message)
         except ValueError as e:
-            self.log.error('Failed to parse json: %s\n%s',
+            self.log.error('Failed to decode message: %s\n%s',
                            e.args[0], message.body, exc_info=True)
             return
 
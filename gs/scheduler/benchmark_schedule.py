@@ -0,0 +1,91 @@
+"""
+    Benchmark for the schedule overlap queries.
+
+    Fills a schedule with a multi-week set of tasks on a few rotators and measures
+    the task insertion (which runs an overlap query) and the overlap and free-gap
+    queries. The per-rotator interval index is compared against the previous
+    implementation, which intersected two SortedList ranges as sets.
+
+    Usage:
+        python3 -m porthouse.gs.scheduler.benchmark_schedule --tasks 20000
+"""
+
+import time
+import random
+import argparse
+from datetime import datetime, timedelta, timezone
+
+from porthouse.gs.scheduler.model import Schedule, Task
+
+
+ROTATORS = ["uhf", "sband", "uhf-b", "xband"]
+
+
+def set_intersection_overlapping(schedule: Schedule, start_time: datetime, end_time: datetime, rotators):
+    """ The previous get_overlapping implementation """
+    rotators = set(rotators)
+    tasks1 = schedule.start_times.irange(maximum=end_time, inclusive=(True, False))
+    tasks2 = schedule.end_times.irange(minimum=start_time, inclusive=(False, True))
+    return sorted([t for t in set(tasks1).intersection(tasks2) if rotators.intersection(t.rotators)],
+                  key=lambda t: t.start_time)
+
+
+def generate_tasks(count: int, seed: int = 0):
+    """ Generate passes of 5-15 minutes on 1-2 rotators, about one per rotator per hour """
+    rnd = random.Random(seed)
+    t0 = datetime(2030, 1, 1, tzinfo=timezone.utc)
+    span = count / len(ROTATORS) * 3600
+    tasks = []
+    for i in range(count):
+        task = Task()
+        task.task_name = f"Bench #{i}"
+        task.start_time = t0 + timedelta(seconds=int(rnd.uniform(0, span)))
+        task.end_time = task.start_time + timedelta(seconds=rnd.randint(300, 900))
+        task.rotators = rnd.sample(ROTATORS, rnd.randint(1, 2))
+        task.process_name = "Bench"
+        tasks.append(task)
+    return tasks, t0, t0 + timedelta(seconds=span)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Schedule overlap query benchmark")
+    parser.add_argument("--tasks", type=int, default=20000, help="Number of generated tasks")
+    parser.add_argument("--queries", type=int, default=2000, help="Number of overlap queries")
+    args = parser.parse_args()
+
+    tasks, t_start, t_end = generate_tasks(args.tasks)
+    schedule = Schedule()
+
+    t = time.perf_counter()
+    for task in tasks:
+        try:
+            schedule.add(task)
+        except ValueError:
+            pass
+    elapsed = time.perf_counter() - t
+    span_days = (t_end - t_start).total_seconds() / 86400
+    print(f"Inserted {len(schedule)}/{args.tasks} non-overlapping tasks over {span_days:.0f} days "
+          f"in {elapsed:.3f} s ({elapsed / args.tasks * 1e6:.1f} us per insert)")
+
+    rnd = random.Random(1)
+    queries = []
+    for _ in range(args.queries):
+        start_time = t_start + (t_end - t_start) * rnd.random()
+        queries.append((start_time, start_time + timedelta(hours=rnd.choice([1, 6, 24])),
+                        rnd.sample(ROTATORS, rnd.randint(1, 2))))
+
+    for name, func in (("interval index", schedule.get_overlapping),
+                       ("set intersection", lambda *q: set_intersection_overlapping(schedule, *q))):
+        t = time.perf_counter()
+        found = sum(len(func(*query)) for query in queries)
+        elapsed = time.perf_counter() - t
+        print(f"get_overlapping ({name}): {elapsed / args.queries * 1e6:.1f} us per query, {found} tasks found")
+
+    t = time.perf_counter()
+    gaps = sum(len(schedule.get_free_gaps(*query)) for query in queries)
+    elapsed = time.perf_counter() - t
+    print(f"get_free_gaps: {elapsed / args.queries * 1e6:.1f} us per query, {gaps} gaps found")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,194 @@
+"""
+    Helpers for keeping the scheduler state in sync with the YAML files.
+
+    The files are re-read only when their modification time or size has changed
+    and the content hash differs from the last read or written content. The
+    parsed entries are compared against the last known file content so that only
+    the changed entries need to be applied. The writes are coalesced and done at
+    most once per interval, and each file is replaced atomically so that a reader
+    never sees a partially written file.
+"""
+
+import os
+import math
+import asyncio
+import hashlib
+import tempfile
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import yaml
+
+
+__all__ = [
+    "WatchedFile",
+    "WriteBehind",
+    "atomic_write",
+    "diff_entries",
+    "yaml_dump",
+    "yaml_load",
+]
+
+
+# Use the LibYAML bindings when available. Same semantics as yaml.Loader/Dumper, just faster.
+YAML_LOADER = getattr(yaml, "CLoader", yaml.Loader)
+YAML_DUMPER = getattr(yaml, "CDumper", yaml.Dumper)
+
+
+def yaml_load(content: bytes) -> Any:
+    """ Parse YAML document """
+    return yaml.load(content, Loader=YAML_LOADER)
+
+
+def yaml_dump(data: Any) -> bytes:
+    """ Serialize data to YAML in the format used by the scheduler files """
+    return yaml.dump(data, Dumper=YAML_DUMPER, indent=4, sort_keys=False).encode("utf-8")
+
+
+def atomic_write(path: str, content: bytes) -> None:
+    """
+    Write the file atomically by writing a temporary file in the same directory
+    and renaming it over the target.
+    """
+    directory, name = os.path.split(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(prefix=f".{name}.", suffix=".tmp", dir=directory)
+    try:
+        with os.fdopen(fd, "wb") as fp:
+            fp.write(content)
+            fp.flush()
+            os.fsync(fp.fileno())
+        if os.path.exists(path):
+            os.chmod(tmp_path, os.stat(path).st_mode & 0o7777)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def diff_entries(old: Dict[str, Any], new: Dict[str, Any]) -> Tuple[List[str], Dict[str, Any]]:
+    """
+    Compare two name -> entry mappings.
+
+    Returns:
+        Tuple of the removed names and the added or changed entries.
+    """
+    removed = [ name for name in old if name not in new ]
+    changed = { name: entry for name, entry in new.items() if old.get(name) != entry }
+    return removed, changed
+
+
+class WatchedFile:
+    """
+    File whose changes are detected with the modification time, size and content hash.
+    """
+
+    def __init__(self, path: str):
+        """
+        Args:
+            path: Path of the file
+        """
+        self.path = path
+        self.exists = False
+        self._stat: Optional[Tuple[int, int]] = None
+        self._digest: Optional[bytes] = None
+
+
+    def _signature(self) -> Optional[Tuple[int, int]]:
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return st.st_mtime_ns, st.st_size
+
+
+    def read_if_changed(self) -> Optional[bytes]:
+        """
+        Read the file if it has changed since the last read or write.
+
+        Returns:
+            The file content or None if the file hasn't changed. A removed file
+            is returned as an empty content.
+        """
+        signature = self._signature()
+        if signature is not None and signature == self._stat:
+            return None
+
+        if signature is None:
+            content = b""
+        else:
+            try:
+                with open(self.path, "rb") as fp:
+                    content = fp.read()
+            except FileNotFoundError:
+                signature, content = None, b""
+
+        digest = hashlib.blake2b(content, digest_size=16).digest()
+        unchanged = digest == self._digest and self.exists == (signature is not None)
+        self._stat, self._digest, self.exists = signature, digest, signature is not None
+        return None if unchanged else content
+
+
+    def write(self, content: bytes) -> None:
+        """
+        Atomically replace the file content. The written content is not reported as a change.
+        """
+        atomic_write(self.path, content)
+        self._stat = self._signature()
+        self._digest = hashlib.blake2b(content, digest_size=16).digest()
+        self.exists = True
+
+
+class WriteBehind:
+    """
+    Coalesces write requests so that the write callback is called at most once per interval.
+    """
+
+    def __init__(self, write: Callable[[], None], interval: float = 1.0):
+        """
+        Args:
+            write: Function doing the actual write
+            interval: Minimum time in seconds between two writes
+        """
+        self.write = write
+        self.interval = float(interval)
+        self.pending = False
+        self._handle: Optional[asyncio.TimerHandle] = None
+        self._last_write = -math.inf
+
+
+    def request(self) -> None:
+        """
+        Request a write. The write is done immediately if the previous write is older than
+        the interval (on the next event loop iteration), otherwise when the interval has passed.
+        """
+        self.pending = True
+        if self._handle is None:
+            loop = asyncio.get_event_loop()
+            delay = max(0.0, self._last_write + self.interval - loop.time())
+            self._handle = loop.call_later(delay, self.flush)
+
+
+    def cancel(self) -> None:
+        """
+        Cancel the pending write.
+        """
+        self.pending = False
+        if self._handle is not None:
+            self._handle.cancel()
+            self._handle = None
+
+
+    def flush(self) -> None:
+        """
+        Do the pending write now.
+        """
+        if self._handle is not None:
+            self._handle.cancel()
+            self._handle = None
+        if not self.pending:
+            return
+        self.pending = False
+        self._last_write = asyncio.get_event_loop().time()
+        self.write()
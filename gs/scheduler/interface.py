@@ -85,3 +85,11 @@ class SchedulerInterface:
         res = await send_rpc_request("scheduler", "rpc.get_potential_tasks", data)
         return res
 
+    async def export_schedule_files(self):
+        """
+        Write the current schedule to the schedule YAML files. When the schedule journal is used, the YAML files
+        are not written automatically. The edits made to the exported files are imported while the schedule file
+        sync is enabled.
+        """
+        res = await send_rpc_request("scheduler", "rpc.export_schedule_files", {})
+        return res
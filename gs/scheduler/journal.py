@@ -0,0 +1,112 @@
+"""
+    Journaled persistence for the scheduler tasks.
+
+    The tasks are stored in an SQLite database in write-ahead logging (WAL) mode.
+    Each change is written as an upsert or delete of the changed task only, so the
+    cost of a schedule mutation doesn't depend on the size of the history. The
+    changes are appended to the WAL file and the periodic compaction checkpoints
+    them to the main database file and purges the executed and cancelled tasks
+    which are older than the retention time.
+"""
+
+import json
+import sqlite3
+from datetime import datetime
+from typing import Iterable, List, Tuple
+
+from porthouse.gs.scheduler.model import Task, TaskStatus
+
+
+__all__ = [
+    "ScheduleJournal",
+]
+
+
+class ScheduleJournal:
+    """
+    SQLite backed task store.
+    """
+
+    def __init__(self, path: str):
+        """
+        Open or create the journal database.
+
+        Args:
+            path: Path of the SQLite database file
+        """
+        self.path = path
+        self.db = sqlite3.connect(path)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS tasks ("
+            " task_name TEXT PRIMARY KEY,"
+            " storage INTEGER NOT NULL,"
+            " status TEXT NOT NULL,"
+            " end_time REAL NOT NULL,"
+            " data TEXT NOT NULL)"
+        )
+        self.db.execute("CREATE INDEX IF NOT EXISTS tasks_end_time ON tasks (end_time)")
+        self.db.commit()
+
+
+    def __len__(self) -> int:
+        return self.db.execute("SELECT COUNT(*) FROM tasks").fetchone()[0]
+
+
+    def load(self) -> List[Tuple[int, dict]]:
+        """
+        Load all the stored tasks.
+
+        Returns:
+            List of (storage, task dict) tuples ordered by the end time.
+        """
+        rows = self.db.execute("SELECT storage, data FROM tasks ORDER BY end_time")
+        return [ (storage, json.loads(data)) for storage, data in rows ]
+
+
+    def write(self, tasks: Iterable[Task], deleted: Iterable[str] = ()) -> None:
+        """
+        Store the changed tasks and delete the removed ones in a single transaction.
+
+        Args:
+            tasks: Added or changed tasks
+            deleted: Names of the tasks which are no longer in the schedule
+        """
+        with self.db:
+            self.db.executemany(
+                "INSERT INTO tasks (task_name, storage, status, end_time, data) VALUES (?, ?, ?, ?, ?)"
+                " ON CONFLICT (task_name) DO UPDATE SET"
+                " storage=excluded.storage, status=excluded.status, end_time=excluded.end_time, data=excluded.data",
+                [ (task.task_name, task.storage, task.status.name, task.end_time.timestamp(),
+                   json.dumps(task.to_dict(), default=str)) for task in tasks ]
+            )
+            self.db.executemany("DELETE FROM tasks WHERE task_name = ?", [ (name, ) for name in deleted ])
+
+
+    def compact(self, before: datetime) -> int:
+        """
+        Purge the executed and cancelled tasks which ended before the given time and
+        checkpoint the write-ahead log to the database file.
+
+        Args:
+            before: Retention limit for the executed and cancelled tasks
+
+        Returns:
+            Number of purged tasks.
+        """
+        with self.db:
+            purged = self.db.execute(
+                "DELETE FROM tasks WHERE status IN (?, ?) AND end_time < ?",
+                (TaskStatus.EXECUTED.name, TaskStatus.CANCELLED.name, before.timestamp())
+            ).rowcount
+        self.db.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        return purged
+
+
+    def close(self) -> None:
+        """
+        Checkpoint the log and close the database.
+        """
+        self.db.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        self.db.close()
@@ -3,7 +3,7 @@ import re
 import itertools
 from datetime import datetime, timedelta, timezone
 from string import ascii_lowercase
-from typing import Optional, List
+from typing import Optional, List, Set, Tuple
 
 from sortedcontainers import SortedList
 
@@ -282,8 +282,14 @@ class Schedule:
         self.start_times = SortedList(key=lambda t: t if isinstance(t, datetime) else t.start_time)
         self.end_times = SortedList(key=lambda t: t if isinstance(t, datetime) else t.end_time)
         self.tasks = {}  # task_name -> Task
+        # rotator -> scheduled tasks using the rotator. The tasks of a rotator never overlap, so when sorted by
+        # the end time, also the start times are in order, which allows finding the overlaps with a binary search.
+        self.by_rotator = {}
         self.max_task_no = {}  # process_name -> max_task_no
         self.deleted_tasks = SortedList(key=lambda t: t if isinstance(t, datetime) else t.start_time)
+        self.deleted_by_name = {}  # task_name -> latest deleted Task
+        self.modified = set()  # names of the tasks added, removed or changed since the last pop_modified()
+        self.on_change = None  # optional callback called with the task whenever a task is added, removed or changed
 
         if iterable is not None:
             for task in iterable:
@@ -292,7 +298,8 @@ class Schedule:
     def add(self, task: Task):
         if task.status in (TaskStatus.EXECUTED, TaskStatus.CANCELLED):
             self.update_task_numbering(task.task_name)
-            self.deleted_tasks.add(task)
+            self._add_deleted(task)
+            self._changed(task)
             return
 
         if task.task_name is None:
@@ -313,10 +320,9 @@ class Schedule:
             raise ValueError(f"Task {task.task_name} ({task.start_time} - {task.end_time}) "
                              "overlaps with existing task(s) " + (', '.join([str(t) for t in overlapping])))
 
-        self.start_times.add(task)
-        self.end_times.add(task)
-        self.tasks[task.task_name] = task
+        self._index(task)
         self.update_task_numbering(task.task_name)
+        self._changed(task)
 
     def new_task_name(self, process_name):
         self.max_task_no[process_name] = self.max_task_no.get(process_name, 0) + 1
@@ -330,24 +336,115 @@ class Schedule:
 
     def remove(self, task: Task):
         if task.task_name in self.tasks:
-            self.start_times.remove(task)
-            self.end_times.remove(task)
-            del self.tasks[task.task_name]
+            self._unindex(task)
 
             task.status = TaskStatus.EXECUTED if task.status == TaskStatus.ONGOING else TaskStatus.CANCELLED
-            self.deleted_tasks.add(task)
+            self._add_deleted(task)
+            self._changed(task)
         else:
             raise ValueError(f"Task {task.task_name} does not exist")
 
+    def discard(self, task_name: str) -> Optional[Task]:
+        """ Removes task from the schedule without changing its status. Returns the removed task, if any. """
+        task = self.tasks.get(task_name)
+        if task is not None:
+            self._unindex(task)
+        else:
+            task = self.deleted_by_name.pop(task_name, None)
+            if task is None:
+                return None
+            self.deleted_tasks.remove(task)
+
+        self._changed(task)
+        return task
+
+    def update_times(self, task: Task, start_time: Optional[datetime] = None, end_time: Optional[datetime] = None):
+        """ Changes the start and/or end time of a scheduled task keeping the indices consistent. """
+        self._unindex(task)
+        if start_time is not None:
+            task.start_time = start_time
+        if end_time is not None:
+            task.end_time = end_time
+        self._index(task)
+        self._changed(task)
+
+    def get(self, task_name: str) -> Optional[Task]:
+        """ Returns the scheduled task or the latest executed/cancelled task with the given name. """
+        return self.tasks.get(task_name) or self.deleted_by_name.get(task_name)
+
+    def touch(self, task: Task):
+        """ Marks a task modified in place (e.g. status or times changed). """
+        self._changed(task)
+
+    def pop_modified(self) -> Set[str]:
+        """ Returns and clears the names of the modified tasks. """
+        modified, self.modified = self.modified, set()
+        return modified
+
+    def prune_deleted(self, before: datetime) -> int:
+        """ Forgets executed and cancelled tasks which ended before the given time. Returns the number of pruned tasks. """
+        pruned = [t for t in self.deleted_tasks.irange(maximum=before) if t.end_time < before]
+        for task in pruned:
+            self.deleted_tasks.remove(task)
+            if self.deleted_by_name.get(task.task_name) is task:
+                del self.deleted_by_name[task.task_name]
+        return len(pruned)
+
+    def _index(self, task: Task):
+        self.start_times.add(task)
+        self.end_times.add(task)
+        self.tasks[task.task_name] = task
+        for rotator in set(task.rotators):
+            index = self.by_rotator.get(rotator)
+            if index is None:
+                index = self.by_rotator[rotator] = SortedList(key=_interval_key)
+            index.add(task)
+
+    def _unindex(self, task: Task):
+        self.start_times.remove(task)
+        self.end_times.remove(task)
+        del self.tasks[task.task_name]
+        for rotator in set(task.rotators):
+            self.by_rotator[rotator].remove(task)
+
+    def _changed(self, task: Task):
+        self.modified.add(task.task_name)
+        if self.on_change is not None:
+            self.on_change(task)
+
+    def _add_deleted(self, task: Task):
+        previous = self.deleted_by_name.get(task.task_name)
+        if previous is not None:
+            self.deleted_tasks.remove(previous)
+        self.deleted_tasks.add(task)
+        self.deleted_by_name[task.task_name] = task
+
     def get_overlapping(self, start_time: datetime, end_time: datetime, rotators: List[str]):
-        # all tasks where task.start_time <= end_time and task.end_time >= start_time and they share rotators
-        rotators = set(rotators)
-        tasks1 = self.start_times.irange(maximum=end_time, inclusive=(True, False))
-        tasks2 = self.end_times.irange(minimum=start_time, inclusive=(False, True))
-        return sorted([self.tasks[t.task_name]
-                       for t in set(tasks1).intersection(tasks2)
-                       if rotators.intersection(t.rotators)
-                       ], key=lambda t: t.start_time)
+        # all tasks where task.start_time < end_time and task.end_time > start_time and they share rotators
+        found = {}
+        for rotator in set(rotators):
+            index = self.by_rotator.get(rotator)
+            if index is None:
+                continue
+            for task in index.islice(index.bisect_key_left((start_time,))):
+                if task.start_time >= end_time:
+                    break
+                if task.end_time > start_time:
+                    found[task.task_name] = task
+        return sorted(found.values(), key=lambda t: t.start_time)
+
+    def get_free_gaps(self, start_time: datetime, end_time: datetime,
+                      rotators: List[str]) -> List[Tuple[datetime, datetime]]:
+        """ Returns the (start, end) intervals between start_time and end_time when none of the rotators is used. """
+        gaps = []
+        gap_start = start_time
+        for task in self.get_overlapping(start_time, end_time, rotators):
+            if task.start_time > gap_start:
+                gaps.append((gap_start, task.start_time))
+            gap_start = max(gap_start, task.end_time)
+        if gap_start < end_time:
+            gaps.append((gap_start, end_time))
+        return gaps
 
     def all(self):
         start_times_copy = self.start_times.copy()
@@ -361,6 +458,10 @@ class Schedule:
         return len(self.start_times)
 
 
+def _interval_key(task: Task):
+    return task.end_time, task.start_time
+
+
 def iter_all_strings():
     for size in itertools.count(1):
         for s in itertools.product(ascii_lowercase, repeat=size):
@@ -0,0 +1,176 @@
+"""
+    Optimizing task selection for the schedule creation.
+
+    Instead of placing the processes greedily in priority order, all the candidate
+    passes are collected and a conflict-free subset maximizing the total weight
+    (priority weight × duration) is selected. The candidates are split into
+    independent groups of transitively conflicting tasks. When all tasks of a group
+    share a rotator, any two overlapping tasks conflict and the group is solved
+    exactly with the weighted interval scheduling dynamic program. Other groups
+    are solved with a greedy selection improved by a swap local search, which stops
+    when the time budget runs out.
+"""
+
+import time
+from bisect import bisect_right
+from typing import Dict, List, Sequence, Tuple
+
+from porthouse.gs.scheduler.model import Task
+
+
+__all__ = [
+    "select_tasks",
+    "priority_weights",
+]
+
+
+def priority_weights(priorities: Sequence[float]) -> Dict[float, float]:
+    """
+    Map process priorities (low value means high priority) to positive weights.
+    The lowest priority gets weight 1 and each priority step adds 1.
+    """
+    lowest = max(priorities)
+    return { priority: lowest - priority + 1 for priority in priorities }
+
+
+def select_tasks(candidates: Sequence[Task],
+                 weights: Sequence[float],
+                 time_budget: float = 5.0) -> Tuple[List[Task], Dict[str, float]]:
+    """
+    Select a subset of non-conflicting candidate tasks maximizing the total weight.
+
+    Args:
+        candidates: Candidate tasks. Two tasks conflict if they overlap in time and share a rotator.
+        weights: Weight of each candidate
+        time_budget: Maximum time in seconds used for the local search
+
+    Returns:
+        The selected tasks and statistics of the selection.
+    """
+    deadline = time.monotonic() + time_budget
+    started = time.monotonic()
+    stats = { "candidates": len(candidates), "groups": 0, "exact_groups": 0, "budget_exhausted": False }
+
+    selected = []  # Indices to candidates
+    for group in _conflict_groups(candidates):
+        stats["groups"] += 1
+        if len(group) == 1:
+            selected.extend(group)
+            continue
+
+        group_weights = [ weights[i] for i in group ]
+        group_tasks = [ candidates[i] for i in group ]
+        if set.intersection(*(set(task.rotators) for task in group_tasks)):
+            stats["exact_groups"] += 1
+            chosen = _weighted_interval_selection(group_tasks, group_weights)
+        else:
+            chosen, complete = _local_search(group_tasks, group_weights, deadline)
+            stats["budget_exhausted"] |= not complete
+        selected.extend(group[i] for i in chosen)
+
+    stats["selected"] = len(selected)
+    stats["total_weight"] = sum(weights[i] for i in selected)
+    stats["elapsed"] = time.monotonic() - started
+    return sorted((candidates[i] for i in selected), key=lambda t: t.start_time), stats
+
+
+def _conflict_groups(candidates: Sequence[Task]) -> List[List[int]]:
+    """ Split the candidates to groups of transitively conflicting tasks (indices to candidates) """
+    parent = list(range(len(candidates)))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    by_rotator: Dict[str, List[int]] = {}
+    for i, task in enumerate(candidates):
+        for rotator in set(task.rotators):
+            by_rotator.setdefault(rotator, []).append(i)
+
+    # Sweep each rotator's tasks in start time order and join the tasks overlapping the current cluster
+    for indices in by_rotator.values():
+        indices.sort(key=lambda i: candidates[i].start_time)
+        cluster, cluster_end = None, None
+        for i in indices:
+            task = candidates[i]
+            if cluster is not None and task.start_time < cluster_end:
+                parent[find(i)] = find(cluster)
+                cluster_end = max(cluster_end, task.end_time)
+            else:
+                cluster, cluster_end = i, task.end_time
+
+    groups: Dict[int, List[int]] = {}
+    for i in range(len(candidates)):
+        groups.setdefault(find(i), []).append(i)
+    return list(groups.values())
+
+
+def _weighted_interval_selection(tasks: List[Task], weights: List[float]) -> List[int]:
+    """ Exact weighted interval scheduling for tasks which all conflict when overlapping """
+    order = sorted(range(len(tasks)), key=lambda i: tasks[i].end_time)
+    ends = [ tasks[i].end_time for i in order ]
+
+    # best[j] is the best total weight using the first j tasks in end time order
+    best = [ 0.0 ] * (len(order) + 1)
+    take = [ False ] * len(order)
+    previous = [ 0 ] * len(order)
+    for j, i in enumerate(order):
+        previous[j] = bisect_right(ends, tasks[i].start_time, 0, j)
+        with_task = weights[i] + best[previous[j]]
+        take[j] = with_task > best[j]
+        best[j + 1] = with_task if take[j] else best[j]
+
+    chosen = []
+    j = len(order)
+    while j > 0:
+        if take[j - 1]:
+            chosen.append(order[j - 1])
+            j = previous[j - 1]
+        else:
+            j -= 1
+    return chosen
+
+
+def _local_search(tasks: List[Task], weights: List[float], deadline: float) -> Tuple[List[int], bool]:
+    """
+    Greedy selection by weight improved by swapping in a task and evicting its conflicts
+    whenever that increases the total weight.
+
+    Returns:
+        Selected task indices and whether the search completed before the deadline.
+    """
+    # Conflict lists using a start time sweep
+    order = sorted(range(len(tasks)), key=lambda i: tasks[i].start_time)
+    conflicts: List[List[int]] = [ [] for _ in tasks ]
+    for a, i in enumerate(order):
+        for j in order[a + 1:]:
+            if tasks[j].start_time >= tasks[i].end_time:
+                break
+            if not tasks[i].is_outside(tasks[j]):
+                conflicts[i].append(j)
+                conflicts[j].append(i)
+
+    by_weight = sorted(range(len(tasks)), key=lambda i: weights[i], reverse=True)
+    selected = [ False ] * len(tasks)
+    for i in by_weight:
+        if not any(selected[j] for j in conflicts[i]):
+            selected[i] = True
+
+    improved = True
+    while improved:
+        improved = False
+        for i in by_weight:
+            if time.monotonic() > deadline:
+                return [ i for i in range(len(tasks)) if selected[i] ], False
+            if selected[i]:
+                continue
+            evicted = [ j for j in conflicts[i] if selected[j] ]
+            if weights[i] > sum(weights[j] for j in evicted):
+                for j in evicted:
+                    selected[j] = False
+                selected[i] = True
+                improved = True
+
+    return [ i for i in range(len(tasks)) if selected[i] ], True
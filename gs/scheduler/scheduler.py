@@ -2,7 +2,12 @@
     Scheduler
 """
 
+import copy
+import time
+import heapq
 import asyncio
+import sqlite3
+import itertools
 from collections import OrderedDict
 from typing import List, Union, Optional
 import yaml
@@ -12,6 +17,9 @@ from datetime import datetime, timedelta, timezone
 from porthouse.core.config import cfg_path
 from porthouse.core.basemodule_async import BaseModule, RPCError, rpc, bind, RPCRequestTimeout
 from porthouse.gs.scheduler.model import Schedule, TaskStatus, Process, Task
+from porthouse.gs.scheduler.file_sync import WatchedFile, WriteBehind, diff_entries, yaml_dump, yaml_load
+from porthouse.gs.scheduler.journal import ScheduleJournal
+from porthouse.gs.scheduler.optimizer import priority_weights, select_tasks
 from porthouse.gs.tracking.gnss_tracker import PointTracker
 from porthouse.gs.tracking.orbit_tracker import OrbitTracker
 from porthouse.gs.tracking.utils import SkyfieldModuleMixin, CelestialObject, parse_time
@@ -24,11 +32,32 @@ class Scheduler(SkyfieldModuleMixin, BaseModule):
 
     MISC_TRACKER_PREFIX = "misc:"
 
+    # Timer kinds. At the same instant, the ending tasks are dispatched before the starting ones.
+    (TIMER_END, TIMER_START) = range(2)
+    MAX_TIMER_SLEEP = 60.0
+
     def __init__(self, main_processes_file="processes.yaml", misc_processes_file="misc-processes.yaml",
-                 main_schedule_file="schedule.yaml", misc_schedule_file="misc-schedule.yaml", **kwargs):
+                 main_schedule_file="schedule.yaml", misc_schedule_file="misc-schedule.yaml",
+                 write_interval=2.0, journal_file="schedule.db", history_retention=24*3600,
+                 compact_interval=3600, sync_interval=1.0, scheduling_mode="greedy", optimizer_time_budget=5.0,
+                 **kwargs):
         """
         Initialization
+
+        Args:
+            write_interval: Minimum time in seconds between writes of the processes and schedule files
+            journal_file: SQLite database where the tasks are persisted. If None, the schedule
+                YAML files are used as the storage and rewritten on every change.
+            history_retention: Time in seconds the executed and cancelled tasks are kept
+            compact_interval: Interval in seconds for purging the old tasks and compacting the journal
+            sync_interval: Interval in seconds for checking the processes and schedule files for changes
+            scheduling_mode: "greedy" places the processes in priority order and fits the later tasks into the
+                gaps. "optimal" collects the passes of all processes and selects the combination maximizing
+                the sum of priority weight × duration.
+            optimizer_time_budget: Maximum time in seconds for the optimal scheduling search
         """
+        if scheduling_mode not in ("greedy", "optimal"):
+            raise ValueError(f"Unknown scheduling mode {scheduling_mode!r}")
         super().__init__(**kwargs)
 
         self.main_processes_file = main_processes_file
@@ -37,10 +66,21 @@ class Scheduler(SkyfieldModuleMixin, BaseModule):
 
         self.main_schedule_file = main_schedule_file
         self.misc_schedule_file = misc_schedule_file
+        self.sync_interval = sync_interval
+        self.scheduling_mode = scheduling_mode
+        self.optimizer_time_budget = optimizer_time_budget
+
+        # Heap of (deadline, kind, seq, task) timers for the task starts and ends. The timers are armed
+        # whenever a task is added or changed and the stale ones are skipped when popped.
+        self._timers = []
+        self._timer_seq = itertools.count()
+        self._timer_wakeup = asyncio.Event()
+        self._executor_task = None
+
         self.schedule = Schedule()
+        self.schedule.on_change = self._arm_task
         self.schedule_updated_date = None
         self._create_schedule_task = None
-        self._debug_log_time = datetime.utcfromtimestamp(0).replace(tzinfo=timezone.utc)
 
         # Schedule updating via execution, new task creation, api task addition & removal  can in general be done
         # concurrently. However, schedule updating by reloading the schedule file should be done exclusively.
@@ -51,6 +91,33 @@ class Scheduler(SkyfieldModuleMixin, BaseModule):
 
         self.sync_schedule_files = True
 
+        # The files are re-read only when changed. The last known content of each file is kept as
+        # a name -> dict mapping so that only the changed processes and tasks are applied.
+        self._process_files = {
+            Process.STORAGE_MAIN: WatchedFile(cfg_path(main_processes_file)),
+            Process.STORAGE_MISC: WatchedFile(cfg_path(misc_processes_file)),
+        }
+        self._schedule_files = {
+            Task.STORAGE_MAIN: WatchedFile(cfg_path(main_schedule_file)),
+            Task.STORAGE_MISC: WatchedFile(cfg_path(misc_schedule_file)),
+        }
+        self._process_entries = {storage: {} for storage in self._process_files}
+        self._schedule_entries = {storage: {} for storage in self._schedule_files}
+        self._write_main_processes = False
+        self._processes_writer = WriteBehind(self._write_processes_files, write_interval)
+        self._schedule_writer = WriteBehind(self._write_schedule_files, write_interval)
+
+        # With the journal, only the changed tasks are written. The schedule YAML files are
+        # still read for manual edits but written only when explicitly exported.
+        self.history_retention = timedelta(seconds=history_retention)
+        self.compact_interval = timedelta(seconds=compact_interval)
+        self._next_compaction = datetime.now(timezone.utc) + self.compact_interval
+        self.journal = None
+        if journal_file is not None:
+            self.journal = ScheduleJournal(cfg_path(journal_file))
+            self._journal_writer = WriteBehind(self._write_journal, 0)
+            self._load_journal()
+
         loop = asyncio.get_event_loop()
         task = loop.create_task(self.setup(), name="scheduler.setup")
         task.add_done_callback(self.task_done_handler)
@@ -58,7 +125,7 @@ class Scheduler(SkyfieldModuleMixin, BaseModule):
     async def setup(self):
         self.gs_rotators = await self.check_rotators(self.gs.config["rotators"])
 
-        await asyncio.sleep(5)  # sleep so that tle server has time to load the tles
+        await self.wait_for_ready("tracking", "tle", timeout=60)
         tle_list = await self.send_rpc_request("tracking", "tle.rpc.get_tle", timeout=6)
         self.tle_sats = [tle["name"] for tle in tle_list["tle"]]
 
@@ -67,73 +134,161 @@ class Scheduler(SkyfieldModuleMixin, BaseModule):
             if proc["tracker"] == OrbitTracker.TRACKER_TYPE and proc["target"] not in self.tle_sats:
                 raise RuntimeError("No TLEs configured for %s", proc["target"])
 
+        self._executor_task = asyncio.get_event_loop().create_task(self.run_executor(), name="scheduler.executor")
+        self._executor_task.add_done_callback(self.task_done_handler)
+
         while True:
-            await self.execute_schedule()
-            await asyncio.sleep(1)
+            await self.maintain_schedule()
+            await asyncio.sleep(self.sync_interval)
 
     async def check_rotators(self, rotators: List[str]):
         """
         Check if rotators are available.
         """
-        await asyncio.sleep(1)
+        statuses, errors = await self.send_rpc_requests({
+            prefix: ("rotator", f"{prefix}.rpc.status") for prefix in rotators
+        }, timeout=2)
 
-        available_rotators = []
-        for prefix in rotators:
-            try:
-                status = await self.send_rpc_request("rotator", f"{prefix}.rpc.status", timeout=2)
-                if len(status):
-                    available_rotators.append(prefix)
-            except (RPCRequestTimeout, asyncio.exceptions.TimeoutError):
+        available_rotators = [prefix for prefix in rotators if len(statuses.get(prefix, {}))]
+        for prefix, exc in errors.items():
+            if isinstance(exc, (RPCRequestTimeout, asyncio.exceptions.TimeoutError)):
                 self.log.warning(f"Rotator {prefix} not available")
+            else:
+                self.log.error(f"Failed to query rotator {prefix} status: {exc!r}")
 
         self.log.debug(f"Available rotators: {available_rotators}")
         return rotators
 
-    async def execute_schedule(self):
+    async def maintain_schedule(self):
         """
-        Executes the schedule (i.e. checks for passes), starts/stops tracking accordingly, creates new tasks
-        every 24h.
+        Applies the changes made to the processes and schedule files, compacts the schedule history and
+        creates new tasks every 24h.
         """
-        await asyncio.sleep(0)
-
-        write_schedule = False
         if not self.schedule_lock.locked():
             # update schedule from file if schedule is not being updated by another task
             self.read_processes()
-            write_schedule = self.sync_schedule_files
             await self.read_schedule()
 
-        now = datetime.now(timezone.utc).replace(microsecond=0)  # + timedelta(minutes=1*60 + 3)
+        now = datetime.now(timezone.utc)
+        if now >= self._next_compaction:
+            self.compact_schedule(now)
+
+        self.maybe_start_schedule_creation()
+
+    async def run_executor(self):
+        """
+        Executes the schedule. Sleeps until the next task start or end, or until the timers are re-armed.
+        """
+        next_task = None
+        while True:
+            self._timer_wakeup.clear()
+            await self.execute_schedule()
+
+            delay = self.MAX_TIMER_SLEEP
+            if self._timers:
+                deadline, _, _, task = self._timers[0]
+                delay = min(max(deadline - time.time(), 0), delay)
+                if task is not next_task:
+                    next_task = task
+                    self.log.debug(f"Next timer for task \"{task.task_name}\" in {delay:.3f} s")
+
+            try:
+                await asyncio.wait_for(self._timer_wakeup.wait(), delay)
+            except asyncio.TimeoutError:
+                pass
 
-        # check for tasks that should start
-        for task in self.schedule.start_times:
-            if task.start_time <= now < task.end_time and task.status == TaskStatus.SCHEDULED:
+    async def execute_schedule(self):
+        """
+        Starts and ends the tasks whose timers have expired and removes the ended tasks from the schedule.
+        """
+        modified = False
+        while self._timers and self._timers[0][0] <= time.time():
+            deadline, kind, _, task = heapq.heappop(self._timers)
+            if self.schedule.tasks.get(task.task_name) is not task:
+                continue  # Removed or replaced
+
+            now = datetime.now(timezone.utc)
+            if kind == Scheduler.TIMER_START:
+                if task.start_time.timestamp() != deadline or task.status != TaskStatus.SCHEDULED \
+                        or now >= task.end_time:
+                    continue
+                self._report_dispatch_latency(task, now - task.start_time)
                 await self.start_task(task)
-            elif task.start_time > now:
-                if self._debug_log_time + timedelta(seconds=10) <= now:
-                    self._debug_log_time = now
-                    self.log.debug(f"Task \"{task.task_name}\" starting in {task.start_time - now}"
-                                   f" ({task.start_time}) channel ok: {not self.channel.is_closed}")
-                break
-
-        # check for tasks that should be terminated or removed
-        remove_tasks = []
-        for task in self.schedule.end_times:
-            if now >= task.end_time and task.status == TaskStatus.ONGOING:
-                remove_tasks.append(task)
-                await self.end_task(task)
-            elif now >= task.end_time:
-                remove_tasks.append(task)
-            elif task.end_time > now:
-                break
-
-        for task in remove_tasks:
-            self.schedule.remove(task)
 
-        if write_schedule:
+            else:
+                if task.end_time.timestamp() != deadline:
+                    continue
+                if task.status == TaskStatus.ONGOING:
+                    self._report_dispatch_latency(task, now - task.end_time)
+                    await self.end_task(task)
+                self.schedule.remove(task)
+
+            modified = True
+
+        if modified:
             self.write_schedule()
 
-        self.maybe_start_schedule_creation()
+    def _arm_task(self, task):
+        """
+        Pushes the start and end timers of a new or changed task and wakes up the executor.
+        """
+        if self.schedule.tasks.get(task.task_name) is not task:
+            return
+
+        for kind, deadline in ((Scheduler.TIMER_END, task.end_time), (Scheduler.TIMER_START, task.start_time)):
+            heapq.heappush(self._timers, (deadline.timestamp(), kind, next(self._timer_seq), task))
+
+        if len(self._timers) > 2 * len(self.schedule) + 64:
+            # Too many stale timers, rebuild the heap
+            self._timers = [(deadline.timestamp(), kind, next(self._timer_seq), t)
+                            for t in self.schedule
+                            for kind, deadline in ((Scheduler.TIMER_END, t.end_time),
+                                                   (Scheduler.TIMER_START, t.start_time))]
+            heapq.heapify(self._timers)
+
+        self._timer_wakeup.set()
+
+    def _report_dispatch_latency(self, task, latency: timedelta):
+        """
+        Records the delay between the planned and the actual task start/end.
+        """
+        latency = latency.total_seconds()
+        if self.metrics is not None:
+            self.metrics.observe("scheduler.dispatch_latency", latency)
+        self.log.debug(f"Task \"{task.task_name}\" dispatched {latency * 1e3:.1f} ms after the planned time")
+
+    async def stop(self, timeout: float = 5):
+        """
+        Write the pending changes to the files and stop the module.
+        """
+        if self._executor_task is not None:
+            self._executor_task.cancel()
+            self._executor_task = None
+        self._processes_writer.flush()
+        self._schedule_writer.flush()
+        if self.journal is not None:
+            self.write_schedule()
+            self._journal_writer.flush()
+            self.journal.close()
+            self.journal = None
+        await super().stop(timeout)
+
+    def compact_schedule(self, now=None):
+        """
+        Forget the executed and cancelled tasks older than the history retention time and compact the journal.
+        """
+        now = now or datetime.now(timezone.utc)
+        self._next_compaction = now + self.compact_interval
+        pruned = self.schedule.prune_deleted(now - self.history_retention)
+        if self.journal is not None:
+            self.write_schedule()
+            self._journal_writer.flush()
+            try:
+                pruned = self.journal.compact(now - self.history_retention)
+            except sqlite3.Error as e:
+                self.log.error(f"Failed to compact schedule journal: {e}", exc_info=True)
+                return
+        self.log.debug(f"Schedule compacted, {pruned} old tasks purged")
 
     def maybe_start_schedule_creation(self, start_time=None, end_time=None, force=False, process_name=None):
         """
@@ -177,49 +332,80 @@ class Scheduler(SkyfieldModuleMixin, BaseModule):
 
     def read_processes(self):
         """
-        Read processes from file
+        Read the changed processes files and apply the changed processes
         """
         if not self.sync_schedule_files:
             return
 
-        self.processes = OrderedDict()
+        for storage, watched in self._process_files.items():
+            content = watched.read_if_changed()
+            if content is None:
+                continue
+            if not watched.exists and storage == Process.STORAGE_MAIN:
+                self.log.error(f"Failed to open processes file {watched.path}")
 
-        for file, storage in ((self.main_processes_file, Process.STORAGE_MAIN),
-                              (self.misc_processes_file, Process.STORAGE_MISC)):
             try:
-                with open(cfg_path(file), "r") as fp:
-                    processes = yaml.load(fp, Loader=yaml.Loader)
-            except FileNotFoundError:
-                if storage == Process.STORAGE_MAIN:
-                    self.log.error(f"Failed to open processes file {file}", exc_info=True)
+                entries = {proc["process_name"]: proc for proc in (yaml_load(content) or [])}
+            except (yaml.YAMLError, KeyError, TypeError) as e:
+                self.log.error(f"Failed to read processes file {watched.path}: {e}", exc_info=True)
                 continue
 
-            for proc in (processes or []):
-                proc = Process.from_dict(proc, storage=storage)
+            removed, changed = diff_entries(self._process_entries[storage], entries)
+            self._process_entries[storage] = entries
+
+            for process_name in removed:
+                if process_name in self.processes and self.processes[process_name].storage == storage:
+                    del self.processes[process_name]
+
+            for process_name, data in changed.items():
+                try:
+                    proc = Process.from_dict(data, storage=storage)
+                except KeyError as e:
+                    self.log.error(f"Process {process_name} in {watched.path} missing field {e}")
+                    continue
                 if storage == Process.STORAGE_MAIN or not proc.expired():
                     self.processes[proc.process_name] = proc
 
+            if removed or changed:
+                self.log.debug(f"Processes file {watched.path} changed: {len(removed)} removed, "
+                               f"{len(changed)} added or updated")
+
     def write_processes(self, skip_main=True):
         """
-        Write schedule to YAML file
+        Request writing the processes to the YAML files. The writes are coalesced.
         """
         if not self.sync_schedule_files:
             return
 
-        for file, storage in ((self.main_processes_file, Process.STORAGE_MAIN),
-                              (self.misc_processes_file, Process.STORAGE_MISC)):
-            if skip_main and storage == Process.STORAGE_MAIN:
-                # TODO: should we be able to write main processes file or not?
+        # TODO: should we be able to write main processes file or not?
+        self._write_main_processes |= not skip_main
+        self._processes_writer.request()
+
+    def _write_processes_files(self):
+        """
+        Write the processes to the YAML files
+        """
+        if not self.sync_schedule_files:
+            return
+
+        # Don't overwrite changes made to the files after the last read
+        self.read_processes()
+
+        for storage, watched in self._process_files.items():
+            if storage == Process.STORAGE_MAIN and not self._write_main_processes:
                 continue
 
             processes = [proc.to_dict() for proc in self.processes.values()
                          if proc.storage == storage and (storage == Process.STORAGE_MAIN or not proc.expired())]
 
             try:
-                with open(cfg_path(file), "w") as fp:
-                    yaml.dump(processes, fp, indent=4, sort_keys=False)
+                watched.write(yaml_dump(processes))
             except Exception as e:
-                self.log.error(f"Failed to write schedule file {file}: {e}", exc_info=True)
+                self.log.error(f"Failed to write processes file {watched.path}: {e}", exc_info=True)
+            else:
+                self._process_entries[storage] = {proc["process_name"]: copy.deepcopy(proc) for proc in processes}
+
+        self._write_main_processes = False
 
     def add_process(self, process_dict, deny_main=True):
         """
@@ -258,8 +444,10 @@ class Scheduler(SkyfieldModuleMixin, BaseModule):
                 if task.process_name == process.process_name:
                     if process.enabled and task.status == TaskStatus.NOT_SCHEDULED:
                         task.status = TaskStatus.SCHEDULED
+                        self.schedule.touch(task)
                     elif not process.enabled and task.status == TaskStatus.SCHEDULED:
                         task.status = TaskStatus.NOT_SCHEDULED
+                        self.schedule.touch(task)
             self.write_schedule()
         return True
 
@@ -292,42 +480,127 @@ class Scheduler(SkyfieldModuleMixin, BaseModule):
             return
 
         async with self.schedule_lock:
-            self.schedule = Schedule()
+            self._read_schedule_files()
 
-            for file, storage in ((self.main_schedule_file, Task.STORAGE_MAIN),
-                                  (self.misc_schedule_file, Task.STORAGE_MISC)):
-                try:
-                    with open(cfg_path(file), "r") as fp:
-                        schedule = yaml.load(fp, Loader=yaml.Loader) or []
-                except FileNotFoundError:
-                    schedule = []
+    def _read_schedule_files(self):
+        """
+        Read the changed schedule files and apply the changed tasks to the schedule
+        """
+        for storage, watched in self._schedule_files.items():
+            content = watched.read_if_changed()
+            if content is None:
+                continue
 
+            try:
+                entries = {task.get("task_name", "unnamed task"): task for task in (yaml_load(content) or [])}
+            except (yaml.YAMLError, AttributeError, TypeError) as e:
+                self.log.error(f"Failed to read schedule file {watched.path}: {e}", exc_info=True)
+                continue
+
+            removed, changed = diff_entries(self._schedule_entries[storage], entries)
+            self._schedule_entries[storage] = entries
+
+            for task_name in removed:
+                self.schedule.discard(task_name)
+
+            for task_name, data in changed.items():
+                previous = self.schedule.discard(task_name)
                 try:
-                    for task in schedule:
-                        self.schedule.add(Task.from_dict(task, storage=storage))
-                except ValueError as e:
-                    self.log.error(f"Failed to read schedule file {file}: {e}", exc_info=True)
+                    self.schedule.add(Task.from_dict(data, storage=storage))
+                except (KeyError, ValueError) as e:
+                    self.log.error(f"Failed to read task {task_name} from schedule file {watched.path}: {e}")
+                    if previous is not None:
+                        self.schedule.add(previous)
+
+            if removed or changed:
+                self.log.debug(f"Schedule file {watched.path} changed: {len(removed)} removed, "
+                               f"{len(changed)} added or updated")
 
     def write_schedule(self):
         """
-        Write schedule to YAML file
+        Request persisting the schedule changes. The writes are coalesced.
         """
-        if not self.sync_schedule_files:
+        if self.journal is not None:
+            self._journal_writer.request()
+        elif self.sync_schedule_files:
+            self.schedule.modified.clear()
+            self._schedule_writer.request()
+
+    def _load_journal(self):
+        """
+        Load the schedule from the journal. If the journal is empty, the existing schedule
+        YAML files are imported on the first read.
+        """
+        entries = self.journal.load()
+        for storage, data in entries:
+            try:
+                self.schedule.add(Task.from_dict(data, storage=storage))
+            except (KeyError, ValueError) as e:
+                self.log.error(f"Failed to load task {data.get('task_name')} from the journal: {e}")
+        self.schedule.modified.clear()
+
+        if entries:
+            # The journal is up to date. Take the current YAML files as the baseline so that
+            # only later edits are imported.
+            for storage, watched in self._schedule_files.items():
+                content = watched.read_if_changed()
+                try:
+                    schedule = yaml_load(content) or []
+                    self._schedule_entries[storage] = {task.get("task_name", "unnamed task"): task for task in schedule}
+                except (yaml.YAMLError, AttributeError, TypeError):
+                    pass
+        self.log.info(f"Loaded {len(self.schedule)} tasks from the schedule journal {self.journal.path}")
+
+    def _write_journal(self):
+        """
+        Write the modified tasks to the journal
+        """
+        modified = self.schedule.pop_modified()
+        tasks, deleted = [], []
+        for task_name in modified:
+            task = self.schedule.get(task_name)
+            if task is not None:
+                tasks.append(task)
+            else:
+                deleted.append(task_name)
+
+        try:
+            self.journal.write(tasks, deleted)
+        except sqlite3.Error as e:
+            self.log.error(f"Failed to write schedule journal: {e}", exc_info=True)
+            self.schedule.modified |= modified
+
+    def export_schedule_files(self):
+        """
+        Write the schedule to the YAML files now
+        """
+        self._write_schedule_files(force=True)
+
+    def _write_schedule_files(self, force=False):
+        """
+        Write the schedule to the YAML files
+        """
+        if not (self.sync_schedule_files or force):
             return
 
-        for file, storage in ((self.main_schedule_file, Task.STORAGE_MAIN),
-                              (self.misc_schedule_file, Task.STORAGE_MISC)):
+        # Don't overwrite changes made to the files after the last read
+        if self.sync_schedule_files and not self.schedule_lock.locked():
+            self._read_schedule_files()
+
+        now = datetime.now(timezone.utc)
+        for storage, watched in self._schedule_files.items():
             schedule = [task.to_dict()
                         for task in self.schedule.all()
                         if task.storage == storage and (
                             task.status not in (TaskStatus.EXECUTED, TaskStatus.CANCELLED)
-                            or (datetime.now(timezone.utc) - task.end_time) < timedelta(hours=24))]
+                            or (now - task.end_time) < self.history_retention)]
 
             try:
-                with open(cfg_path(file), "w") as fp:
-                    yaml.dump(schedule, fp, indent=4, sort_keys=False)
+                watched.write(yaml_dump(schedule))
             except Exception as e:
-                self.log.error(f"Failed to write schedule file {file}: {e}", exc_info=True)
+                self.log.error(f"Failed to write schedule file {watched.path}: {e}", exc_info=True)
+            else:
+                self._schedule_entries[storage] = {task["task_name"]: copy.deepcopy(task) for task in schedule}
 
     def add_task(self, task_dict, deny_main=True, mode='strict'):
         """
@@ -406,6 +679,7 @@ class Scheduler(SkyfieldModuleMixin, BaseModule):
         process_data.update(task.process_overrides or {})
         process_data = {k: v for k, v in process_data.items() if k not in ("enabled", "process_name")}
         task.process_overrides = process_data
+        self.schedule.touch(task)
         await self.publish(task.get_task_data(), exchange="scheduler", routing_key="task.start")
 
     async def end_task(self, task):
@@ -455,6 +729,15 @@ class Scheduler(SkyfieldModuleMixin, BaseModule):
                        + ('' if process_name is None else f' for process {process_name} only') + "...")
         self.read_processes()
 
+        if self.scheduling_mode == "optimal":
+            async with self.schedule_lock:
+                added_count = await self._create_schedule_optimal(start_time, end_time, process_name)
+                self.write_schedule()
+            self.log.info(f"Added {added_count} tasks to the schedule between "
+                          f"{start_time.isoformat()} and {end_time.isoformat()}.")
+            self._create_schedule_task = None
+            return
+
         # sort so that higher priority (low prio number) processes are scheduled first
         added_count = 0
         async with self.schedule_lock:
@@ -472,6 +755,49 @@ class Scheduler(SkyfieldModuleMixin, BaseModule):
                       f"{start_time.isoformat()} and {end_time.isoformat()}.")
         self._create_schedule_task = None
 
+    async def _create_schedule_optimal(self, start_time: datetime, end_time: datetime, process_name: str = None):
+        """
+        Create tasks for all the enabled processes and add the combination maximizing the total
+        priority weight × duration to the schedule. The already scheduled tasks are kept as they are.
+        The selection is done in the default executor. Returns the number of added tasks.
+        """
+        weights = priority_weights([proc.priority for proc in self.processes.values()])
+        candidates, candidate_weights = [], []
+        for proc in self.processes.values():
+            if process_name is not None and proc.process_name != process_name or not proc.enabled:
+                continue
+
+            tasks = await self.create_tasks(proc, start_time, end_time)
+            for task in tasks:
+                # Cut the candidates around the existing tasks
+                holes = [(t.start_time, t.end_time)
+                         for t in self.schedule.get_overlapping(task.start_time, task.end_time, task.rotators)]
+                for piece in (task.split(holes) if holes else [task]):
+                    if piece.is_valid(proc):
+                        candidates.append(piece)
+                        candidate_weights.append(weights[proc.priority] *
+                                                 (piece.end_time - piece.start_time).total_seconds())
+
+        # The search is CPU bound and may take the whole time budget, so it's run in a worker thread
+        # to keep the event loop responsive. The thread gets its own copies of the candidates.
+        selected, stats = await asyncio.get_running_loop().run_in_executor(
+            None, select_tasks, [task.copy() for task in candidates], list(candidate_weights),
+            self.optimizer_time_budget)
+        self.log.debug(f"Selected {stats['selected']}/{stats['candidates']} candidate tasks in {stats['groups']} "
+                       f"groups ({stats['exact_groups']} solved exactly) in {stats['elapsed']:.3f} s, "
+                       f"total weight {stats['total_weight']:.0f}")
+        if stats["budget_exhausted"]:
+            self.log.warning(f"Schedule optimization time budget of {self.optimizer_time_budget} s exhausted")
+
+        added_count = 0
+        for task in selected:
+            try:
+                self.schedule.add(task)
+                added_count += 1
+            except ValueError as e:
+                self.log.error(f"Failed to add optimized task {task.task_name}: {e}")
+        return added_count
+
     def add_tasks(self, tasks: Union[List['Task'], 'Task'], mode='strict'):
         """
         Add tasks to the schedule
@@ -523,10 +849,10 @@ class Scheduler(SkyfieldModuleMixin, BaseModule):
                 self.schedule.remove(sched_task)
 
             elif sched_task.is_reaching_into(new_task):
-                sched_task.end_time = new_task.start_time - timedelta(seconds=1)
+                self.schedule.update_times(sched_task, end_time=new_task.start_time - timedelta(seconds=1))
 
             elif sched_task.is_reaching_out(new_task):
-                sched_task.start_time = new_task.end_time + timedelta(seconds=1)
+                self.schedule.update_times(sched_task, start_time=new_task.end_time + timedelta(seconds=1))
 
             elif sched_task.is_encompassing(new_task):
                 subtasks = sched_task.split([(new_task.start_time, new_task.end_time)])
@@ -693,6 +1019,18 @@ class Scheduler(SkyfieldModuleMixin, BaseModule):
             if "enable" not in request_data:
                 raise RPCError("enable (bool) parameter not given")
             self.sync_schedule_files = request_data["enable"]
+            if self.sync_schedule_files:
+                # Apply the manual edits and write the changes made while the sync was disabled
+                self.write_processes()
+                self.write_schedule()
+            return {"success": True}
+
+        elif request_name == "rpc.export_schedule_files":
+            #
+            # Write the current schedule to the schedule YAML files, e.g. for manual editing.
+            # The edits are imported while the schedule file sync is enabled.
+            #
+            self.export_schedule_files()
             return {"success": True}
 
         elif request_name == "rpc.get_potential_tasks":
@@ -0,0 +1,156 @@
+import os
+import stat
+import asyncio
+import tempfile
+import unittest
+from unittest import mock
+
+from porthouse.gs.scheduler.file_sync import WatchedFile, WriteBehind, atomic_write, diff_entries, yaml_dump, yaml_load
+
+
+class TestWatchedFile(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.path = os.path.join(self.tmp.name, "schedule.yaml")
+
+    def touch(self, content, mtime_ns):
+        with open(self.path, "wb") as fp:
+            fp.write(content)
+        os.utime(self.path, ns=(mtime_ns, mtime_ns))
+
+    def test_read_if_changed(self):
+        watched = WatchedFile(self.path)
+
+        # A missing file is reported once as empty
+        self.assertEqual(watched.read_if_changed(), b"")
+        self.assertIsNone(watched.read_if_changed())
+        self.assertFalse(watched.exists)
+
+        self.touch(b"a: 1\n", 1_000_000_000)
+        self.assertEqual(watched.read_if_changed(), b"a: 1\n")
+        self.assertTrue(watched.exists)
+        self.assertIsNone(watched.read_if_changed())
+
+        # Same content with a new modification time
+        self.touch(b"a: 1\n", 2_000_000_000)
+        self.assertIsNone(watched.read_if_changed())
+
+        # Same size and modification time is not even read
+        with mock.patch("builtins.open", side_effect=AssertionError("read")):
+            self.assertIsNone(watched.read_if_changed())
+
+        self.touch(b"a: 2\n", 3_000_000_000)
+        self.assertEqual(watched.read_if_changed(), b"a: 2\n")
+
+        os.unlink(self.path)
+        self.assertEqual(watched.read_if_changed(), b"")
+        self.assertFalse(watched.exists)
+        self.assertIsNone(watched.read_if_changed())
+
+        # An empty file is reported when it replaces a removed one
+        self.touch(b"", 4_000_000_000)
+        self.assertEqual(watched.read_if_changed(), b"")
+        self.assertTrue(watched.exists)
+        self.assertIsNone(watched.read_if_changed())
+
+    def test_write(self):
+        watched = WatchedFile(self.path)
+        watched.write(b"a: 1\n")
+        self.assertTrue(watched.exists)
+        self.assertIsNone(watched.read_if_changed())
+
+        self.touch(b"a: 3\n", 5_000_000_000)
+        self.assertEqual(watched.read_if_changed(), b"a: 3\n")
+
+
+class TestAtomicWrite(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.path = os.path.join(self.tmp.name, "tasks.yaml")
+
+    def test_atomic_write(self):
+        atomic_write(self.path, b"first")
+        os.chmod(self.path, 0o640)
+        atomic_write(self.path, b"second")
+        with open(self.path, "rb") as fp:
+            self.assertEqual(fp.read(), b"second")
+        # The file mode is kept and no temporary files are left
+        self.assertEqual(stat.S_IMODE(os.stat(self.path).st_mode), 0o640)
+        self.assertEqual(os.listdir(self.tmp.name), [ "tasks.yaml" ])
+
+    def test_failed_write(self):
+        atomic_write(self.path, b"original")
+        with mock.patch("porthouse.gs.scheduler.file_sync.os.replace", side_effect=OSError("disk full")):
+            with self.assertRaises(OSError):
+                atomic_write(self.path, b"new")
+        with open(self.path, "rb") as fp:
+            self.assertEqual(fp.read(), b"original")
+        self.assertEqual(os.listdir(self.tmp.name), [ "tasks.yaml" ])
+
+
+class TestDiffEntries(unittest.TestCase):
+
+    def test_diff_entries(self):
+        old = { "a": { "x": 1 }, "b": { "x": 2 }, "c": { "x": 3 } }
+        new = { "b": { "x": 2 }, "c": { "x": 4 }, "d": { "x": 5 } }
+        removed, changed = diff_entries(old, new)
+        self.assertEqual(removed, [ "a" ])
+        self.assertEqual(changed, { "c": { "x": 4 }, "d": { "x": 5 } })
+        self.assertEqual(diff_entries(new, new), ([], {}))
+        self.assertEqual(diff_entries({}, new), ([], new))
+
+    def test_yaml(self):
+        data = { "tasks": [ { "name": "b", "rotators": [ "uhf" ] }, { "name": "a" } ] }
+        content = yaml_dump(data)
+        self.assertEqual(yaml_load(content), data)
+        # Key order is preserved
+        self.assertLess(content.index(b"name"), content.index(b"rotators"))
+
+
+class TestWriteBehind(unittest.IsolatedAsyncioTestCase):
+
+    async def test_coalescing(self):
+        writes = []
+        loop = asyncio.get_running_loop()
+        writer = WriteBehind(lambda: writes.append(loop.time()), interval=0.1)
+
+        # First write is done right away
+        writer.request()
+        writer.request()
+        self.assertEqual(writes, [])
+        await asyncio.sleep(0.01)
+        self.assertEqual(len(writes), 1)
+        self.assertFalse(writer.pending)
+
+        # Requests within the interval are coalesced to one delayed write
+        for _ in range(5):
+            writer.request()
+            await asyncio.sleep(0.01)
+        self.assertEqual(len(writes), 1)
+        await asyncio.sleep(0.1)
+        self.assertEqual(len(writes), 2)
+        self.assertGreaterEqual(writes[1] - writes[0], 0.1)
+
+    async def test_flush_and_cancel(self):
+        writes = []
+        writer = WriteBehind(lambda: writes.append(True), interval=10)
+        writer.flush()
+        self.assertEqual(writes, [])
+
+        writer.request()
+        writer.flush()
+        self.assertEqual(writes, [ True ])
+
+        writer.request()
+        writer.cancel()
+        self.assertFalse(writer.pending)
+        writer.flush()
+        self.assertEqual(writes, [ True ])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,136 @@
+import os
+import sqlite3
+import logging
+import tempfile
+import unittest
+from datetime import datetime, timedelta, timezone
+from unittest import mock
+
+from porthouse.gs.scheduler.journal import ScheduleJournal
+from porthouse.gs.scheduler.file_sync import WriteBehind
+from porthouse.gs.scheduler.model import Schedule, Task, TaskStatus
+from porthouse.gs.scheduler.scheduler import Scheduler
+
+
+T0 = datetime(2030, 1, 1, tzinfo=timezone.utc)
+
+
+def make_task(name, start, duration, status=TaskStatus.SCHEDULED, storage=Task.STORAGE_MAIN):
+    task = Task()
+    task.task_name = name
+    task.start_time = T0 + timedelta(seconds=start)
+    task.end_time = task.start_time + timedelta(seconds=duration)
+    task.rotators = ["uhf"]
+    task.status = status
+    task.storage = storage
+    task.process_name = name.split(" #")[0]
+    return task
+
+
+class TestScheduleJournal(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.path = os.path.join(self.tmp.name, "schedule.db")
+        self.journal = ScheduleJournal(self.path)
+
+    def tearDown(self):
+        try:
+            self.journal.close()
+        except sqlite3.ProgrammingError:
+            pass # Already closed
+
+    def test_write_and_load(self):
+        a = make_task("A #1", 600, 60)
+        b = make_task("B #1", 0, 60, storage=Task.STORAGE_MISC)
+        c = make_task("C #1", 300, 60)
+        self.journal.write([a, b, c])
+        self.assertEqual(len(self.journal), 3)
+
+        # Upsert and delete in the same write
+        a.status = TaskStatus.ONGOING
+        self.journal.write([a], deleted=["C #1", "nonexistent"])
+
+        self.journal.close()
+        self.journal = ScheduleJournal(self.path)
+        entries = self.journal.load()
+        self.assertEqual([ (storage, data["task_name"]) for storage, data in entries ],
+                         [ (Task.STORAGE_MISC, "B #1"), (Task.STORAGE_MAIN, "A #1") ])
+        self.assertEqual(entries[1][1]["status"], "ONGOING")
+
+        loaded = Task.from_dict(entries[1][1], storage=entries[1][0])
+        self.assertEqual((loaded.task_name, loaded.start_time, loaded.end_time, loaded.rotators),
+                         (a.task_name, a.start_time, a.end_time, a.rotators))
+
+    def test_compact_retention(self):
+        self.journal.write([
+            make_task("Old executed #1", 0, 60, TaskStatus.EXECUTED),
+            make_task("Old cancelled #1", 100, 60, TaskStatus.CANCELLED),
+            make_task("Old scheduled #1", 200, 60),
+            make_task("Recent executed #1", 3600, 60, TaskStatus.EXECUTED),
+            make_task("Future #1", 7200, 60),
+        ])
+        purged = self.journal.compact(T0 + timedelta(seconds=1800))
+        self.assertEqual(purged, 2)
+        self.assertEqual([ data["task_name"] for _, data in self.journal.load() ],
+                         [ "Old scheduled #1", "Recent executed #1", "Future #1" ])
+
+        # The write-ahead log has been checkpointed
+        wal = self.path + "-wal"
+        self.assertTrue(not os.path.exists(wal) or os.path.getsize(wal) == 0)
+        self.assertEqual(self.journal.compact(T0), 0)
+
+
+class TestSchedulerJournal(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+
+        # Skip the broker connection and the configuration files of the __init__
+        self.scheduler = Scheduler.__new__(Scheduler)
+        self.scheduler.log = logging.getLogger("test_scheduler_journal")
+        self.scheduler.schedule = Schedule()
+        self.scheduler.journal = ScheduleJournal(os.path.join(self.tmp.name, "schedule.db"))
+        self.scheduler._journal_writer = WriteBehind(self.scheduler._write_journal, 0)
+        self.addCleanup(self.scheduler.journal.close)
+
+    def test_write_journal(self):
+        schedule = self.scheduler.schedule
+        a, b = make_task("A #1", 0, 60), make_task("B #1", 120, 60)
+        schedule.add(a)
+        schedule.add(b)
+        self.scheduler._write_journal()
+        self.assertEqual(schedule.modified, set())
+        self.assertEqual(len(self.scheduler.journal), 2)
+
+        # Removed tasks are stored with their final status and discarded ones are deleted
+        schedule.remove(a)
+        schedule.discard("B #1")
+        self.scheduler._write_journal()
+        self.assertEqual([ (data["task_name"], data["status"]) for _, data in self.scheduler.journal.load() ],
+                         [ ("A #1", "CANCELLED") ])
+
+    def test_write_journal_error(self):
+        schedule = self.scheduler.schedule
+        schedule.add(make_task("A #1", 0, 60))
+        schedule.add(make_task("B #1", 120, 60))
+
+        # The modified tasks are re-queued when the write fails
+        error = sqlite3.OperationalError("database is locked")
+        with mock.patch.object(self.scheduler.journal, "write", side_effect=error):
+            with self.assertLogs(self.scheduler.log, "ERROR"):
+                self.scheduler._write_journal()
+        self.assertEqual(schedule.modified, { "A #1", "B #1" })
+        self.assertEqual(len(self.scheduler.journal), 0)
+
+        # and written with the later changes on the next write
+        schedule.add(make_task("C #1", 240, 60))
+        self.scheduler._write_journal()
+        self.assertEqual(schedule.modified, set())
+        self.assertEqual(len(self.scheduler.journal), 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
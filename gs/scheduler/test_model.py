@@ -0,0 +1,86 @@
+import random
+import unittest
+from datetime import datetime, timedelta, timezone
+
+from porthouse.gs.scheduler.model import Schedule, Task, TaskStatus
+
+
+T0 = datetime(2030, 1, 1, tzinfo=timezone.utc)
+ROTATORS = ["uhf", "sband", "uhf-b"]
+
+
+def make_task(name, start, duration, rotators):
+    task = Task()
+    task.task_name = name
+    task.start_time = T0 + timedelta(seconds=start)
+    task.end_time = task.start_time + timedelta(seconds=duration)
+    task.rotators = rotators
+    task.process_name = name.split(" #")[0]
+    return task
+
+
+def brute_force_overlapping(schedule, start_time, end_time, rotators):
+    return sorted([t for t in schedule
+                   if t.start_time < end_time and t.end_time > start_time and set(rotators).intersection(t.rotators)],
+                  key=lambda t: t.start_time)
+
+
+class TestSchedule(unittest.TestCase):
+
+    def setUp(self):
+        rnd = random.Random(1)
+        self.schedule = Schedule()
+        for i in range(2000):
+            rotators = rnd.sample(ROTATORS, rnd.randint(1, 2))
+            try:
+                self.schedule.add(make_task(f"P #{i}", rnd.uniform(0, 100000), rnd.choice([0, 60, 600]), rotators))
+            except ValueError:
+                pass
+
+    def check_queries(self):
+        rnd = random.Random(2)
+        for _ in range(200):
+            start_time = T0 + timedelta(seconds=rnd.uniform(-1000, 101000))
+            end_time = start_time + timedelta(seconds=rnd.choice([0, 30, 300, 3000]))
+            rotators = rnd.sample(ROTATORS, rnd.randint(1, 3))
+            self.assertEqual(self.schedule.get_overlapping(start_time, end_time, rotators),
+                             brute_force_overlapping(self.schedule, start_time, end_time, rotators))
+
+    def test_overlapping(self):
+        self.assertGreater(len(self.schedule), 500)
+        self.check_queries()
+
+    def test_add_overlapping_task(self):
+        task = next(iter(self.schedule))
+        with self.assertRaises(ValueError):
+            self.schedule.add(make_task("X #1", (task.start_time - T0).total_seconds() - 10, 20, task.rotators))
+
+    def test_remove_and_update(self):
+        tasks = list(self.schedule)
+        for task in tasks[::3]:
+            self.schedule.remove(task)
+            self.assertEqual(task.status, TaskStatus.CANCELLED)
+        for task in tasks[1::3]:
+            self.schedule.update_times(task, end_time=task.start_time + (task.end_time - task.start_time) / 2)
+        for task in tasks[2::9]:
+            self.assertIs(self.schedule.discard(task.task_name), task)
+
+        self.assertEqual(sum(len(index) for index in self.schedule.by_rotator.values()),
+                         sum(len(set(t.rotators)) for t in self.schedule))
+        self.check_queries()
+
+    def test_free_gaps(self):
+        start_time, end_time = T0, T0 + timedelta(seconds=20000)
+        gaps = self.schedule.get_free_gaps(start_time, end_time, ["uhf", "sband"])
+        for gap_start, gap_end in gaps:
+            self.assertLess(gap_start, gap_end)
+            self.assertEqual(self.schedule.get_overlapping(gap_start, gap_end, ["uhf", "sband"]), [])
+
+        busy = sum(((min(t.end_time, end_time) - max(t.start_time, start_time))
+                    for t in self.schedule.get_overlapping(start_time, end_time, ["uhf", "sband"])), timedelta())
+        free = sum((gap_end - gap_start for gap_start, gap_end in gaps), timedelta())
+        self.assertGreaterEqual(free + busy, end_time - start_time)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,72 @@
+import time
+import random
+import itertools
+import unittest
+from datetime import datetime, timedelta, timezone
+
+from porthouse.gs.scheduler.model import Task
+from porthouse.gs.scheduler.optimizer import priority_weights, select_tasks
+
+
+T0 = datetime(2030, 1, 1, tzinfo=timezone.utc)
+
+
+def random_tasks(rnd, count, rotator_sets, span=20000):
+    tasks, weights = [], []
+    for i in range(count):
+        task = Task()
+        task.task_name = f"P #{i}"
+        task.start_time = T0 + timedelta(seconds=rnd.randint(0, span))
+        task.end_time = task.start_time + timedelta(seconds=rnd.randint(60, 1200))
+        task.rotators = list(rnd.choice(rotator_sets))
+        tasks.append(task)
+        weights.append(rnd.randint(1, 5) * (task.end_time - task.start_time).total_seconds())
+    return tasks, weights
+
+
+def is_feasible(tasks):
+    return all(a.is_outside(b) for a, b in itertools.combinations(tasks, 2))
+
+
+def brute_force(tasks, weights):
+    best = 0
+    for mask in range(1 << len(tasks)):
+        subset = [i for i in range(len(tasks)) if mask >> i & 1]
+        if is_feasible([tasks[i] for i in subset]):
+            best = max(best, sum(weights[i] for i in subset))
+    return best
+
+
+class TestOptimizer(unittest.TestCase):
+
+    def test_priority_weights(self):
+        self.assertEqual(priority_weights([1, 5, 10]), {1: 10, 5: 6, 10: 1})
+
+    def test_single_rotator_is_optimal(self):
+        rnd = random.Random(1)
+        for _ in range(20):
+            tasks, weights = random_tasks(rnd, 12, [("uhf",), ("uhf", "sband")], span=5000)
+            selected, stats = select_tasks(tasks, weights)
+            self.assertTrue(is_feasible(selected))
+            self.assertAlmostEqual(stats["total_weight"], brute_force(tasks, weights))
+
+    def test_shared_rotators(self):
+        rnd = random.Random(2)
+        for _ in range(20):
+            tasks, weights = random_tasks(rnd, 12, [("uhf",), ("sband",), ("uhf", "sband")], span=5000)
+            selected, stats = select_tasks(tasks, weights)
+            self.assertTrue(is_feasible(selected))
+            self.assertLessEqual(stats["total_weight"], brute_force(tasks, weights) + 1e-6)
+
+    def test_week_of_passes(self):
+        rnd = random.Random(3)
+        tasks, weights = random_tasks(rnd, 3000, [("uhf",), ("sband",), ("uhf", "sband"), ("uhf-b",)],
+                                      span=7 * 86400)
+        t = time.monotonic()
+        selected, stats = select_tasks(tasks, weights, time_budget=2.0)
+        self.assertLess(time.monotonic() - t, 5.0)
+        self.assertTrue(is_feasible(selected))
+
+
+if __name__ == '__main__':
+    unittest.main()
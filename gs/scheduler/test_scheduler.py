@@ -0,0 +1,228 @@
+import time
+import asyncio
+import logging
+import itertools
+import threading
+import unittest
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+from unittest import mock
+
+from porthouse.gs.scheduler.model import Process, Schedule, Task, TaskStatus
+from porthouse.gs.scheduler.optimizer import select_tasks
+from porthouse.gs.scheduler.scheduler import Scheduler
+
+
+def make_task(name, start_time, duration, rotators=("uhf", )):
+    task = Task()
+    task.task_name = name
+    task.start_time = start_time
+    task.end_time = start_time + timedelta(seconds=duration)
+    task.rotators = list(rotators)
+    task.process_name = name.split(" #")[0]
+    return task
+
+
+def make_scheduler():
+    """ Create a scheduler without the broker connection and the configuration files """
+    scheduler = Scheduler.__new__(Scheduler)
+    scheduler.log = logging.getLogger("test_scheduler")
+    scheduler.metrics = None
+    scheduler.journal = None
+    scheduler.sync_schedule_files = False
+    scheduler._timers = []
+    scheduler._timer_seq = itertools.count()
+    scheduler._timer_wakeup = asyncio.Event()
+    scheduler.schedule = Schedule()
+    scheduler.schedule.on_change = scheduler._arm_task
+    scheduler.events = []
+
+    async def start_task(task):
+        task.status = TaskStatus.ONGOING
+        scheduler.events.append(("start", task.task_name))
+    async def end_task(task):
+        scheduler.events.append(("end", task.task_name))
+    scheduler.start_task = start_task
+    scheduler.end_task = end_task
+    return scheduler
+
+
+class TestTimers(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.scheduler = make_scheduler()
+        self.schedule = self.scheduler.schedule
+
+        # The timers are compared against a fake clock. The tasks are in the future so that
+        # their start isn't skipped as already ended.
+        self.t0 = datetime.now(timezone.utc).replace(microsecond=0) + timedelta(hours=1)
+        self.now = self.t0.timestamp()
+        patcher = mock.patch("porthouse.gs.scheduler.scheduler.time", SimpleNamespace(time=lambda: self.now))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    async def run_until(self, seconds):
+        self.now = self.t0.timestamp() + seconds
+        await self.scheduler.execute_schedule()
+
+    async def test_start_and_end(self):
+        self.schedule.add(make_task("A #1", self.t0 + timedelta(seconds=10), 60))
+        self.assertTrue(self.scheduler._timer_wakeup.is_set())
+        self.assertEqual(len(self.scheduler._timers), 2)
+
+        await self.run_until(9)
+        self.assertEqual(self.scheduler.events, [])
+        await self.run_until(10)
+        self.assertEqual(self.scheduler.events, [ ("start", "A #1") ])
+        await self.run_until(100)
+        self.assertEqual(self.scheduler.events, [ ("start", "A #1"), ("end", "A #1") ])
+        self.assertEqual(self.schedule.get("A #1").status, TaskStatus.EXECUTED)
+        self.assertEqual(self.scheduler._timers, [])
+
+    async def test_end_before_start(self):
+        # B starts on the same rotator at the same instant A ends
+        self.schedule.add(make_task("B #1", self.t0 + timedelta(seconds=60), 60))
+        self.schedule.add(make_task("A #1", self.t0, 60))
+        await self.run_until(0)
+        await self.run_until(60)
+        self.assertEqual(self.scheduler.events, [ ("start", "A #1"), ("end", "A #1"), ("start", "B #1") ])
+
+    async def test_stale_timers(self):
+        a = make_task("A #1", self.t0 + timedelta(seconds=10), 60)
+        self.schedule.add(a)
+
+        # Replaced with a new task object with the same name
+        self.schedule.discard("A #1")
+        b = make_task("A #1", self.t0 + timedelta(seconds=30), 60)
+        self.schedule.add(b)
+
+        # Removed task
+        c = make_task("C #1", self.t0 + timedelta(seconds=20), 5, rotators=("sband", ))
+        self.schedule.add(c)
+        self.schedule.remove(c)
+
+        self.assertEqual(len(self.scheduler._timers), 6)
+        await self.run_until(29)
+        self.assertEqual(self.scheduler.events, [])
+        # The stale end timer of the replaced task and the timers of the new one are left
+        self.assertEqual(len(self.scheduler._timers), 3)
+        await self.run_until(200)
+        self.assertEqual(self.scheduler.events, [ ("start", "A #1"), ("end", "A #1") ])
+
+    async def test_update_times(self):
+        task = make_task("A #1", self.t0 + timedelta(seconds=10), 60)
+        self.schedule.add(task)
+
+        # Postponed start: the old start timer is stale
+        self.schedule.update_times(task, start_time=self.t0 + timedelta(seconds=20))
+        await self.run_until(15)
+        self.assertEqual(self.scheduler.events, [])
+        await self.run_until(20)
+        self.assertEqual(self.scheduler.events, [ ("start", "A #1") ])
+
+        # Extended end while ongoing
+        self.schedule.update_times(task, end_time=self.t0 + timedelta(seconds=120))
+        await self.run_until(70)
+        self.assertEqual(self.scheduler.events, [ ("start", "A #1") ])
+        await self.run_until(120)
+        self.assertEqual(self.scheduler.events, [ ("start", "A #1"), ("end", "A #1") ])
+
+    async def test_heap_rebuild(self):
+        tasks = [ make_task(f"P #{i}", self.t0 + timedelta(seconds=10 * i), 5) for i in range(10) ]
+        for task in tasks:
+            self.schedule.add(task)
+
+        # Repeatedly moved task leaves stale timers until the heap is rebuilt
+        for i in range(100):
+            self.schedule.update_times(tasks[0], end_time=self.t0 + timedelta(seconds=5 + i % 5 * 0.1))
+            self.assertLessEqual(len(self.scheduler._timers), 2 * len(self.schedule) + 64)
+        self.assertLess(len(self.scheduler._timers), 2 * len(self.schedule) + 64)
+
+        await self.run_until(1000)
+        self.assertEqual([ e for e in self.scheduler.events if e[0] == "start" ],
+                         [ ("start", task.task_name) for task in tasks ])
+        self.assertEqual(len(self.scheduler.events), 20)
+        self.assertEqual(self.scheduler._timers, [])
+
+    async def test_past_tasks(self):
+        # Tasks which ended before they were loaded are never started but are removed
+        self.schedule.add(make_task("Past #1", self.t0 - timedelta(seconds=120), 60))
+        # The start of a task is skipped if it's already past its end when executed
+        self.schedule.add(make_task("Missed #1", self.t0 + timedelta(seconds=10), 60))
+
+        with mock.patch("porthouse.gs.scheduler.scheduler.datetime",
+                        SimpleNamespace(now=lambda tz: self.t0 + timedelta(seconds=80))):
+            await self.run_until(80)
+        self.assertEqual(self.scheduler.events, [])
+        self.assertEqual(len(self.schedule), 0)
+        self.assertEqual(self.schedule.get("Past #1").status, TaskStatus.CANCELLED)
+        self.assertEqual(self.schedule.get("Missed #1").status, TaskStatus.CANCELLED)
+
+
+class TestExecutor(unittest.IsolatedAsyncioTestCase):
+
+    async def test_run_executor(self):
+        scheduler = make_scheduler()
+        executor = asyncio.get_running_loop().create_task(scheduler.run_executor())
+        self.addCleanup(executor.cancel)
+
+        # The executor sleeping without timers is woken up when a task is added
+        await asyncio.sleep(0.01)
+        now = datetime.now(timezone.utc)
+        scheduler.schedule.add(make_task("A #1", now + timedelta(seconds=0.05), 0.05))
+        await asyncio.sleep(0.03)
+        self.assertEqual(scheduler.events, [])
+        await asyncio.sleep(0.1)
+        self.assertEqual(scheduler.events, [ ("start", "A #1"), ("end", "A #1") ])
+        self.assertFalse(executor.done())
+
+
+class TestOptimalScheduling(unittest.IsolatedAsyncioTestCase):
+
+    async def test_select_in_executor(self):
+        scheduler = make_scheduler()
+        scheduler.optimizer_time_budget = 1.0
+        scheduler.processes = {}
+        t0 = datetime(2030, 1, 1, tzinfo=timezone.utc)
+        for name, priority in (("A", 1), ("B", 2)):
+            process = Process()
+            process.process_name, process.priority, process.enabled = name, priority, True
+            scheduler.processes[name] = process
+
+        async def create_tasks(process, start_time, end_time):
+            offset = 0 if process.process_name == "A" else 300
+            return [ make_task(f"{process.process_name} #{i}", t0 + timedelta(seconds=offset + 1000 * i), 600)
+                     for i in range(3) ]
+        scheduler.create_tasks = create_tasks
+
+        # Existing task which the candidates are cut around
+        scheduler.schedule.add(make_task("Manual #1", t0 + timedelta(seconds=2000), 100))
+
+        threads, ticks = [], []
+        def slow_select(*args):
+            threads.append(threading.current_thread())
+            time.sleep(0.05)
+            return select_tasks(*args)
+
+        async def ticker():
+            while True:
+                ticks.append(time.monotonic())
+                await asyncio.sleep(0.005)
+
+        ticking = asyncio.get_running_loop().create_task(ticker())
+        with mock.patch("porthouse.gs.scheduler.scheduler.select_tasks", slow_select):
+            added = await scheduler._create_schedule_optimal(t0, t0 + timedelta(days=1))
+        ticking.cancel()
+
+        # The event loop kept running during the selection
+        self.assertNotEqual(threads, [ threading.main_thread() ])
+        self.assertGreater(len(ticks), 3)
+
+        # The higher priority process wins every conflict and its last pass is cut after the existing task
+        self.assertEqual(added, 3)
+        self.assertEqual(sorted(t.task_name for t in scheduler.schedule), [ "A #0", "A #1", "A #2 a", "Manual #1" ])
+        self.assertGreater(scheduler.schedule.get("A #2 a").start_time, t0 + timedelta(seconds=2100))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -2,7 +2,6 @@
     Tracking module for antenna tracking based on GPS-positions.
 """
 
-import json
 import math
 import time
 import asyncio
@@ -96,9 +95,9 @@ class PointTracker(BaseModule):
         """
 
         try:
-            msg_body = json.loads(msg.body)
+            msg_body = self.decode_message(msg)
         except:
-            self.log.error("Received invalid JSON: %r", msg.body, exc_info=True)
+            self.log.error("Received invalid message: %r", msg.body, exc_info=True)
             return
 
         target = (msg_body["lat"], msg_body["lon"], msg_body.get("alt", 0))
@@ -2,7 +2,6 @@
     Orbit tracker
 """
 
-import json
 import asyncio
 import datetime
 import time
@@ -62,9 +61,9 @@ class OrbitTracker(SkyfieldModuleMixin, BaseModule):
             return
 
         try:
-            event_body = json.loads(message.body)
+            event_body = self.decode_message(message)
         except ValueError as e:
-            self.log.error('Failed to parse json: %s\n%s', e.args[0], message.body, exc_info=True)
+            self.log.error('Failed to decode message: %s\n%s', e.args[0], message.body, exc_info=True)
             return
 
         if self.TRACKER_TYPE != event_body.get('tracker', ''):
@@ -60,6 +60,9 @@ class TLEServer(BaseModule):
         Fetches TLE parameters from varioous sources defined in the cfg file
     """
 
+    # Ready when TLEs are available either from the cache or from the first update
+    ready_on_start = False
+
     def __init__(self,
             cfg_file: Optional[str]=None,
             **kwarg
@@ -82,6 +85,8 @@ class TLEServer(BaseModule):
         except:
             #self.log.warning("Failed to read .tle-cache", exc_info=True)
             pass
+        if self.tle_data:
+            self.set_ready()
 
         # Parse TLE configuration file
         tle_cfg = yaml.load(open(self.config_file, "r"), Loader=yaml.Loader)
@@ -200,6 +205,7 @@ class TLEServer(BaseModule):
 
             except:
                 self.log.error("TLE update process failed", exc_info=True)
+                self.set_ready() # Serve whatever TLEs are available
                 await asyncio.sleep(3600)
 
     async def query_spacetrack(self, norad_id, auth_cookies=None):
@@ -370,6 +376,7 @@ class TLEServer(BaseModule):
 
         self.log.info("TLE updated!")
         self.updating = False
+        self.set_ready()
 
         # Broadcasting the new TLE lines
         await self.publish({
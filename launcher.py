@@ -17,16 +17,19 @@ import os
 import amqp
 import yaml
 import time
+import socket
 import argparse
 import inspect
-from multiprocessing import Process, RLock
+from multiprocessing import RLock, get_context
+from multiprocessing.process import BaseProcess
 from importlib import import_module
 import logging, logging.handlers
 from functools import reduce
 from urllib.parse import urlparse
-from typing import Any, Dict, List, Optional, NoReturn, Tuple
+from typing import Any, Dict, List, Optional, NoReturn, Set, Tuple
 
 from porthouse.core.config import load_globals
+from porthouse.core.codecs import CodecError, get_codec
 from porthouse.core.log.amqp_handler import AMQPLogHandler
 from porthouse.core.amqp_tools import check_exchange_exists
 
@@ -35,6 +38,63 @@ class ModuleValidationError(RuntimeError):
     """ """
 
 
+def process_memory(pid: Optional[int] = None) -> Dict[str, float]:
+    """
+    Read the memory usage of a process from /proc.
+
+    Args:
+        pid: Process ID. Defaults to the current process.
+
+    Returns:
+        Dictionary with the resident set size ("rss"), the proportional set size ("pss")
+        where the shared pages are divided between the processes sharing them and the
+        private memory ("private") in megabytes. Empty if not available on the platform.
+    """
+    fields = { "Rss": "rss", "Pss": "pss", "Private_Clean": "private", "Private_Dirty": "private" }
+    usage: Dict[str, float] = {}
+    try:
+        with open(f"/proc/{pid or 'self'}/smaps_rollup", "r") as f:
+            for line in f:
+                key, _, value = line.partition(":")
+                if key in fields:
+                    usage[fields[key]] = usage.get(fields[key], 0.0) + int(value.split()[0]) / 1024
+    except (OSError, ValueError, IndexError):
+        return {}
+    return usage
+
+
+def format_memory(usage: Dict[str, float]) -> str:
+    """ Format the output of process_memory() for the log """
+    if not usage:
+        return "memory usage not available"
+    labels = { "rss": "RSS", "pss": "PSS", "private": "private" }
+    return ", ".join(f"{labels[key]} {value:.0f} MB" for key, value in usage.items())
+
+
+class LaunchUnit:
+    """
+    A module or a group of co-located modules launched in one process.
+    """
+
+    # Restart backoff limits in seconds
+    MIN_BACKOFF = 1.0
+    MAX_BACKOFF = 60.0
+
+    def __init__(self, name: str, group: bool = False):
+        self.name = name
+        self.group = group
+        self.modules: List[Tuple[str, Dict[str, Any]]] = [] # (module class path, params)
+        self.members: List[str] = [] # Names of the module definitions
+        self.depends: Set[str] = set()
+        self.restart = True
+
+        self.process: Optional[BaseProcess] = None
+        self.started_at = 0.0
+        self.next_start = 0.0
+        self.backoff = self.MIN_BACKOFF
+        self.restarts = 0
+
+
 class Launcher:
     """
     Module for launching multiple porthouse modules.
@@ -56,9 +116,11 @@ class Launcher:
             debug: Enable global debugging
         """
         self.threads = []
+        self.units: Dict[str, LaunchUnit] = {}
         self.debug = debug
         self.prefix = None
         self.rlock = RLock()
+        self.mp_context = get_context()
         #self.log = None
 
         # Read basic configuration
@@ -90,6 +152,13 @@ class Launcher:
         # Check exchange are present
         #self.check_exchanges(self.exchanges.items())
 
+        # Import heavy dependencies once before forking the modules
+        if "preload" in cfg:
+            self.preload(cfg["preload"])
+
+        # Listen module heartbeats for readiness
+        self.setup_heartbeat_listener()
+
         # Setup modules
         self.setup_modules(self.modules, includes, excludes)
 
@@ -110,6 +179,7 @@ class Launcher:
             t.join()
 
         self.threads = []
+        self.units = {}
 
 
     def create_log_handlers(self, log_path: str, module_name: str, log_to_amqp: bool=True, log_to_stderr: bool=True) -> None:
@@ -147,12 +217,66 @@ class Launcher:
             self.log.addHandler(stdout_handler)
 
 
+    def preload(self, preload_cfg: Dict[str, Any]) -> None:
+        """
+        Import heavy dependencies and run initialization calls (e.g. loading the ephemeris
+        files) once in the launcher process. The module processes are forked from the
+        launcher so they inherit the initialized state and share the memory pages
+        copy-on-write instead of repeating the work in every process.
+
+        Args:
+            preload_cfg: Preload section of the launcher file with "modules", a list of
+                module names to import, and "calls", a list of callables given as
+                "package.module.attribute" paths to be called without arguments.
+        """
+        # Preloading only helps if the children are forked from this process
+        self.mp_context = get_context("fork")
+
+        started = time.monotonic()
+        imported = 0
+        for name in preload_cfg.get("modules", []):
+            try:
+                import_module(name)
+                imported += 1
+            except Exception:
+                self.log.warning("Failed to preload module %s", name, exc_info=True)
+
+        for path in preload_cfg.get("calls", []):
+            try:
+                self.resolve_attribute(path)()
+            except Exception:
+                self.log.warning("Preload call %s failed", path, exc_info=True)
+
+        self.log.info("Preloaded %d modules in %.1f s (%s)", imported,
+                      time.monotonic() - started, format_memory(process_memory()))
+
+
+    @staticmethod
+    def resolve_attribute(path: str) -> Any:
+        """
+        Resolve an attribute from a dotted path by importing the longest importable module prefix.
+        """
+        parts = path.split(".")
+        for i in range(len(parts) - 1, 0, -1):
+            try:
+                obj = import_module(".".join(parts[:i]))
+            except ImportError:
+                continue
+            for part in parts[i:]:
+                obj = getattr(obj, part)
+            return obj
+        raise ImportError(f"Can't resolve {path!r}")
+
+
     def setup_modules(self,
                       modules: List[Dict[str, Any]],
                       includes: Optional[List[str]]=None,
                       excludes: Optional[List[str]]=None) -> None:
         """
-        Read the modules from the configure file and start them.
+        Read the modules from the configure file and prepare them for launching.
+        Modules having the same ``group`` are started in a single process where they share
+        the event loop and the AMQP connection. Other modules get a process of their own.
+        The modules are started by wait() in dependency order.
 
         Args.
             modules: List of module definitions for the setup
@@ -161,6 +285,13 @@ class Launcher:
 
         """
         self.log.info("Setup modules...")
+        self.ready: Dict[str, bool] = {}
+        self.readiness: Dict[str, Tuple[str, float]] = {}
+        self.heartbeat_names: Dict[Tuple[str, Optional[str]], str] = {}
+        depends: Dict[str, List[str]] = {}
+        unit_of: Dict[str, LaunchUnit] = {}
+        launched_modules: Dict[str, str] = {} # Name -> module class path
+
         for module_def in modules:
             try:
                 self.validate_module_specification(module_def)
@@ -218,15 +349,155 @@ class Launcher:
                 if self.debug:
                     params["debug"] = True
 
-                # Create new process for the module
-                t = Process(target=self.worker, args=(module, params), daemon=True)
-                self.threads.append(t)
-                t.start()
+                # Modules publish their readiness in heartbeats
+                params.setdefault("heartbeat_interval", 10)
+
+                if name in launched_modules:
+                    raise ModuleValidationError(f"Duplicate module name {name!r}. Use the 'name' field.")
+                launched_modules[name] = module
+
+                # Co-located modules share a launch unit
+                unit_name = module_def.get("group", name)
+                unit = self.units.get(unit_name)
+                if unit is None:
+                    unit = self.units[unit_name] = LaunchUnit(unit_name, group="group" in module_def)
+                unit.modules.append((module, params))
+                unit.members.append(name)
+                unit.restart = unit.restart and module_def.get("restart", True)
+                unit_of[name] = unit
+
+                depends[name] = module_def.get("depends", [])
+                self.ready[name] = False
+                self.readiness[name] = (module_def.get("readiness", "heartbeat"), module_def.get("ready_timeout", 60))
+                heartbeat_name = params.get("module_name", module.rsplit(".", 1)[1])
+                self.heartbeat_names[(heartbeat_name, params.get("prefix"))] = name
 
             except:
                 self.log.error("Failed to start module \"%s\"", module_def.get("name"))
                 raise
 
+        # Resolve dependencies between the launch units
+        for name, deps in depends.items():
+            for dep in deps:
+                dep_name = self.resolve_dependency(dep, launched_modules)
+                if dep_name is None:
+                    if not any(dep == module_def.get("name") or dep == module_def.get("module") or \
+                               module_def.get("module", "").endswith("." + dep) for module_def in modules):
+                        raise ModuleValidationError(f"Module {name!r} depends on unknown module {dep!r}")
+                    self.log.warning("Module %r depends on %r which is not launched", name, dep)
+                    continue
+                if unit_of[dep_name] is not unit_of[name]:
+                    unit_of[name].depends.add(dep_name)
+
+        self.check_dependency_cycles(unit_of)
+
+
+    @staticmethod
+    def resolve_dependency(dep: str, launched_modules: Dict[str, str]) -> Optional[str]:
+        """
+        Resolve the name of a launched module from a dependency given either
+        as the module name or as the module class name.
+        """
+        if dep in launched_modules:
+            return dep
+        matches = [ name for name, module in launched_modules.items() if module.endswith("." + dep) ]
+        if len(matches) > 1:
+            raise ModuleValidationError(f"Ambiguous dependency {dep!r}: {matches!r}")
+        return matches[0] if matches else None
+
+
+    def check_dependency_cycles(self, unit_of: Dict[str, LaunchUnit]) -> None:
+        """
+        Make sure that there are no circular dependencies between the launch units.
+        """
+        visiting, done = set(), set()
+
+        def visit(unit: LaunchUnit, path: List[str]):
+            if unit.name in done:
+                return
+            if unit.name in visiting:
+                raise ModuleValidationError("Circular module dependency: " + " -> ".join(path + [unit.name]))
+            visiting.add(unit.name)
+            for dep in unit.depends:
+                visit(unit_of[dep], path + [unit.name])
+            visiting.discard(unit.name)
+            done.add(unit.name)
+
+        for unit in self.units.values():
+            visit(unit, [])
+
+
+    def start_unit(self, unit: LaunchUnit) -> None:
+        """
+        Start the process for a launch unit.
+        """
+        if unit.group:
+            t = self.mp_context.Process(target=self.group_worker, args=(unit.name, unit.modules), daemon=True, name=unit.name)
+        else:
+            module, params = unit.modules[0]
+            t = self.mp_context.Process(target=self.worker, args=(module, params), daemon=True)
+
+        if unit.process in self.threads:
+            self.threads.remove(unit.process)
+        unit.process = t
+        unit.started_at = time.monotonic()
+        self.threads.append(t)
+        t.start()
+
+
+    def setup_heartbeat_listener(self) -> None:
+        """
+        Subscribe the module heartbeats from the "event" exchange.
+        If the subscription fails, the readiness falls back to the ready timeouts.
+        """
+        self.heartbeat_channel = None
+        try:
+            channel = self.connection.channel()
+            channel.exchange_declare(exchange="event", type="topic", durable=True, auto_delete=False)
+            queue, _, _ = channel.queue_declare(exclusive=True, auto_delete=True)
+            channel.queue_bind(queue, exchange="event", routing_key="heartbeat.*")
+            channel.basic_consume(queue, callback=self.heartbeat_callback, no_ack=True)
+            self.heartbeat_channel = channel
+        except Exception:
+            self.log.warning("Failed to subscribe module heartbeats", exc_info=True)
+
+
+    def heartbeat_callback(self, message: amqp.Message) -> None:
+        """
+        Update the module readiness from a received heartbeat.
+        """
+        try:
+            heartbeat = get_codec(message.properties.get("content_type")).decode(message.body)
+            name = self.heartbeat_names.get((heartbeat["module"], heartbeat.get("prefix")))
+        except (CodecError, KeyError, TypeError):
+            self.log.warning("Invalid heartbeat %r", message.body)
+            return
+
+        if name is not None and heartbeat.get("ready", False) and not self.ready[name]:
+            unit = next(unit for unit in self.units.values() if name in unit.members)
+            self.ready[name] = True
+            self.log.info("%s ready in %.1f s (%s)", name, time.monotonic() - unit.started_at,
+                          format_memory(process_memory(unit.process.pid) if unit.process else {}))
+
+
+    def poll_heartbeats(self, timeout: float) -> None:
+        """
+        Process received heartbeats for the given time.
+        """
+        if self.heartbeat_channel is None:
+            time.sleep(timeout)
+            return
+
+        deadline = time.monotonic() + timeout
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return
+            try:
+                self.connection.drain_events(timeout=remaining)
+            except socket.timeout:
+                return
+
 
     def declare_exchanges(self, exchanges: List[Tuple[str, str]]) -> None:
         """
@@ -257,37 +528,86 @@ class Launcher:
 
     def wait(self) -> NoReturn:
         """
-        Wait until someone dies.
+        Start the modules when their dependencies are ready and monitor them.
+        Crashed modules are restarted with exponential backoff. If a module
+        has restarting disabled, the launcher exits when the module dies.
         """
         try:
-            running = True
-            while running:
-                time.sleep(0.5)
+            while True:
+                self.poll_heartbeats(0.5)
+                now = time.monotonic()
+
+                for unit in self.units.values():
+
+                    if unit.process is None:
+                        # Start when all the dependencies are ready
+                        if now >= unit.next_start and all(self.ready[dep] for dep in unit.depends):
+                            self.start_unit(unit)
+                        continue
 
-                for t in self.threads:
-                    if not t.is_alive():
-                        running = False
+                    if not unit.process.is_alive():
+                        for name in unit.members:
+                            self.ready[name] = False
+
+                        if not unit.restart:
+                            self.log.critical("%s died!", unit.name)
+                            return
+
+                        # Reset the backoff if the module had been running for a while
+                        if now - unit.started_at > LaunchUnit.MAX_BACKOFF:
+                            unit.backoff = LaunchUnit.MIN_BACKOFF
+                        self.log.warning("%s died (exit code %s). Restarting in %.0f s",
+                                         unit.name, unit.process.exitcode, unit.backoff)
+                        unit.next_start = now + unit.backoff
+                        unit.backoff = min(2 * unit.backoff, LaunchUnit.MAX_BACKOFF)
+                        unit.restarts += 1
+                        unit.process = None
+                        continue
+
+                    for name in unit.members:
+                        if self.ready[name]:
+                            continue
+                        readiness, ready_timeout = self.readiness[name]
+                        if readiness == "process":
+                            self.ready[name] = True
+                        elif now - unit.started_at > ready_timeout:
+                            self.log.warning("%s didn't report ready in %.0f s", name, ready_timeout)
+                            self.ready[name] = True
 
         except KeyboardInterrupt:
             pass
 
 
+    def load_module_class(self, module: str, params: Dict[str, Any]) -> Tuple[type, str]:
+        """
+        Import the module class and check that all the required arguments have been given.
+
+        Returns:
+            Tuple of the class object and verbose name of the module
+        """
+        # Parse package, class etc. names
+        package_name, class_name = module.rsplit('.', 1)
+        module_name = params.get("module_name", class_name) # Verbose name
+        package = import_module(package_name)
+        class_object = getattr(package, class_name)
+
+        # Check that all the required arguments have been define and output understandable error if not
+        argspec = inspect.getfullargspec(class_object.__init__)
+        for j, arg in enumerate(reversed(argspec.args[1:])):
+            if j >= len(argspec.defaults or []) and arg not in params:
+                raise RuntimeError(f"Module {module_name} (class {class_name}) missing argument {arg!r}")
+
+        return class_object, module_name
+
+
     def worker(self, module: str, params: Dict[str, Any]) -> NoReturn:
         """
         Worker function to start the new module.
         """
         try:
-            # Parse package, class etc. names
+            started = time.monotonic()
             package_name, class_name = module.rsplit('.', 1)
-            module_name = params.get("module_name", class_name) # Verbose name
-            package = import_module(package_name)
-            class_object = getattr(package, class_name)
-
-            # Check that all the required arguments have been define and output understandable error if not
-            argspec = inspect.getfullargspec(class_object.__init__)
-            for j, arg in enumerate(reversed(argspec.args[1:])):
-                if j >= len(argspec.defaults or []) and arg not in params:
-                    raise RuntimeError(f"Module {module_name} (class {class_name}) missing argument {arg!r}")
+            class_object, module_name = self.load_module_class(module, params)
 
             with self.rlock:
                 self.log.info("Starting %s (%s.%s)", module_name, package_name, class_name)
@@ -295,6 +615,10 @@ class Launcher:
             # Call module class constuctor
             instance = class_object(**params)
 
+            with self.rlock:
+                self.log.info("Started %s in %.1f s (%s)", module_name, time.monotonic() - started,
+                              format_memory(process_memory()))
+
             # Start executing 
             ret = instance.run()
             # TODO: if asyncio.iscoroutine(ret): ret = await ret
@@ -310,13 +634,50 @@ class Launcher:
                 self.log.critical("%s crashed!", module, exc_info=True)
 
 
+    def group_worker(self, group: str, modules: List[Tuple[str, Dict[str, Any]]]) -> NoReturn:
+        """
+        Worker function to start a group of co-located modules in one process.
+        """
+        from porthouse.core.module_host import ModuleHost
+
+        try:
+            started = time.monotonic()
+            host = ModuleHost(self.globals["amqp_url"], name=group, log=self.log)
+            for module, params in modules:
+                class_object, module_name = self.load_module_class(module, params)
+                with self.rlock:
+                    self.log.info("Starting %s (%s) in group %s", module_name, module, group)
+                host.add_module(class_object, params)
+
+            with self.rlock:
+                self.log.info("Started module group %s in %.1f s (%s)", group, time.monotonic() - started,
+                              format_memory(process_memory()))
+
+            host.run()
+
+            with self.rlock:
+                self.log.info("Module group %s exited", group)
+
+        except KeyboardInterrupt:
+            pass
+
+        except: # Catch all exceptions!
+            with self.rlock:
+                self.log.critical("Module group %s crashed!", group, exc_info=True)
+
+
     def validate_module_specification(self, module_spec: dict) -> None:
         """ Validate module specification """
 
         REQUIRED_FIELDS = (
             ("name", str, False),
             ("module", str, True),
-            ("params", list, False)
+            ("params", list, False),
+            ("group", str, False),
+            ("depends", list, False),
+            ("readiness", str, False),
+            ("ready_timeout", (int, float), False),
+            ("restart", bool, False),
         )
 
         if not isinstance(module_spec, dict):
@@ -330,6 +691,9 @@ class Launcher:
             if not isinstance(module_spec[field_name], field_type):
                 raise ModuleValidationError(f"{field_name!r} has wrong type. Expected {field_type!r} got {type(module_spec[field_name])}")
 
+        if module_spec.get("readiness", "heartbeat") not in ("heartbeat", "process"):
+            raise ModuleValidationError(f"Unknown readiness {module_spec['readiness']!r}. Expected 'heartbeat' or 'process'")
+
         for param in module_spec.get("params", []):
             if not isinstance(param, dict):
                 raise ModuleValidationError(f"Parameter define {param!r} in is not a dict")
@@ -356,6 +720,15 @@ class Launcher:
             if not isinstance(launch_cfg, dict):
                 raise ModuleValidationError(f"Module specification is not a list but a {type(modules)}")
 
+        if "preload" in launch_cfg:
+            preload = launch_cfg["preload"]
+            if not isinstance(preload, dict):
+                raise ModuleValidationError(f"Preload specification is not a dict but a {type(preload)}")
+            for field_name in ("modules", "calls"):
+                values = preload.get(field_name, [])
+                if not isinstance(values, list) or not all(isinstance(value, str) for value in values):
+                    raise ModuleValidationError(f"Preload {field_name!r} is not a list of strings")
+
 
 
 def setup_parser(parser: argparse.ArgumentParser) -> None:
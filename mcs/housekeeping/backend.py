@@ -2,29 +2,32 @@
     Housekeeping backend module
 """
 
-import json
+import asyncio
 from datetime import datetime
 
 import aiormq
 
 from porthouse.core.basemodule_async import BaseModule, RPCError, rpc, queue, bind
-from .database import HousekeepingDatabase, DatabaseError
+from porthouse.core.codecs import CodecError
+from .database import AsyncHousekeepingDatabase, DatabaseError
 from ...core import config
 
 
 class HousekeepingBackend(BaseModule):
 
-    def __init__(self, hk_schema_path: str, db_url: str, **kwargs):
+    def __init__(self, hk_schema_path: str, db_url: str, db_pool_size: int = 5, **kwargs):
         """
         Init the housekeeping backend
 
         Args:
             schema_path
             db_url:
-
+            db_pool_size: Maximum number of pooled database connections
         """
         BaseModule.__init__(self, **kwargs)
-        self.db = HousekeepingDatabase(hk_schema_path, db_url)
+        self.db = AsyncHousekeepingDatabase(hk_schema_path, db_url, pool_size=db_pool_size,
+                                            metrics=self.metrics, log=self.log)
+        asyncio.get_event_loop().run_until_complete(self.db.connect())
 
 
     @queue()
@@ -34,9 +37,9 @@ class HousekeepingBackend(BaseModule):
         Callback to store new data to database
         """
         try:
-            json_message = json.loads(msg.body)
+            json_message = self.decode_message(msg)
             assert isinstance(json_message, dict)
-        except ValueError as e:
+        except CodecError as e:
             self.log.warning("Error while parsing json msg:\n%s\n%s", msg.body, e.args[0])
             return
 
@@ -67,7 +70,7 @@ class HousekeepingBackend(BaseModule):
             #values = self.db.calibrate_frame(subsystem, values)
 
             # Push the housekeeping entry to database
-            self.db.insert_subsystem_frame(subsystem,timestamp,source,metadata,values)
+            await self.db.insert_subsystem_frame(subsystem,timestamp,source,metadata,values)
         except DatabaseError as e:
             self.log.error("Database error: %s", str(e))
         else:
@@ -85,7 +88,7 @@ class HousekeepingBackend(BaseModule):
 
     @rpc()
     @bind("housekeeping", "rpc.#", prefixed=True)
-    def rpc_handler(self, request_name: str, request_data: dict):
+    async def rpc_handler(self, request_name: str, request_data: dict):
         """
         """
 
@@ -95,7 +98,7 @@ class HousekeepingBackend(BaseModule):
             """
 
             try:
-                data = self.db.query(**request_data)
+                data = await self.db.query(**request_data)
             except TypeError as e:
                 if "missing" in str(e):
                     arg = str(e).split("'")[1]
@@ -118,7 +121,7 @@ class HousekeepingBackend(BaseModule):
 
             try:
                 # Get latest housekeeping values
-                latest = self.db.query_latest(**request_data)
+                latest = await self.db.query_latest(**request_data)
             except TypeError as e:
                 if "missing" in str(e):
                     arg = str(e).split("'")[1]
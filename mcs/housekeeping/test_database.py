@@ -0,0 +1,111 @@
+import os
+import logging
+import unittest
+from datetime import datetime, timedelta
+
+from porthouse.core import db_tools
+from .database import AsyncHousekeepingDatabase, HousekeepingError
+
+
+SCHEMA_PATH = os.path.join(os.path.dirname(__file__), "..", "..", "tutorial", "housekeeping.json")
+
+
+class FakeDatabase:
+    """ Database recording the executed queries and their arguments """
+
+    def __init__(self, rows=None, fail_hypertable=False):
+        self.rows = rows or []
+        self.fail_hypertable = fail_hypertable
+        self.queries = []
+        self.log = logging.getLogger("test_housekeeping_database")
+
+    async def connect(self):
+        return self
+
+    async def fetch(self, query, *args):
+        self.queries.append((" ".join(query.split()), args))
+        return [ dict(row) for row in self.rows ]
+
+    async def fetchval(self, query, *args):
+        self.queries.append((" ".join(query.split()), args))
+        return args[0] == "obc"
+
+    async def execute(self, query, *args):
+        self.queries.append((" ".join(query.split()), args))
+        if self.fail_hypertable and "create_hypertable" in query:
+            raise RuntimeError("extension \"timescaledb\" is not installed")
+        return "OK"
+
+
+class TestAsyncHousekeepingDatabase(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        url = "postgres://test@localhost/test_housekeeping"
+        self.addCleanup(db_tools._databases.pop, url, None)
+        self.hk = AsyncHousekeepingDatabase(SCHEMA_PATH, url)
+        self.hk.db = self.db = FakeDatabase()
+        self.start = datetime(2026, 10, 15, 12, 0, 0)
+        self.end = self.start + timedelta(hours=1)
+
+    async def test_connect(self):
+        self.hk.db = db = FakeDatabase(fail_hypertable=True)
+        with self.assertLogs(db.log, "WARNING") as logs:
+            await self.hk.connect()
+
+        # Only the missing tables are created
+        created = [ query.split()[5] for query, _ in db.queries if query.startswith("CREATE TABLE") ]
+        self.assertEqual(set(created), set(self.hk.subsystems) - { "obc" })
+        self.assertEqual(len(logs.output), len(created))
+        self.assertIn("Failed to create hypertable", logs.output[0])
+
+    async def test_query(self):
+        await self.hk.query("obc", ["uptime", "temperature"], self.start.isoformat(), self.end,
+                            limit=10, with_raw=True, with_source=True)
+        self.assertEqual(self.db.queries[-1], (
+            "SELECT timestamp, source, uptime, uptime_raw, temperature, temperature_raw FROM obc "
+            "WHERE timestamp >= $1 AND timestamp <= $2 ORDER BY timestamp DESC LIMIT $3;",
+            (self.start, self.end, 10)))
+
+        # The field names are validated against the schema
+        with self.assertRaises(HousekeepingError):
+            await self.hk.query("obc", "uptime; DROP TABLE obc", self.start, self.end)
+        with self.assertRaises(HousekeepingError):
+            await self.hk.query("obc; DROP TABLE obc", "uptime", self.start, self.end)
+        self.assertEqual(len(self.db.queries), 1)
+
+    async def test_query_binned(self):
+        self.db.rows = [ { "bucket": self.end, "uptime_avg": 1, "uptime_min": 0, "uptime_max": 2 } ]
+        rows = await self.hk.query_binned("obc", "uptime", self.end, self.start, size=60)
+        self.assertEqual(self.db.queries[-1], (
+            "SELECT time_bucket($1, timestamp) AS bucket, AVG(uptime) AS uptime_avg, "
+            "MIN(uptime) AS uptime_min, MAX(uptime) AS uptime_max FROM obc "
+            "WHERE timestamp >= $2 AND timestamp <= $3 GROUP BY bucket ORDER BY bucket DESC;",
+            (timedelta(minutes=1), self.start, self.end)))
+        self.assertEqual(rows[0]["timestamp"], self.end)
+
+    async def test_query_latest(self):
+        self.assertIsNone(await self.hk.query_latest("obc", ["fdir"], with_metadata=True))
+        self.assertEqual(self.db.queries[-1], (
+            "SELECT timestamp, metadata, fdir FROM obc ORDER BY timestamp DESC LIMIT 1;", ()))
+
+        self.db.rows = [ { "timestamp": self.start, "fdir": 1 } ]
+        row = await self.hk.query_latest("obc", "fdir", self.start, self.end)
+        self.assertEqual(row, { "timestamp": self.start, "fdir": 1 })
+        self.assertEqual(self.db.queries[-1][1], (self.start, self.end))
+
+    async def test_insert(self):
+        fields = { field.key: i for i, field in enumerate(self.hk.subsystems["obc"].fields) }
+        await self.hk.insert_subsystem_frame("obc", self.start.timestamp(), "uhf", '{"vc": 1}', fields)
+        query, args = self.db.queries[-1]
+        self.assertEqual(query,
+            "INSERT INTO obc(timestamp, source, metadata, fdir, uptime, temperature, bootcount, fail_counter) "
+            "VALUES ($1, $2, $3, $4, $5, $6, $7, $8);")
+        self.assertEqual(args[1:], ("uhf", { "vc": 1 }, 0, 1, 2, 3, 4))
+
+        del fields["uptime"]
+        with self.assertRaises(HousekeepingError):
+            await self.hk.insert_subsystem_frame("obc", self.start, None, None, fields)
+
+
+if __name__ == '__main__':
+    unittest.main()
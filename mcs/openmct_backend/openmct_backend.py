@@ -162,9 +162,9 @@ class OpenMCTBackend(BaseModule):
         """
 
         try:
-            message = json.loads(msg.body)
+            message = self.decode_message(msg)
         except:
-            self.log.debug("Invalid JSON", exc_info=True)
+            self.log.debug("Invalid message", exc_info=True)
             return
 
         self.log.debug("event: %s, %s", msg.delivery.exchange, msg.delivery.routing_key)
@@ -7,7 +7,7 @@ import asyncio
 import json
 from typing import Dict, List, Optional, Union
 
-from porthouse.mcs.housekeeping.database import HousekeepingDatabase, DatabaseError
+from porthouse.mcs.housekeeping.database import AsyncHousekeepingDatabase, DatabaseError
 from ..utils import WebRPCError, iso_timestamp_to_millis, datetime_to_millis, millis_to_datetime
 
 class HousekeepingService:
@@ -19,7 +19,8 @@ class HousekeepingService:
         self.hk_schema = hk_schema
         self.satellite = satellite
         self.server = server
-        self.db = HousekeepingDatabase(hk_schema, db_url)
+        self.db = AsyncHousekeepingDatabase(hk_schema, db_url, metrics=server.metrics, log=server.log)
+        asyncio.get_event_loop().run_until_complete(self.db.connect())
 
 
     async def rpc_command(self, client: OpenMCTProtocol, method: str, params: Optional[dict]):
@@ -207,7 +208,7 @@ class HousekeepingService:
 
             # Execute the database query
             try:
-                data = self.db.query_latest(subsystem, fields, **request_data)
+                data = await self.db.query_latest(subsystem, fields, **request_data)
             except DatabaseError as e:
                 raise WebRPCError("Database error '%s'" % e)
             except TypeError as e:
@@ -246,7 +247,7 @@ class HousekeepingService:
 
             # Execute the database query
             try:
-                data = self.db.query_binned(subsystem, fields, request_data["start_date"],request_data["end_date"],request_data["size"],)
+                data = await self.db.query_binned(subsystem, fields, request_data["start_date"],request_data["end_date"],request_data["size"],)
             except DatabaseError as e:
                 raise WebRPCError("Database error '%s'" % e)
             except TypeError as e:
@@ -284,7 +285,7 @@ class HousekeepingService:
 
             # Execute the database query
             try:
-                data = self.db.query(subsystem, fields, **request_data)
+                data = await self.db.query(subsystem, fields, **request_data)
             except DatabaseError as e:
                 raise WebRPCError("Database error '%s'" % e)
             except TypeError as e:
@@ -31,9 +31,7 @@ class SystemService:
         """
             Request Logs
         """
-        # Returns logs within a given time span. Notice that mcc's log support is what it is, so only
-        # those logs that are currently loaded are obtainable. Logs are stored into a files so they are not
-        # obtainable without additional programming.
+        # Returns logs within a given time span from the LogServer's log store.
 
         options = params["options"]
 
@@ -41,11 +39,14 @@ class SystemService:
         if "domain" in options and options["domain"] != "utc":
             raise WebRPCError("Invalid domain!")
         if "start" in options:
-            request_data["start_date"] = options["start"] / 1000
+            request_data["start"] = options["start"] / 1000
         if "end" in options:
-            request_data["end_date"] = options["end"] / 1000
+            request_data["end"] = options["end"] / 1000
+        for key in ("module", "level", "before", "after", "limit"):
+            if key in options:
+                request_data[key] = options[key]
 
-        fields = await self.server.send_rpc_request("log", "rpc.get_history")
+        fields = await self.server.send_rpc_request("log", "rpc.get_history", request_data)
 
         return {
             "subsystem": "log",
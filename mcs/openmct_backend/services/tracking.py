@@ -34,22 +34,24 @@ class TrackingService:
         keys = list(params.keys())
         #print("params", keys)
 
-        trackables = []
+        # TLE server only brings one at a time so query all of them concurrently
+        results, errors = await self.server.send_rpc_requests({
+            key: ("tracking", "tle.rpc.get_tle", {"satellite": key}) for key in keys
+        }, timeout=2)
 
-        # TLE server only brings one at a time
+        trackables = []
         for key in keys:
-
-            res = await self.server.send_rpc_request("tracking", "tle.rpc.get_tle",
-                {"satellite": key})
-
-            trackables.append({
-                "name": res["name"],
-                "tle1": res["tle1"],
-                "tle2": res["tle2"]
-            })
+            if key in results:
+                res = results[key]
+                trackables.append({
+                    "name": res["name"],
+                    "tle1": res["tle1"],
+                    "tle2": res["tle2"]
+                })
 
         return {
             "subsystem": "tracking",
             "exhange": "tracking",
-            "trackables": trackables
+            "trackables": trackables,
+            "errors": { key: str(exc) or exc.__class__.__name__ for key, exc in errors.items() }
         }
@@ -0,0 +1,98 @@
+"""
+    Throughput benchmark for the packet router's TCP endpoint.
+
+    A TCP endpoint is started on the loopback interface with a minimal router counting
+    the routed frames. For each framing, a plain asyncio peer streams frames to the endpoint
+    (receive) and the endpoint sends frames to the peer (send).
+
+    Usage:
+        python3 -m porthouse.mcs.packets.benchmark_router_tcp --frames 200000 --size 256
+"""
+
+import time
+import asyncio
+import logging
+import argparse
+
+from porthouse.mcs.packets.router_framing import FRAMINGS
+from porthouse.mcs.packets.router_endpoints import TCPEndpoint
+
+
+class CountingRouter:
+    """ Minimal router interface for the endpoint counting the routed frames """
+
+    def __init__(self):
+        self.log = logging.getLogger("benchmark")
+        self.metrics = None
+        self.count = 0
+        self.done = asyncio.Event()
+        self.expected = 0
+
+    async def route_frames(self, source, frames):
+        self.count += len(frames)
+        if self.count >= self.expected:
+            self.done.set()
+
+
+def report(name: str, direction: str, frames: int, size: int, elapsed: float) -> None:
+    print(f"{name:<8} {direction:<8} {frames / elapsed / 1e3:8.1f} kframes/s {frames * size / elapsed / 1e6:8.1f} MB/s")
+
+
+async def run(framing: str, frames: int, size: int) -> None:
+    router = CountingRouter()
+    endpoint = TCPEndpoint(router, bind="127.0.0.1:0", framing=framing, max_pending=4096)
+    endpoint.name = "bench"
+    await endpoint.connect()
+    port = endpoint._server.sockets[0].getsockname()[1]
+
+    # Avoid delimiters in the payload so that the escaping doesn't dominate
+    payload = bytes(0x20 + i % 90 for i in range(size))
+    stream = b"".join(b"".join(FRAMINGS[framing]().encode(payload)) for _ in range(1000))
+
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    while not endpoint._connections:
+        await asyncio.sleep(0.001)
+
+    # Receive: peer -> endpoint -> router
+    router.expected = frames // 1000 * 1000
+    t = time.perf_counter()
+    for _ in range(frames // 1000):
+        writer.write(stream)
+        await writer.drain()
+    await router.done.wait()
+    report(framing, "receive", router.count, size, time.perf_counter() - t)
+
+    # Send: endpoint -> peer
+    connection = next(iter(endpoint._connections))
+    parser = FRAMINGS[framing]()
+
+    async def read_all():
+        received = 0
+        while received < frames:
+            received += len(parser.feed(await reader.read(1 << 16)))
+
+    t = time.perf_counter()
+    reading = asyncio.ensure_future(read_all())
+    for _ in range(frames):
+        while connection.paused:
+            await asyncio.sleep(0.0005)
+        await endpoint.send(payload)
+    await reading
+    report(framing, "send", frames, size, time.perf_counter() - t)
+
+    writer.close()
+    await endpoint.disconnect()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="TCP endpoint loopback throughput benchmark")
+    parser.add_argument("--frames", type=int, default=200000, help="Number of frames per direction")
+    parser.add_argument("--size", type=int, default=256, help="Frame size in bytes")
+    args = parser.parse_args()
+
+    for framing in FRAMINGS:
+        asyncio.run(run(framing, args.frames, args.size))
+
+
+if __name__ == "__main__":
+    main()
@@ -9,7 +9,8 @@ import psycopg2
 import psycopg2.extras
 
 from urllib.parse import urlparse
-from porthouse.core.db_tools import check_table_exists
+from typing import Any, Dict, List, Optional
+from porthouse.core.db_tools import AsyncDatabase, check_table_exists, get_database, to_timestamp
 
 class PacketsDatabaseError(RuntimeError):
     """ Generic class for database api errors """
@@ -124,7 +125,9 @@ class PacketsDatabase:
         if with_metadata:
             fields.append("metadata")
 
-        self.cursor.execute(f"""
+        # Use a dedicated cursor so that queries can be executed from multiple threads
+        cursor = self.connection.cursor()
+        cursor.execute(f"""
             SELECT {", ".join(fields)}
             FROM packets
             WHERE {" AND ".join(constraints)}
@@ -133,7 +136,7 @@ class PacketsDatabase:
         """)
 
         # Build RPC response
-        for res in self.cursor:
+        for res in cursor:
             packet = {
                 "timestamp": res[0],
                 "type": res[1],
@@ -166,8 +169,9 @@ class PacketsDatabase:
         smt += f"VALUES ({satellite!r}, {source!r}, {timestamp!r}, {packet_type!r}, {psycopg2.Binary(data)}, {metadata!r})"
         smt += "RETURNING id;"
 
-        self.cursor.execute(smt)
-        r = self.cursor.fetchone()  # Get the ID of newly created packet
+        cursor = self.connection.cursor()
+        cursor.execute(smt)
+        r = cursor.fetchone()  # Get the ID of newly created packet
 
         if r is None:
             raise RuntimeError("Failed to retrieve packet id!")
@@ -220,6 +224,139 @@ class PacketsDatabase:
             ''', data)
 
 
+class AsyncPacketsDatabase:
+    """
+    Asynchronous database API for packet backend using the shared connection pool
+    """
+
+    def __init__(self, db_url: Optional[str] = None, **kwargs):
+        """
+        Args:
+            db_url: Database URL. If not given, the environment variable MCC_DB_ACCESS is used.
+            kwargs: Connection pool options (see porthouse.core.db_tools.AsyncDatabase)
+        """
+        if db_url is None:
+            import os
+            if "MCC_DB_ACCESS" in os.environ:
+                db_url = os.environ["MCC_DB_ACCESS"]
+            else:
+                raise ValueError("No database URL given!")
+        self.db: AsyncDatabase = get_database(db_url, **kwargs)
+
+
+    async def connect(self, create_tables: bool = False) -> None:
+        """
+        Connect to the database and check that the packets table exists.
+        """
+        await self.db.connect()
+        if create_tables:
+            await self.create_tables()
+        exists = await self.db.fetchval("SELECT to_regclass('packets') IS NOT NULL")
+        if not exists:
+            raise PacketsDatabaseError("Table 'packets' doesn't exist")
+
+
+    async def create_tables(self) -> None:
+        """
+            Create database tables
+        """
+        await self.db.execute('''
+            CREATE TABLE IF NOT EXISTS packets (
+                id SERIAL,
+                timestamp TIMESTAMP NOT NULL,
+                source VARCHAR(16),
+                satellite VARCHAR(16) NOT NULL,
+                type VARCHAR(16) NOT NULL,
+                data BYTEA NOT NULL,
+                metadata JSON DEFAULT NULL
+            );''')
+        try:
+            await self.db.execute("SELECT create_hypertable('packets', 'timestamp', if_not_exists => TRUE);")
+        except Exception as e:
+            self.db.log.warning("Failed to create hypertable: %s", e)
+
+
+    async def query(self,
+              satellite: str,
+              packet_type: Optional[str] = None,
+              source: Optional[str] = None,
+              start_date=None,
+              end_date=None,
+              with_id: bool = False,
+              with_metadata: bool = False,
+              limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+            Query packets from the database
+        """
+        if start_date is not None and end_date is not None and to_timestamp(start_date) < to_timestamp(end_date):
+            start_date, end_date = end_date, start_date
+
+        args = [ satellite ]
+        constraints = [ "satellite = $1" ]
+
+        def constraint(expression: str, value: Any) -> None:
+            args.append(value)
+            constraints.append(expression % f"${len(args)}")
+
+        if packet_type is not None:
+            constraint("type = %s", packet_type)
+        if source is not None:
+            constraint("source = %s", source)
+        if start_date is not None:
+            constraint("timestamp <= %s", to_timestamp(start_date))
+        if end_date is not None:
+            constraint("timestamp >= %s", to_timestamp(end_date))
+        args.append(int(limit) if limit is not None else 50)
+
+        fields = ["timestamp", "type", "source", "data"]
+        if with_metadata:
+            fields.append("metadata")
+        if with_id:
+            fields.append("id")
+
+        return await self.db.fetch(f"""
+            SELECT {", ".join(fields)}
+            FROM packets
+            WHERE {" AND ".join(constraints)}
+            ORDER BY timestamp ASC
+            LIMIT ${len(args)};
+        """, *args)
+
+
+    async def store_packet(self, source, satellite, packet_type, data, timestamp=None, metadata=None, **kwargs) -> int:
+        """
+            Store a packet to database
+
+            Returns:
+                ID of the new packet
+        """
+        timestamp = to_timestamp(timestamp) if timestamp is not None else datetime.utcnow()
+
+        if isinstance(metadata, str):
+            metadata = json.loads(metadata)
+        metadata = dict(metadata or {})
+
+        # Push extra arguments to metadata so they won't get lost
+        metadata.update(kwargs)
+
+        packet_id = await self.db.fetchval(
+            "INSERT INTO packets(satellite, source, timestamp, type, data, metadata) "
+            "VALUES ($1, $2, $3, $4, $5, $6) RETURNING id;",
+            satellite, source, timestamp, packet_type, bytes(data), metadata)
+
+        if packet_id is None:
+            raise PacketsDatabaseError("Failed to retrieve packet id!")
+        return packet_id
+
+
+    async def satellites(self) -> List[Dict[str, Any]]:
+        """
+            Get the satellites and their packet counts in the database
+        """
+        rows = await self.db.fetch("SELECT satellite, COUNT(*) AS packets FROM packets GROUP BY satellite")
+        return [ {"name": row["satellite"], "packets": row["packets"]} for row in rows ]
+
+
 if __name__ == "__main__":
     import sys
     from porthouse.core.config import load_globals
@@ -2,16 +2,18 @@
     Packet router module
 """
 
-import json
 import asyncio
 from importlib import import_module
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Optional, Union
 
 import zmq
 import zmq.asyncio
 
 from porthouse.core.basemodule_async import BaseModule, rpc, RPCError, bind
 from .router_endpoints import *
+from .router_queue import SendQueue
+from .router_pipeline import Route, decode_frame
+from .router_rules import DispatchTable
 
 
 class PacketRouter(BaseModule):
@@ -20,9 +22,14 @@ class PacketRouter(BaseModule):
         archive them to database. Responds also packet RPCs.
     """
 
-    def __init__(self, endpoints: List[Dict[str, Any]], routes: List[str], **kwargs):
+    def __init__(self, endpoints: List[Dict[str, Any]], routes: List[Union[str, Dict[str, Any]]], **kwargs):
         """
         Initialise module
+
+        Args:
+            endpoints: Endpoint definitions
+            routes: Route definitions as "a > b" strings or as dictionaries with the "route" string
+                and an optional "match" rule (see router_rules)
         """
         BaseModule.__init__(self, **kwargs)
         self.zmq_ctx = zmq.asyncio.Context()
@@ -44,7 +51,7 @@ class PacketRouter(BaseModule):
         loop.create_task(self.load_endpoints(endpoints, routes))
 
 
-    @rpc()
+    @rpc(executor=False)
     @bind('packets', 'router.rpc.#', prefixed=True)
     def rpc_handler(self,
             request_name: str,
@@ -65,14 +72,15 @@ class PacketRouter(BaseModule):
                 {
                     "name": e.name,
                     "type": e.type_identifier,
+                    **({ "stats": e.stats() } if hasattr(e, "stats") else { }),
                 } for e in self.endpoints.values()
             ])
 
             pretty_routers = list([
                 {
-                    "source": endpoint.name,
-                    "destination": endpoint.link.name
-                } for endpoint in self.endpoints.values() if endpoint.link is not None
+                    **route.to_dict(),
+                    "queue": route.destination.queue.stats(),
+                } for endpoint in self.endpoints.values() for route in endpoint.links.values()
             ])
 
             return {
@@ -85,17 +93,17 @@ class PacketRouter(BaseModule):
                 Connect two endpoints
             """
             try:
-                self.create_route(request_data["a"], request_data["b"])
+                self.create_route(request_data["a"], request_data["b"], request_data.get("match"))
             except Exception as e:
                 self.log.error(f"Error while connecting route!: {e.args[0]}", exc_info=True)
                 raise RPCError(e.args[0])
 
         elif request_name == "router.rpc.disconnect":
             """
-                Disconnect two endpoint
+                Disconnect two endpoints or, if b is not given, all the routes from a
             """
             try:
-                self.create_route(request_data["a"], None)
+                self.remove_route(request_data["a"], request_data.get("b"))
             except Exception as e:
                 self.log.error(f"Error while disconnecting route!: {e.args[0]}", exc_info=True)
                 raise RPCError(e.args[0])
@@ -104,12 +112,13 @@ class PacketRouter(BaseModule):
             """
                 Disconnect all links
             """
-            pass
+            for endpoint_name in self.endpoints:
+                self.remove_route(endpoint_name)
 
 
     async def load_endpoints(self,
             endpoints: List[Dict[str, Any]],
-            routes: List[str]
+            routes: List[Union[str, Dict[str, Any]]]
         ) -> None:
         """
         Create message queue and attach it to given exchanges
@@ -129,17 +138,30 @@ class PacketRouter(BaseModule):
                     continue
 
                 self.log.debug("Creating new endpoint '%s' (type: %s)", endpoint_name, endpoint_type)
-                persistent = endpoint_params.pop("persistent", "True").lower() == "true "
+                persistent = str(endpoint_params.pop("persistent", "True")).lower() == "true"
                 formatter = endpoint_params.pop("formatter", None)
                 metadata = endpoint_params.pop("metadata", { })
+                frame_format = endpoint_params.pop("frame_format", "json")
+                if frame_format not in ("json", "binary"):
+                    raise ValueError(f"Unknown frame format {frame_format!r}")
+                queue_size = int(endpoint_params.pop("queue_size", 1000))
+                overflow = endpoint_params.pop("overflow", "block")
 
                 # Create new instance
                 inst = self.endpoints[endpoint_name] = endpoint_class(self, **endpoint_params)
                 inst.name = endpoint_name
-                inst.link = None
+                inst.links = { }
+                inst.dispatch = DispatchTable([])
                 inst.persistent = persistent
                 inst.formatter = None
                 inst.metadata = metadata
+                inst.frame_format = frame_format
+
+                # Sending endpoints get their own bounded queue and sender task
+                inst.queue = None
+                if hasattr(inst, "send"):
+                    inst.queue = SendQueue(inst, size=queue_size, overflow=overflow, log=self.log)
+                    inst.queue.start()
 
                 # Parse formatter function
                 if formatter:
@@ -170,99 +192,153 @@ class PacketRouter(BaseModule):
 
             # Parse link parameter string
             try:
+                match = None
+                if isinstance(route_def, dict):
+                    match = route_def.get("match")
+                    route_def = route_def["route"]
                 endpoint_a, endpoint_b = [ params.strip() for params in route_def.split(">") ]
             except:
                 self.log.error(f"Malformed route configuration: {route_def!r}")
                 continue
 
             # Parse link configuration
-            self.create_route(endpoint_a, endpoint_b)
+            try:
+                self.create_route(endpoint_a, endpoint_b, match)
+            except (RuntimeError, ValueError) as e:
+                self.log.error(f"Failed to create route {route_def!r}: {e}")
 
 
-    def create_route(self, endpoint_a: str, endpoint_b: str) -> None:
+    def _get_endpoint(self, endpoint_name: str):
+        """ Get endpoint by name """
+        try:
+            return self.endpoints[endpoint_name]
+        except KeyError as e:
+            self.log.error(f"Endpoint {e} not found!")
+            raise RuntimeError(f"Endpoint {e} not found!")
+
+
+    def create_route(self, endpoint_a: str, endpoint_b: str, match: Optional[Dict[str, Any]] = None) -> None:
         """
-        Create or remote new route from endpoint A (to endpoint B)
+        Create new route from endpoint A to endpoint B or replace the match rule of an existing one.
+        A source endpoint can have routes to multiple destinations.
 
         Args:
-            endpoint_a:
-            endpoint_b:
-
+            endpoint_a: Name of the source endpoint
+            endpoint_b: Name of the destination endpoint
+            match: Match rule the frames must satisfy to be routed (see router_rules).
+                None routes all the frames.
         """
 
         if endpoint_a == endpoint_b:
             raise ValueError("Loop")
 
-        try:
-            a = self.endpoints[endpoint_a]
-            if endpoint_b is not None:
-                b = self.endpoints[endpoint_b]
-            else:
-                b = None
-        except KeyError as e:
-            self.log.error(f"Endpoint {e} not found!")
-            raise RuntimeError(f"Endpoint {e} not found!")
-
-        # Remove old route from A if such exists
-        if a.link is not None:
-            self.log.info(f"Removed route: {endpoint_a} -> {a.link.name}")
-            a.link = None
+        a = self._get_endpoint(endpoint_a)
+        b = self._get_endpoint(endpoint_b)
+        if b.queue is None:
+            raise ValueError(f"Endpoint {endpoint_b} is not capable to send!")
 
-            #if a.connected and not a.pesistent:
-            #    a.disconnect()
+        route = Route(a, b, match)
+        action = "Updated" if endpoint_b in a.links else "Created new"
+        a.links[endpoint_b] = route
+        a.dispatch = DispatchTable(a.links.values())
+        self.log.info(f"{action} route: {endpoint_a} -> {endpoint_b} ({route.kind}"
+                      + (f", match {match}" if match else "") + ")")
 
-        # Create new route if new endpoint was given
-        if b is not None:
-            a.link = b
-            self.log.info(f"Created new route: {endpoint_a} -> {endpoint_b}")
 
-
-    def route_frame(self, source: str, frame: bytes) -> None:
+    def remove_route(self, endpoint_a: str, endpoint_b: Optional[str] = None) -> None:
         """
-        Route received frame to corresponding outgoing endpoint
+        Remove route from endpoint A to endpoint B or all routes from endpoint A.
+
+        Args:
+            endpoint_a: Name of the source endpoint
+            endpoint_b: Name of the destination endpoint. If None, all routes from A are removed.
         """
 
-        try:
+        a = self._get_endpoint(endpoint_a)
+        names = list(a.links) if endpoint_b is None else [ endpoint_b ]
+        for name in names:
+            if a.links.pop(name, None) is not None:
+                self.log.info(f"Removed route: {endpoint_a} -> {name}")
+        a.dispatch = DispatchTable(a.links.values())
 
-            destination = source.link
-            if destination is None:
-                self.log.warning(f"Got a frame from {source.name!r} but there is no connection forward")
-                return
 
-            # Apply the input formatter
-            if source.formatter:
-                frame = source.formatter(frame)
-            else:
-                frame = json.loads(frame)
+    async def route_frame(self, source: str, frame: bytes) -> None:
+        """
+        Route received frame to all the destination endpoints of the source.
+
+        Without an input formatter the received bytes are parsed as a binary frame
+        (see porthouse.core.frame) or as a JSON frame. Without an output formatter
+        the frame is sent in the destination endpoint's frame_format (json or binary).
+        The formatting is done by each route's compiled pipeline (see router_pipeline),
+        which skips the decoding when the route doesn't need it.
+
+        If some of the routes have match rules, the frame is decoded and the routes are
+        selected with the source's dispatch table (see router_rules). A frame which can't
+        be decoded is still routed by the unconditional routes which don't decode it.
+
+        The formatted frames are put to the destinations' send queues. If a queue is full
+        and its overflow policy is "block", this waits until the destination has sent
+        frames, which slows down the receiving of the source endpoint. The frame is queued
+        to the other destinations before waiting, so a full queue doesn't delay them.
+        """
+        await self.route_frames(source, (frame, ))
 
-            # Possible inparseable frame or a control frame so skip it
-            if frame is None:
-                return
 
-            # Merge all metadata field with priority
-            metadata = source.metadata.copy()
-            metadata.update(destination.metadata)
-            metadata.update(frame.metadata)
-            frame.metadata = metadata
+    async def route_frames(self, source: str, frames: List[bytes]) -> None:
+        """
+        Route a batch of received frames from the source in order. See route_frame.
+        """
 
-            # Apply the output formatter
-            if destination.formatter:
-                frame = destination.formatter(frame)
+        if not source.links:
+            self.log.warning(f"Got {len(frames)} frame(s) from {source.name!r} but there is no connection forward")
+            return
+
+        dispatch = source.dispatch
+        for raw in frames:
+            decoded = None
+            blocked = []
+            if dispatch.conditional:
+                try:
+                    decoded = decode_frame(source, raw)
+                except:
+                    self.log.error(f"Failed to decode packet from {source.name}!", exc_info=True)
+                    decoded = None
+
+                # Unparseable frames are routed only by the unconditional routes
+                routes = dispatch.select(decoded)
+                if decoded is None and any(not route.takes_raw for route in routes):
+                    routes = [ route for route in routes if route.takes_raw ]
             else:
-                frame = json.dumps(frame).encode("ascii")
-
-            self.log.debug(f"Routing frame {source.name} --> {destination.name}")
-
-            if not hasattr(destination, "send"):
-                self.log.warning(f"Destination endpoint {destination.name} is not capable to send!")
-                return
-
-            # Send it forward
-            result = destination.send(frame)
-            if hasattr(result, "__await__"):
-                asyncio.create_task(result)
-
-        except:
-            self.log.error("Failed to route packet! Unknown error", exc_info=True)
+                routes = dispatch.routes
+
+            for route in routes:
+                try:
+                    if route.takes_raw:
+                        out = route.pipeline(raw)
+                    else:
+                        # Decode the frame only once for all the routes needing it
+                        if decoded is None:
+                            decoded = decode_frame(source, raw)
+
+                            # Possible inparseable frame or a control frame so skip it
+                            if decoded is None:
+                                break
+                        out = route.pipeline(decoded)
+
+                    if out is None:
+                        continue
+
+                    # Queue it for sending. The full blocking queues are waited after the other routes.
+                    queue = route.destination.queue
+                    if not queue.put_nowait(out) and queue.overflow == "block":
+                        blocked.append((queue, out))
+
+                except:
+                    self.log.error(f"Failed to route packet {source.name} --> {route.destination.name}!",
+                                   exc_info=True)
+
+            for queue, out in blocked:
+                await queue.put(out)
 
 
 if __name__ == "__main__":
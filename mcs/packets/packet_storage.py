@@ -13,7 +13,9 @@ import zmq
 import zmq.asyncio
 
 from porthouse.core.basemodule_async import BaseModule, queue, rpc, bind, RPCError
-from .database import PacketsDatabase
+from porthouse.core.codecs import CodecError
+from porthouse.core.frame import Frame
+from .database import AsyncPacketsDatabase
 
 
 
@@ -26,26 +28,30 @@ class PacketStorage(BaseModule):
     def __init__(self,
             db_url: str,
             links: List[Dict[str, Any]],
+            db_pool_size: int = 5,
             **kwargs):
         """
         Initialise module
 
         Args:
+            db_url: Database URL
             links: List of link definitions
+            db_pool_size: Maximum number of pooled database connections
         """
         BaseModule.__init__(self, **kwargs)
         self.links = {}
 
-        self.db = PacketsDatabase(db_url)
+        self.db = AsyncPacketsDatabase(db_url, pool_size=db_pool_size, metrics=self.metrics, log=self.log)
         self.zmq_ctx = None
 
         loop = asyncio.get_event_loop()
+        loop.run_until_complete(self.db.connect())
         loop.create_task(self.create_links(links))
 
 
     @rpc()
     @bind('packets', 'rpc.#', prefixed=True)
-    def rpc_handler(self, request_name: str, request_data: Dict[str, Any]):
+    async def rpc_handler(self, request_name: str, request_data: Dict[str, Any]):
         """
         Remote Procedure Calls
 
@@ -63,7 +69,7 @@ class PacketStorage(BaseModule):
 
             try:
                 packets = []
-                for packet in self.db.query(**request_data):
+                for packet in await self.db.query(**request_data):
                     packet["data"] = packet.get("data", "").hex()
                     packet["timestamp"] = packet.get("timestamp", datetime.now(timezone.utc)).isoformat()
                     packets.append(packet)
@@ -84,11 +90,7 @@ class PacketStorage(BaseModule):
                 Get list of satellites in the database
             """
 
-            response = []
-            self.db_cursor.execute("SELECT satellite, COUNT(*) FROM packets GROUP BY satellite", request_data)
-            for name, packets in self.db_cursor.fetchall():
-                response.append({"name": name, "packets": packets})
-            return {"satellites": response}
+            return {"satellites": await self.db.satellites()}
 
         elif request_name == "rpc.import":
             pass
@@ -164,27 +166,36 @@ class PacketStorage(BaseModule):
                 self.log.error(f"Malformed link configuration. ValueError {e}: {link_params!r}", exc_info=True)
 
 
-    def parse_json_frame_to_db(self, msg, additional_params):
+    async def parse_json_frame_to_db(self, msg, additional_params):
         """
-        Parse JSON frame ready to database
+        Parse JSON frame ready to database. The frame can also be an already decoded dict,
+        a Frame object or a binary frame.
         """
 
         try:
-            packet = json.loads(msg)
+            if isinstance(msg, Frame):
+                packet = self.frame_to_packet(msg)
+            elif isinstance(msg, dict):
+                packet = msg
+            elif Frame.is_binary(msg):
+                packet = self.frame_to_packet(Frame.from_bytes(msg))
+            else:
+                packet = json.loads(msg)
 
             # Ignore replayed and control packets
             if packet.get("replayed", False) or packet.get("data", None) is None:
                 return
 
-            # Parse hexadecimal string to bytes
-            packet["data"] = bytes.fromhex(packet["data"])
+            # Parse hexadecimal string to bytes (binary codecs carry raw bytes)
+            if isinstance(packet["data"], str):
+                packet["data"] = bytes.fromhex(packet["data"])
 
             # Merge packet and additional fields dict
             pp = additional_params.copy()
             pp.update(packet)
             packet = pp
 
-            self.db.store_packet(**packet)
+            await self.db.store_packet(**packet)
 
             self.log.debug("New packet %s %s: (%d bytes)", packet["satellite"], packet["packet_type"], len(packet["data"]))
 
@@ -201,11 +212,31 @@ class PacketStorage(BaseModule):
             self.log.error(f"Failed to parse incoming frame {msg!r}", exc_info=True)
 
 
+    @staticmethod
+    def frame_to_packet(frame: Frame) -> Dict[str, Any]:
+        """
+        Convert a Frame object to the packet fields stored to the database.
+        """
+        packet = dict(frame.metadata)
+        packet.update({
+            "satellite": frame.satellite,
+            "source": frame.source,
+            "timestamp": frame.timestamp.isoformat() if frame.timestamp is not None else None,
+            "data": bytes(frame.data),
+        })
+        return {key: value for key, value in packet.items() if value is not None}
+
+
     async def amqp_data_callback(self, message, additional_data):
         """
             AMQP callback to store packet to database
         """
-        self.parse_json_frame_to_db(message.body, additional_data)
+        try:
+            packet = self.decode_message(message)
+        except CodecError:
+            self.log.error(f"Failed to decode incoming frame {message.body!r}", exc_info=True)
+            return
+        await self.parse_json_frame_to_db(packet, additional_data)
 
 
     async def zmq_data_receiver(self, sock, additional_data, **kwargs):
@@ -214,7 +245,7 @@ class PacketStorage(BaseModule):
         """
         while True:
             packet = await sock.recv()
-            self.parse_json_frame_to_db(packet, additional_data)
+            await self.parse_json_frame_to_db(packet, additional_data)
 
 
 if __name__ == "__main__":
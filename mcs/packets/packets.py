@@ -41,8 +41,10 @@ def setup_parser(packets_parser: argparse.ArgumentParser) -> None:
         help="List all PacketRouter's endpoints and routes")
     packets_parser.add_argument('--route', nargs=2,
         help="Create a new route")
+    packets_parser.add_argument('--match',
+        help="Match rule of the new route as JSON, e.g. '{\"vc\": 1}'")
     packets_parser.add_argument('--unroute', nargs='*',
-        help="Destroy route")
+        help="Destroy the route from the first endpoint to the second, or all routes from the endpoint")
 
 
 
@@ -98,10 +100,14 @@ def main(parser: argparse.ArgumentParser, args: argparse.Namespace) -> None:
         print()
 
         print("# ROUTES:")
-        print("Source          | Destination")
-        print("----------------|-----------------")
+        print("Source          | Destination     | Queue:  | Dropped: | Latency p90:")
+        print("----------------|-----------------|---------|----------|-------------")
         for route in res["routes"]:
-            print(f"{route['source']:<16}| {route['destination']:<16}")
+            queue = route.get("queue") or {}
+            depth = f"{queue.get('depth', 0)}/{queue.get('size', 0)}"
+            latency = queue.get("latency", {}).get("p90", 0.0) * 1000
+            print(f"{route['source']:<16}| {route['destination']:<16}| {depth:<8}| {queue.get('dropped', 0):<9}| "
+                  f"{latency:.1f} ms" + (f"  match: {json.dumps(route['match'])}" if route.get("match") else ""))
         print()
 
 
@@ -111,7 +117,10 @@ def main(parser: argparse.ArgumentParser, args: argparse.Namespace) -> None:
         """
         a, b = args.route
         print(f"Creating route {a!r} --> {b!r}")
-        res = send_rpc_request("packets", "router.rpc.connect", {"a": a, "b": b})
+        request = { "a": a, "b": b }
+        if args.match:
+            request["match"] = json.loads(args.match)
+        res = send_rpc_request("packets", "router.rpc.connect", request)
 
         if "error" in res:
             print("Failed to connect routes!", res["error"])
@@ -122,8 +131,11 @@ def main(parser: argparse.ArgumentParser, args: argparse.Namespace) -> None:
         Unroute selected
         """
 
-        print(f"Unrouting {args.unroute[0]!r}")
-        res = send_rpc_request("packets", "router.rpc.disconnect", {"a": args.unroute[0] })
+        print(f"Unrouting {' --> '.join(map(repr, args.unroute))}")
+        request = { "a": args.unroute[0] }
+        if len(args.unroute) > 1:
+            request["b"] = args.unroute[1]
+        res = send_rpc_request("packets", "router.rpc.disconnect", request)
 
         if "error" in res:
             print("Failed to disconnect routes!", res["error"])
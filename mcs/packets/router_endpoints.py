@@ -4,9 +4,15 @@ import aiormq
 import zmq
 import zmq.asyncio
 
-import socket
-from typing import List, NoReturn, Optional, Tuple, Union
+from collections import deque
+from typing import Any, Deque, Dict, List, NoReturn, Optional, Set, Tuple, Union
 
+from porthouse.core.frame import Frame, FRAME_CONTENT_TYPE
+from .router_framing import FramingError, get_framing
+
+
+# Histogram bucket upper bounds for the received batch sizes
+BATCH_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024)
 
 
 class ZMQ_Subscriber_Endpoint:
@@ -21,6 +27,7 @@ class ZMQ_Subscriber_Endpoint:
             connect: Optional[str]=None,
             subscribe: str="",
             multipart: bool=False,
+            batch_size: int=64,
             **kwargs
         ):
         """
@@ -30,16 +37,20 @@ class ZMQ_Subscriber_Endpoint:
             connect: Address used for connecting
             subcribe: Optional subscriber topic filter
             multipart: If true, the ZMQ multipart messages will be used.
+            batch_size: Maximum number of already received messages routed at once
 
         Remarks:
             If multipart is used, the received and transmitted packet objects are
             always tuples containing the bytes object. Formatter supporting this must be used!
+            The received messages are not copied. They are passed on as memoryviews on the
+            passthrough and raw routes and copied to bytes for the input formatters.
         """
         self.m = m
         self._subscribe = subscribe
         self._bind = bind
         self._connect = connect
         self._multipart = multipart
+        self._batch_size = max(1, int(batch_size))
         self._task = None
         self._closing: Optional[asyncio.Future] = None
         self._sock: Optional[zmq.socket] = None
@@ -72,12 +83,30 @@ class ZMQ_Subscriber_Endpoint:
         self._sock.close()
         del self._sock
 
+    async def _recv(self, flags: int = 0):
+        """ Receive a message without copying it """
+        if self._multipart:
+            return tuple(frame.buffer for frame in await self._sock.recv_multipart(flags, copy=False))
+        return (await self._sock.recv(flags, copy=False)).buffer
+
     async def _receiver(self) -> NoReturn:
-        """ ZMQ receiver task  """
+        """
+        ZMQ receiver task. After each received message, all the already queued messages
+        (up to the batch size) are drained with non-blocking receives and routed together.
+        """
+        metrics = self.m.metrics
         try:
             while not self._closing.done():
-                packet = await (self._sock.recv_multipart() if self.multipart else self._sock.recv())
-                self.m.route_frame(self, packet)
+                batch = [ await self._recv() ]
+                while len(batch) < self._batch_size:
+                    try:
+                        batch.append(await self._recv(zmq.NOBLOCK))
+                    except zmq.Again:
+                        break
+
+                if metrics is not None:
+                    metrics.observe(f"router.{self.name}.batch_size", len(batch), BATCH_BUCKETS)
+                await self.m.route_frames(self, batch)
         except:
             import traceback
             traceback.print_exc()
@@ -156,7 +185,9 @@ class Outgoing_AMQP_Endpoint:
 
     async def send(self, pkt) -> None:
         """ Send packet to AMQP exchange """
-        await self.m.channel.basic_publish(pkt, exchange=self._exchange, routing_key=self._routing_key)
+        properties = aiormq.spec.Basic.Properties(content_type=FRAME_CONTENT_TYPE) if Frame.is_binary(pkt) else None
+        await self.m.channel.basic_publish(bytes(pkt), exchange=self._exchange, routing_key=self._routing_key,
+                                           properties=properties)
 
 
 class Incoming_AMQP_Endpoint:
@@ -187,7 +218,110 @@ class Incoming_AMQP_Endpoint:
 
     async def receiver_callback(self, pkt: aiormq.abc.DeliveredMessage) -> None:
         """ """
-        self.m.route_frame(self, pkt.body)
+        await self.m.route_frame(self, pkt.body)
+
+
+def _split_address(address: str) -> Tuple[str, int]:
+    """ Split "host:port" address string """
+    host, port = address.rsplit(":", 1)
+    return host, int(port)
+
+
+class _Inbox:
+    """
+        Buffer for the frames received in the asyncio protocol callbacks.
+        A task routes the buffered frames in batches. When the buffer is full,
+        the reading of stream transports is paused and datagrams are dropped.
+    """
+
+    def __init__(self, endpoint, max_pending: int=1024, batch_size: int=64):
+        self.endpoint = endpoint
+        self.max_pending = max_pending
+        self.batch_size = batch_size
+        self.dropped = 0
+        self._frames: Deque = deque()
+        self._ready = asyncio.Event()
+        self._paused: Set[asyncio.Transport] = set()
+        self._task: Optional[asyncio.Task] = None
+
+    def __len__(self) -> int:
+        return len(self._frames)
+
+    def start(self) -> None:
+        """ Start the routing task """
+        if self._task is None:
+            self._task = asyncio.get_event_loop().create_task(self._router())
+
+    def stop(self) -> None:
+        """ Stop the routing task and discard the buffered frames """
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        self._frames.clear()
+        self._paused.clear()
+
+    def put(self, frames: List[bytes], transport: Optional[asyncio.Transport]=None) -> None:
+        """
+        Buffer received frames. If the frames were read from a stream transport, its
+        reading is paused until the buffer has been routed. Otherwise the frames are
+        dropped if the buffer is full.
+        """
+        if transport is None and len(self._frames) >= self.max_pending:
+            self.dropped += len(frames)
+            metrics = self.endpoint.m.metrics
+            if metrics is not None:
+                metrics.inc(f"router.{self.endpoint.name}.dropped", len(frames))
+            return
+
+        self._frames.extend(frames)
+        self._ready.set()
+        if transport is not None and len(self._frames) >= self.max_pending and transport not in self._paused:
+            transport.pause_reading()
+            self._paused.add(transport)
+
+    def forget(self, transport: asyncio.Transport) -> None:
+        """ Forget a closed transport """
+        self._paused.discard(transport)
+
+    async def _router(self) -> NoReturn:
+        """ Route the buffered frames in batches """
+        m, frames = self.endpoint.m, self._frames
+        while True:
+            await self._ready.wait()
+            self._ready.clear()
+            while frames:
+                batch = [ frames.popleft() for _ in range(min(len(frames), self.batch_size)) ]
+                if m.metrics is not None:
+                    m.metrics.observe(f"router.{self.endpoint.name}.batch_size", len(batch), BATCH_BUCKETS)
+                try:
+                    await m.route_frames(self.endpoint, batch)
+                except Exception:
+                    m.log.error(f"Failed to route frames from {self.endpoint.name!r}", exc_info=True)
+
+            for transport in self._paused:
+                if not transport.is_closing():
+                    transport.resume_reading()
+            self._paused.clear()
+
+
+class _UDPProtocol(asyncio.DatagramProtocol):
+    """ Datagram protocol passing the received datagrams to the endpoint """
+
+    def __init__(self, endpoint):
+        self.endpoint = endpoint
+
+    def datagram_received(self, data: bytes, addr: Tuple[str, int]) -> None:
+        self.endpoint._inbox.put((data, ))
+
+    def error_received(self, exc: Exception) -> None:
+        self.endpoint.m.log.warning(f"UDP endpoint {self.endpoint.name!r} error: {exc}")
+
+
+class _UDPSenderProtocol(_UDPProtocol):
+    """ Datagram protocol for send-only endpoints ignoring the received datagrams """
+
+    def datagram_received(self, data: bytes, addr: Tuple[str, int]) -> None:
+        self.endpoint.m.log.debug(f"UDP endpoint {self.endpoint.name!r} ignored a datagram from {addr}")
 
 
 class Outgoing_UDP_Endpoint:
@@ -196,24 +330,31 @@ class Outgoing_UDP_Endpoint:
     """
     type_identifier = "udp-out"
     def __init__(self, m, connect: str, **kwargs):
+        """
+        Args:
+            connect: Destination address as "host:port"
+        """
         self.m = m
-        self._host, self._port = connect.split(":")
-        self._port = int(self._port)
-        self._sock: Optional[socket.socket] = None
+        self._host, self._port = _split_address(connect)
+        self._transport: Optional[asyncio.DatagramTransport] = None
 
-    def connect(self) -> None:
+    async def connect(self) -> None:
         """ Create new UDP socket """
-        self._sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        loop = asyncio.get_event_loop()
+        self._transport, _ = await loop.create_datagram_endpoint(
+            lambda: _UDPSenderProtocol(self), remote_addr=(self._host, self._port))
 
     def disconnect(self) -> None:
         """ Disconnect the UDP socket """
-        self._sock = None
+        if self._transport is not None:
+            self._transport.close()
+            self._transport = None
 
     async def send(self, pkt: bytes) -> None:
-        """ """
-        if not isinstance(pkt, bytes):
+        """ Send frame as a datagram """
+        if not isinstance(pkt, (bytes, memoryview)):
             raise ValueError(f"UDP can send only byte decoded packets! {type(pkt)} given")
-        await self._sock.sendto(pkt, (self._host, self._port))
+        self._transport.sendto(pkt)
 
 
 class Incoming_UDPEndpoint:
@@ -221,27 +362,81 @@ class Incoming_UDPEndpoint:
         UDP Endpoint for the packet router
     """
     type_identifier = "udp-in"
-    def __init__(self, m, bind: str, **kwargs):
+    def __init__(self, m, bind: str, max_pending: int=1024, **kwargs):
+        """
+        Args:
+            bind: Listening address as "host:port"
+            max_pending: Maximum number of received datagrams waiting for routing.
+                Datagrams received when the limit is reached are dropped.
+        """
         self.m = m
-        self._host, self._port = bind.split(":")
-        self._sock: Optional[socket.socket] = None
+        self._host, self._port = _split_address(bind)
+        self._transport: Optional[asyncio.DatagramTransport] = None
+        self._inbox = _Inbox(self, max_pending)
 
-    def connect(self) -> None:
+    async def connect(self) -> None:
         """ Start listening UDP port """
         loop = asyncio.get_event_loop()
-        self._sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-        self._sock.bind(self._host, self._port)
-        loop.add_reader(self._sock, self._received_callback)
+        self._transport, _ = await loop.create_datagram_endpoint(
+            lambda: _UDPProtocol(self), local_addr=(self._host, self._port))
+        self._inbox.start()
 
-    async def disconnect(self) -> None:
+    def disconnect(self) -> None:
         """ Disconnect the UDP socket """
-        loop = asyncio.get_event_loop()
-        loop.remove_reader(self._sock)
-        self._sock.close()
-
-    async def _received_callback(self) -> None:
-        packet = await self._sock.recv()
-        self.m.route_frame(self, packet)
+        if self._transport is not None:
+            self._transport.close()
+            self._transport = None
+        self._inbox.stop()
+
+
+class _TCPConnection(asyncio.Protocol):
+    """ Stream protocol for a single TCP connection of a TCP endpoint """
+
+    def __init__(self, endpoint):
+        self.endpoint = endpoint
+        self.framing = endpoint._framing_class(endpoint._max_frame_size)
+        self.transport: Optional[asyncio.Transport] = None
+        self.peer = None
+        self.closed = asyncio.get_event_loop().create_future()
+        self.paused = False
+        self.dropped = 0
+
+    def connection_made(self, transport: asyncio.Transport) -> None:
+        self.transport = transport
+        self.peer = transport.get_extra_info("peername")
+        transport.set_write_buffer_limits(high=self.endpoint._write_buffer)
+        self.endpoint._connections.add(self)
+        self.endpoint.m.log.info(f"TCP endpoint {self.endpoint.name!r} connected to {self.peer}")
+
+    def connection_lost(self, exc: Optional[Exception]) -> None:
+        self.endpoint._connections.discard(self)
+        self.endpoint._inbox.forget(self.transport)
+        self.endpoint.m.log.info(f"TCP endpoint {self.endpoint.name!r} disconnected from {self.peer}")
+        if not self.closed.done():
+            self.closed.set_result(exc)
+
+    def data_received(self, data: bytes) -> None:
+        try:
+            frames = self.framing.feed(data)
+        except FramingError as e:
+            self.endpoint.m.log.error(f"TCP endpoint {self.endpoint.name!r} framing error from {self.peer}: {e}")
+            self.transport.close()
+            return
+        if frames:
+            self.endpoint._inbox.put(frames, self.transport)
+
+    def pause_writing(self) -> None:
+        self.paused = True
+
+    def resume_writing(self) -> None:
+        self.paused = False
+
+    def write(self, buffers) -> None:
+        """ Write the encoded frame or drop it if the peer's write buffer is full """
+        if self.paused:
+            self.dropped += 1
+        else:
+            self.transport.writelines(buffers)
 
 
 class TCPEndpoint:
@@ -252,78 +447,96 @@ class TCPEndpoint:
     type_identifier = "tcp"
 
     def __init__(self,
+            m,
             bind: Optional[str]=None,
             connect: Optional[str]=None,
+            framing: str="length",
+            max_frame_size: int=1 << 20,
+            write_buffer: int=1 << 20,
+            max_pending: int=1024,
+            reconnect_interval: float=5.0,
             **kwargs
         ):
         """
-
         Args:
-            bind:
-            connect:
+            bind: Listening address as "host:port". Any number of clients can connect.
+            connect: Server address as "host:port". The connection is reopened if it's lost.
+            framing: Stream framing: "length", "kiss", "hdlc" or "newline" (see router_framing)
+            max_frame_size: Maximum frame size in bytes
+            write_buffer: Size of the write buffer of each connection in bytes. The frames sent
+                to a connection are dropped when its buffer is full.
+            max_pending: Maximum number of received frames waiting for routing before the
+                reading of the connections is paused
+            reconnect_interval: Delay in seconds between the connection attempts
         """
+        if (bind is None) == (connect is None):
+            raise ValueError("Either bind or connect must be given!")
+        self.m = m
         self._bind = bind
         self._connect = connect
-        self._sock: Optional[socket.socket] = None
-        self._listen_sock: Optional[socket.socket] = None
-        self._closing: Optional[asyncio.Future] = None
-        self._clients: List[socket.socket] = []
-
-    async def connect(self):
-        """ Make new TCP server/client """
+        self._framing_class = get_framing(framing)
+        self._max_frame_size = int(max_frame_size)
+        self._encoder = self._framing_class(self._max_frame_size)
+        self._write_buffer = int(write_buffer)
+        self._reconnect_interval = reconnect_interval
+        self._connections: Set[_TCPConnection] = set()
+        self._inbox = _Inbox(self, max_pending)
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._client_task: Optional[asyncio.Task] = None
 
-        loop = asyncio.get_current_event_loop()
+    async def connect(self) -> None:
+        """ Start the TCP server or client """
+        loop = asyncio.get_event_loop()
+        self._inbox.start()
         if self._bind is not None:
-            # Create new TCP socket and start listening new incoming connections
-            host, port = self._bind.split(":")
-            self._listen_sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            self._listen_sock.setblocking(False)
-            self._listen_sock.bind((host, int(port)))
-
-            loop = asyncio.get_event_loop()
-            loop.add_task(self._listen_task)
-            self._closing = loop.create_future()
-
-        elif self._connect is not None:
-            # Create new TCP socket and connect to given address
-            self._sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            self._sock.setblocking(False)
-            await loop.sock_connect(self._sock, host, port = self._connect.split(":"))
-            self._closing = loop.create_future()
-
+            host, port = _split_address(self._bind)
+            self._server = await loop.create_server(lambda: _TCPConnection(self), host, port)
         else:
-            raise ValueError("Neither bind or connect!")
+            self._client_task = loop.create_task(self._client())
 
-    async def _listen_task(self) -> None:
-        """ Listen new incoming TCP connections """
+    async def _client(self) -> NoReturn:
+        """ Keep the client connection open """
         loop = asyncio.get_event_loop()
-        while not self._closing.done():
-            client, addr = await loop.sock_accept(self._listen_sock)
-            print("New connection", addr)
-            loop.add_task(self._receive_task(client))
-        self._listen_sock.close()
-        self._listen_sock = None
-
-    async def _receive_task(self, client: socket.socket) -> None:
-        """ Receive new frames from client """
-        loop = asyncio.get_event_loop()
-        self._clients.append(client)
-        while not self._closing.done():
-            pkt = await loop.sock_recv(client)
-            self.m.route_frame(self, pkt)
-        self._clients.remove(client)
-        client.close()
-
-    async def disconnect(self):
-        """ Disconnect the TCP socket(s) """
-        self._closing.set_result(0)
+        host, port = _split_address(self._connect)
+        while True:
+            try:
+                _, connection = await loop.create_connection(lambda: _TCPConnection(self), host, port)
+                await connection.closed
+            except OSError as e:
+                self.m.log.warning(f"TCP endpoint {self.name!r} failed to connect {self._connect}: {e}")
+            await asyncio.sleep(self._reconnect_interval)
+
+    async def disconnect(self) -> None:
+        """ Stop the TCP server or client and close the connections """
+        if self._client_task is not None:
+            self._client_task.cancel()
+            self._client_task = None
+        if self._server is not None:
+            self._server.close()
+        for connection in list(self._connections):
+            connection.transport.close()
+        if self._server is not None:
+            await self._server.wait_closed()
+            self._server = None
+        self._inbox.stop()
 
     async def send(self, pkt) -> None:
-        """ Send frame to client(s) """
-        if not isinstance(pkt, bytes):
+        """ Send frame to the connected peer(s) """
+        if not isinstance(pkt, (bytes, memoryview)):
             raise ValueError(f"TCP can send only byte decoded packets! {type(pkt)} given")
-        if self._sock:
-            self._sock.send(pkt)
-        else:
-            for client in self._clients:
-                client.send(pkt)
+        buffers = self._encoder.encode(pkt)
+        for connection in self._connections:
+            connection.write(buffers)
+
+    def stats(self) -> Dict[str, Any]:
+        """ Return connection statistics """
+        return {
+            "connections": [
+                {
+                    "peer": str(connection.peer),
+                    "write_buffer": connection.transport.get_write_buffer_size(),
+                    "dropped": connection.dropped,
+                } for connection in self._connections
+            ],
+            "pending": len(self._inbox),
+        }
@@ -15,6 +15,9 @@ def raw_to_json(pkt: bytes) -> Dict[str, Any]:
         "data": pkt.hex(),
     }
 
+# The received bytes are only wrapped as the frame data (see router_pipeline)
+raw_to_json.raw_decoder = True
+
 
 def json_to_raw(pkt: Dict[str, Any]) -> bytes:
     """
@@ -22,3 +25,6 @@ def json_to_raw(pkt: Dict[str, Any]) -> bytes:
     """
     if len(pkt.get("data", "")) > 0:
         return bytes.fromhex(pkt["data"])
+
+# Only the frame data is output (see router_pipeline)
+json_to_raw.raw_encoder = True
@@ -0,0 +1,220 @@
+"""
+    Stream framings for the packet router's TCP endpoints.
+
+    A TCP stream has no message boundaries, so the frames are delimited with one of
+    the framings below. Each framing has an encoder and an incremental parser which
+    is fed with the received chunks and returns the frames completed by them.
+
+    - "length": 32-bit big-endian length prefix followed by the frame
+    - "kiss": KISS TNC framing (FEND delimited, FESC escaped, data frames on port 0)
+    - "hdlc": Asynchronous HDLC-like byte stuffing (0x7E flag, 0x7D escape) without FCS
+    - "newline": Newline terminated frames, e.g. JSON frames which never contain raw newlines
+"""
+
+import struct
+from typing import Dict, List, Optional, Sequence, Type, Union
+
+
+__all__ = [
+    "Framing",
+    "FramingError",
+    "LengthPrefixFraming",
+    "KISSFraming",
+    "HDLCFraming",
+    "NewlineFraming",
+    "FRAMINGS",
+    "get_framing",
+]
+
+Buffer = Union[bytes, bytearray, memoryview]
+
+
+class FramingError(ValueError):
+    """
+    Raised if the stream cannot be parsed or a frame cannot be encoded.
+    """
+
+
+class Framing:
+    """
+    Base class for the stream framings. A framing instance holds the parser state
+    of a single stream, so each connection needs its own instance.
+    """
+
+    def __init__(self, max_frame_size: int = 1 << 20):
+        """
+        Args:
+            max_frame_size: Maximum accepted frame size in bytes
+        """
+        self.max_frame_size = max_frame_size
+        self._buffer = bytearray()
+
+    def encode(self, data: Buffer) -> Sequence[Buffer]:
+        """
+        Encode a frame for the stream.
+
+        Returns:
+            Sequence of buffers to be written to the stream in order.
+        """
+        raise NotImplementedError()
+
+    def feed(self, data: Buffer) -> List[bytes]:
+        """
+        Feed received bytes to the parser.
+
+        Returns:
+            The frames completed by the data.
+
+        Raises:
+            FramingError if the stream is corrupted beyond resynchronization.
+        """
+        raise NotImplementedError()
+
+
+class LengthPrefixFraming(Framing):
+    """
+    Frames prefixed with their length as a 32-bit big-endian integer.
+    """
+
+    HEADER = struct.Struct(">I")
+
+    def encode(self, data: Buffer) -> Sequence[Buffer]:
+        if len(data) > self.max_frame_size:
+            raise FramingError(f"Frame too large ({len(data)} bytes)")
+        return (self.HEADER.pack(len(data)), data)
+
+    def feed(self, data: Buffer) -> List[bytes]:
+        buffer = self._buffer
+        buffer += data
+        frames, pos, header_size = [], 0, self.HEADER.size
+        while len(buffer) - pos >= header_size:
+            length, = self.HEADER.unpack_from(buffer, pos)
+            if length > self.max_frame_size:
+                # There's no way to find the next frame boundary
+                raise FramingError(f"Frame too large ({length} bytes)")
+            end = pos + header_size + length
+            if end > len(buffer):
+                break
+            frames.append(bytes(buffer[pos + header_size:end]))
+            pos = end
+        del buffer[:pos]
+        return frames
+
+
+class _DelimitedFraming(Framing):
+    """
+    Base class for framings where the frames are separated by a delimiter byte and
+    the delimiter is escaped inside the frames. A too long frame is discarded and
+    the parser resynchronizes at the next delimiter.
+    """
+
+    DELIMITER: bytes
+    START_DELIMITER = True
+
+    def _escape(self, data: Buffer) -> bytes:
+        raise NotImplementedError()
+
+    def _unescape(self, data: bytearray) -> Optional[bytes]:
+        raise NotImplementedError()
+
+    def encode(self, data: Buffer) -> Sequence[Buffer]:
+        if len(data) > self.max_frame_size:
+            raise FramingError(f"Frame too large ({len(data)} bytes)")
+        escaped = self._escape(data)
+        if self.START_DELIMITER:
+            return (self.DELIMITER, escaped, self.DELIMITER)
+        return (escaped, self.DELIMITER)
+
+    def feed(self, data: Buffer) -> List[bytes]:
+        buffer = self._buffer
+        buffer += data
+        frames, pos = [], 0
+        while True:
+            end = buffer.find(self.DELIMITER, pos)
+            if end < 0:
+                break
+            if end > pos:
+                frame = self._unescape(buffer[pos:end])
+                if frame is not None and len(frame) <= self.max_frame_size:
+                    frames.append(frame)
+            pos = end + 1
+        del buffer[:pos]
+
+        if len(buffer) > 2 * self.max_frame_size + 2:
+            # Discard the partial frame which can't be valid anymore
+            buffer.clear()
+        return frames
+
+
+class KISSFraming(_DelimitedFraming):
+    """
+    KISS framing. Only the data frames of the port 0 are passed and the other
+    KISS commands are ignored.
+    """
+
+    DELIMITER = b"\xC0"
+
+    def _escape(self, data: Buffer) -> bytes:
+        return b"\x00" + bytes(data).replace(b"\xDB", b"\xDB\xDD").replace(b"\xC0", b"\xDB\xDC")
+
+    def _unescape(self, data: bytearray) -> Optional[bytes]:
+        if data[0] != 0x00:
+            return None
+        return bytes(data[1:].replace(b"\xDB\xDC", b"\xC0").replace(b"\xDB\xDD", b"\xDB"))
+
+
+class HDLCFraming(_DelimitedFraming):
+    """
+    Asynchronous HDLC-like framing (RFC 1662 byte stuffing). No frame check sequence is
+    added or verified.
+    """
+
+    DELIMITER = b"\x7E"
+
+    def _escape(self, data: Buffer) -> bytes:
+        return bytes(data).replace(b"\x7D", b"\x7D\x5D").replace(b"\x7E", b"\x7D\x5E")
+
+    def _unescape(self, data: bytearray) -> Optional[bytes]:
+        return bytes(data.replace(b"\x7D\x5E", b"\x7E").replace(b"\x7D\x5D", b"\x7D"))
+
+
+class NewlineFraming(_DelimitedFraming):
+    """
+    Newline terminated frames. The frames can't contain newlines and a trailing carriage
+    return is removed.
+    """
+
+    DELIMITER = b"\n"
+    START_DELIMITER = False
+
+    def _escape(self, data: Buffer) -> bytes:
+        data = bytes(data)
+        if b"\n" in data:
+            raise FramingError("Newline framed frame cannot contain newlines")
+        return data
+
+    def _unescape(self, data: bytearray) -> Optional[bytes]:
+        if data.endswith(b"\r"):
+            data = data[:-1]
+        return bytes(data) if data else None
+
+
+FRAMINGS: Dict[str, Type[Framing]] = {
+    "length": LengthPrefixFraming,
+    "kiss": KISSFraming,
+    "hdlc": HDLCFraming,
+    "newline": NewlineFraming,
+}
+
+
+def get_framing(name: str) -> Type[Framing]:
+    """
+    Get framing class by name.
+
+    Raises:
+        ValueError if the framing is unknown.
+    """
+    try:
+        return FRAMINGS[name]
+    except KeyError:
+        raise ValueError(f"Unknown framing {name!r}. Supported framings: {', '.join(FRAMINGS)}") from None
@@ -0,0 +1,175 @@
+"""
+    Compiled formatter pipelines for the packet router routes.
+
+    When a route is created, the source's input formatting and the destination's
+    output formatting are compiled into a single function so that the per-frame
+    work is only what the route actually needs:
+
+    - "passthrough": The received buffer is forwarded as is. Used when the source
+      formatter is a raw decoder and the destination formatter is a raw encoder
+      (e.g. raw_to_json > json_to_raw), or when neither endpoint has a formatter,
+      the received frame is already in the destination's frame format and there's
+      no endpoint metadata to merge.
+    - "raw": The frame is built directly from the received bytes without the
+      intermediate JSON dictionary and hex encoding.
+    - "decode": The received buffer is decoded to a Frame (once per received frame,
+      shared by all the routes of the source) and encoded for the destination.
+
+    Formatters declare their raw capabilities with function attributes:
+    ``raw_decoder = True`` if the formatter only wraps the received bytes as the frame
+    data, and ``raw_encoder = True`` if the formatter only outputs the frame data.
+    The endpoint metadata are merged to the frame only when the destination's encoding
+    uses the metadata.
+"""
+
+import json
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Optional
+
+from porthouse.core.frame import Frame
+from .router_rules import MatchRule
+
+
+__all__ = [
+    "Route",
+    "decode_frame",
+    "formatter_input",
+]
+
+
+def decode_frame(source: Any, raw: Any) -> Optional[Frame]:
+    """
+    Decode a received buffer to a Frame using the source endpoint's formatter.
+    Without a formatter the buffer is parsed as a binary or JSON frame.
+    Formatters always get bytes (or a tuple of bytes for multipart messages), so
+    zero-copy memoryviews are copied here and kept only on the passthrough and raw routes.
+
+    Other top-level fields of a formatter output dictionary (e.g. "vc") are kept
+    in the frame metadata (see Frame.from_dict).
+
+    Returns:
+        The decoded frame or None for an unparseable or a control frame.
+    """
+    if source.formatter:
+        if isinstance(raw, memoryview):
+            raw = bytes(raw)
+        elif isinstance(raw, tuple):
+            raw = tuple(bytes(part) for part in raw)
+        frame = source.formatter(raw)
+    elif Frame.is_binary(raw):
+        frame = Frame.from_bytes(raw)
+    else:
+        frame = json.loads(bytes(raw) if isinstance(raw, memoryview) else raw)
+
+    if isinstance(frame, dict):
+        frame = Frame.from_dict(frame)
+    return frame
+
+
+def formatter_input(frame: Frame) -> Dict[str, Any]:
+    """
+    Create the dictionary given to an output formatter. The metadata fields are also
+    available at the top level (e.g. "vc" for to_skylink) unless they collide with the
+    frame fields, as in the JSON frames received by the formatters before the frames
+    were decoded to Frame objects.
+    """
+    pkt = frame.to_dict()
+    for key, value in frame.metadata.items():
+        pkt.setdefault(key, value)
+    return pkt
+
+
+def _encoder(source: Any, destination: Any) -> Callable[[Frame], Any]:
+    """ Create function encoding a decoded frame for the destination """
+
+    formatter = destination.formatter
+    if formatter is not None and getattr(formatter, "raw_encoder", False):
+        # Only the data is sent so the metadata doesn't matter
+        return lambda frame: bytes(frame.data) if len(frame.data) > 0 else None
+
+    if formatter is not None:
+        encode = lambda frame: formatter(formatter_input(frame))
+    elif destination.frame_format == "binary":
+        encode = Frame.to_bytes
+    else:
+        encode = Frame.to_json
+
+    static_metadata = { **source.metadata, **destination.metadata }
+    if not static_metadata:
+        return encode
+
+    def merge_and_encode(frame: Frame) -> Any:
+        # Merge all metadata field with priority
+        metadata = static_metadata.copy()
+        metadata.update(frame.metadata)
+        return encode(Frame(frame.satellite, frame.source, frame.timestamp, metadata, frame.data))
+    return merge_and_encode
+
+
+class Route:
+    """
+    Route from a source endpoint to a destination endpoint with a compiled pipeline
+    and an optional match rule (see router_rules).
+    """
+
+    def __init__(self, source: Any, destination: Any, match: Optional[Dict[str, Any]] = None):
+        """
+        Args:
+            source: Source endpoint
+            destination: Destination endpoint
+            match: Match rule the frames must satisfy to be routed. None routes all frames.
+
+        Raises:
+            ValueError if the match rule is malformed.
+        """
+        self.source = source
+        self.destination = destination
+        self.rule = MatchRule(match) if match else None
+
+        # Pipeline function and whether it takes the received buffer instead of a decoded frame
+        self.pipeline: Callable[[Any], Any]
+        self.takes_raw: bool
+        self.kind: str
+        self.compile()
+
+
+    def compile(self) -> None:
+        """
+        (Re)compile the route pipeline. Must be called if the endpoints' formatters,
+        frame formats or metadata are changed.
+        """
+        source, destination = self.source, self.destination
+        raw_in = source.formatter is not None and getattr(source.formatter, "raw_decoder", False)
+        raw_out = destination.formatter is not None and getattr(destination.formatter, "raw_encoder", False)
+
+        if raw_in and raw_out:
+            self.kind, self.takes_raw = "passthrough", True
+            self.pipeline = lambda raw: raw if len(raw) > 0 else None
+
+        elif raw_in:
+            encode = _encoder(source, destination)
+            self.kind, self.takes_raw = "raw", True
+            self.pipeline = lambda raw: encode(Frame(None, None, datetime.now(timezone.utc), {}, raw))
+
+        elif source.formatter is None and destination.formatter is None and \
+                not source.metadata and not destination.metadata:
+            # The received frame can be forwarded if it's already in the destination's format
+            self.kind, self.takes_raw = "passthrough", True
+            if destination.frame_format == "binary":
+                self.pipeline = lambda raw: raw if Frame.is_binary(raw) else Frame.from_json(bytes(raw)).to_bytes()
+            else:
+                self.pipeline = lambda raw: Frame.from_bytes(raw).to_json() if Frame.is_binary(raw) else raw
+
+        else:
+            self.kind, self.takes_raw = "decode", False
+            self.pipeline = _encoder(source, destination)
+
+
+    def to_dict(self) -> Dict[str, Any]:
+        """ Return route description as a dictionary """
+        return {
+            "source": self.source.name,
+            "destination": self.destination.name,
+            "pipeline": self.kind,
+            "match": self.rule.match if self.rule is not None else None,
+        }
@@ -0,0 +1,158 @@
+"""
+    Bounded per-destination send queues for the packet router.
+
+    Each destination endpoint gets a FIFO with a single sender task, so the frames are
+    sent in the order they were routed and a slow destination can't grow the memory
+    without limit. When the queue is full, the overflow policy decides whether the
+    router waits for space (block), discards the oldest queued frame (drop-oldest) or
+    discards the new frame (drop-newest).
+"""
+
+import time
+import asyncio
+import logging
+from collections import deque
+from typing import Any, Deque, Dict, Optional, Tuple
+
+from porthouse.core.metrics import Histogram
+
+
+__all__ = [
+    "SendQueue",
+    "OVERFLOW_POLICIES",
+]
+
+OVERFLOW_POLICIES = ("block", "drop-oldest", "drop-newest")
+
+
+class SendQueue:
+    """
+    Bounded FIFO and sender task for a destination endpoint.
+    """
+
+    def __init__(self, endpoint: Any, size: int = 1000, overflow: str = "block",
+                 log: Optional[logging.Logger] = None):
+        """
+        Args:
+            endpoint: Destination endpoint having a send method
+            size: Maximum number of queued frames
+            overflow: Overflow policy: "block", "drop-oldest" or "drop-newest"
+            log: Logger for the send errors
+        """
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown overflow policy {overflow!r}")
+        if size < 1:
+            raise ValueError(f"Queue size must be positive, got {size}")
+
+        self.endpoint = endpoint
+        self.size = size
+        self.overflow = overflow
+        self.log = log or logging.getLogger(__name__)
+
+        self._frames: Deque[Tuple[float, Any]] = deque()
+        self._not_empty = asyncio.Event()
+        self._not_full = asyncio.Event()
+        self._not_full.set()
+        self._task: Optional[asyncio.Task] = None
+
+        self.queued = 0
+        self.sent = 0
+        self.dropped = 0
+        self.errors = 0
+        self.latency = Histogram()
+
+
+    def __len__(self) -> int:
+        return len(self._frames)
+
+
+    def start(self) -> None:
+        """ Start the sender task """
+        if self._task is None:
+            self._task = asyncio.get_event_loop().create_task(self._sender())
+
+
+    def stop(self) -> None:
+        """ Stop the sender task. The queued frames are discarded. """
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        self.dropped += len(self._frames)
+        self._frames.clear()
+        self._not_empty.clear()
+        self._not_full.set()
+
+
+    def put_nowait(self, frame: Any) -> bool:
+        """
+        Queue a frame without waiting. If the queue is full, the overflow policy is applied
+        and with the "block" policy the frame is not queued.
+
+        Returns:
+            True if the frame was queued.
+        """
+        if len(self._frames) >= self.size:
+            if self.overflow == "drop-oldest":
+                self._frames.popleft()
+                self.dropped += 1
+            else:
+                if self.overflow == "drop-newest":
+                    self.dropped += 1
+                return False
+
+        self._frames.append((time.perf_counter(), frame))
+        self.queued += 1
+        self._not_empty.set()
+        if len(self._frames) >= self.size:
+            self._not_full.clear()
+        return True
+
+
+    async def put(self, frame: Any) -> None:
+        """
+        Queue a frame. With the "block" policy waits until there's space in the queue.
+        """
+        while not self.put_nowait(frame):
+            if self.overflow != "block":
+                return
+            await self._not_full.wait()
+
+
+    async def _sender(self) -> None:
+        """ Send the queued frames one by one """
+        while True:
+            if not self._frames:
+                self._not_empty.clear()
+                await self._not_empty.wait()
+                continue
+
+            queued_at, frame = self._frames.popleft()
+            self._not_full.set()
+            try:
+                result = self.endpoint.send(frame)
+                if hasattr(result, "__await__"):
+                    await result
+                self.sent += 1
+                self.latency.observe(time.perf_counter() - queued_at)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                self.errors += 1
+                self.log.error(f"Failed to send frame to {self.endpoint.name!r}", exc_info=True)
+
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Return the queue statistics. The latency is the time from queuing a frame to the
+        completed send in seconds.
+        """
+        return {
+            "depth": len(self._frames),
+            "size": self.size,
+            "overflow": self.overflow,
+            "queued": self.queued,
+            "sent": self.sent,
+            "dropped": self.dropped,
+            "errors": self.errors,
+            "latency": self.latency.to_dict(),
+        }
@@ -0,0 +1,200 @@
+"""
+    Content-based routing rules for the packet router.
+
+    A route can have a match rule which the frame has to satisfy to be routed.
+    The rule is a dictionary from a frame field to a condition. The fields
+    "satellite" and "source" refer to the frame attributes and the other fields
+    to the frame metadata (the "metadata." prefix is optional). A condition is
+
+    - a scalar value: the field must be equal to the value
+    - a list: the field must be equal to one of the values
+    - a dictionary of operators: "in", "not", "min", "max", "regex" and "exists"
+
+    For example ``{"satellite": "foresail1p", "vc": [0, 1], "rssi": {"min": -110}}``.
+
+    The rules of a source endpoint's routes are compiled into a dispatch table. The rules
+    are grouped by their set of exact-match fields and each group is a hash table from
+    the field values to the routes, so a frame is looked up once per group instead of
+    being tested against each rule. Only the operator conditions of the found routes and
+    the routes without exact-match fields are evaluated one by one.
+"""
+
+import re
+import itertools
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from porthouse.core.frame import Frame
+
+
+__all__ = [
+    "MatchRule",
+    "DispatchTable",
+]
+
+FRAME_ATTRIBUTES = ("satellite", "source")
+
+# Placeholder for a missing field value
+_MISSING = object()
+
+
+def _field_getter(field: str) -> Callable[[Frame], Any]:
+    """ Create function returning the field value of a frame """
+    if field in FRAME_ATTRIBUTES:
+        return lambda frame: getattr(frame, field)
+    if field.startswith("metadata."):
+        field = field[len("metadata."):]
+    return lambda frame: frame.metadata.get(field, _MISSING)
+
+
+def _compile_operators(field: str, operators: Dict[str, Any]) -> Callable[[Any], bool]:
+    """ Compile an operator condition to a predicate of the field value """
+    tests = []
+    for op, arg in operators.items():
+        if op == "in":
+            values = frozenset(arg)
+            tests.append(lambda v, values=values: v in values)
+        elif op == "not":
+            values = frozenset(arg if isinstance(arg, (list, tuple)) else [ arg ])
+            tests.append(lambda v, values=values: v not in values)
+        elif op == "min":
+            tests.append(lambda v, arg=arg: v is not _MISSING and v >= arg)
+        elif op == "max":
+            tests.append(lambda v, arg=arg: v is not _MISSING and v <= arg)
+        elif op == "regex":
+            pattern = re.compile(arg)
+            tests.append(lambda v, pattern=pattern: v is not _MISSING and pattern.search(str(v)) is not None)
+        elif op == "exists":
+            tests.append(lambda v, arg=bool(arg): (v is not _MISSING and v is not None) == arg)
+        else:
+            raise ValueError(f"Unknown match operator {op!r} for field {field!r}")
+
+    def predicate(value: Any) -> bool:
+        try:
+            return all(test(value) for test in tests)
+        except TypeError: # Unhashable or incomparable value
+            return False
+    return predicate
+
+
+class MatchRule:
+    """
+    Compiled match rule of a route.
+    """
+
+    def __init__(self, match: Dict[str, Any]):
+        """
+        Args:
+            match: Dictionary from a field name to a condition
+
+        Raises:
+            ValueError if the rule is malformed.
+        """
+        if not isinstance(match, dict):
+            raise ValueError(f"Match rule must be a dictionary, got {match!r}")
+        self.match = match
+
+        # Exact-match fields and the allowed values of each
+        self.keys: Tuple[str, ...] = ()
+        self.values: List[Sequence[Any]] = []
+        self.predicates: List[Tuple[Callable[[Frame], Any], Callable[[Any], bool]]] = []
+
+        keys = []
+        for field, condition in sorted(match.items()):
+            if isinstance(condition, dict) and set(condition) == { "in" }:
+                condition = list(condition["in"])
+
+            if isinstance(condition, dict):
+                self.predicates.append((_field_getter(field), _compile_operators(field, condition)))
+            elif isinstance(condition, (list, tuple)):
+                if not condition:
+                    raise ValueError(f"Empty list of values for field {field!r}")
+                keys.append(field)
+                self.values.append(list(condition))
+            else:
+                keys.append(field)
+                self.values.append([ condition ])
+        self.keys = tuple(keys)
+
+        try:
+            self.values = [ list(dict.fromkeys(values)) for values in self.values ]
+        except TypeError as e:
+            raise ValueError(f"Match values must be hashable: {e}") from None
+
+
+    def key_tuples(self):
+        """ Iterate all the value combinations of the exact-match fields """
+        return itertools.product(*self.values)
+
+
+    def test_predicates(self, frame: Frame) -> bool:
+        """ Test the operator conditions """
+        return all(predicate(getter(frame)) for getter, predicate in self.predicates)
+
+
+    def __call__(self, frame: Frame) -> bool:
+        """ Test the whole rule """
+        for field, values in zip(self.keys, self.values):
+            if _field_getter(field)(frame) not in values:
+                return False
+        return self.test_predicates(frame)
+
+
+class DispatchTable:
+    """
+    Dispatch table selecting the routes of a source endpoint for a frame.
+    """
+
+    def __init__(self, routes: Sequence[Any]):
+        """
+        Args:
+            routes: Routes of the source in routing order. A route's match rule is in its
+                `rule` attribute (MatchRule or None).
+        """
+        self.routes = list(routes)
+        self.conditional = any(route.rule is not None for route in self.routes)
+
+        # Unconditional routes and rules without exact-match fields are tested in order
+        self._ordered: List[Tuple[int, Optional[MatchRule]]] = []
+
+        # Hash tables for each set of exact-match fields: (getters, {value tuple: [route index]})
+        groups: Dict[Tuple[str, ...], Dict[Tuple[Any, ...], List[int]]] = {}
+        for index, route in enumerate(self.routes):
+            rule = route.rule
+            if rule is None or not rule.keys:
+                self._ordered.append((index, rule))
+                continue
+            table = groups.setdefault(rule.keys, {})
+            for key in rule.key_tuples():
+                table.setdefault(key, []).append(index)
+
+        self._groups = [
+            ([ _field_getter(field) for field in keys ], table) for keys, table in groups.items()
+        ]
+
+
+    def __len__(self) -> int:
+        return len(self.routes)
+
+
+    def select(self, frame: Optional[Frame]) -> List[Any]:
+        """
+        Select the routes matching the frame in routing order.
+        """
+        if not self.conditional:
+            return self.routes
+
+        matched = [ index for index, rule in self._ordered
+                    if rule is None or (frame is not None and rule.test_predicates(frame)) ]
+
+        if frame is not None:
+            for getters, table in self._groups:
+                try:
+                    candidates = table.get(tuple(getter(frame) for getter in getters))
+                except TypeError: # Unhashable field value
+                    continue
+                if candidates:
+                    routes = self.routes
+                    matched.extend(i for i in candidates if routes[i].rule.test_predicates(frame))
+
+        matched.sort()
+        return [ self.routes[i] for i in matched ]
@@ -34,7 +34,7 @@ from foresail1p.commanding.pus import Telemetry
 
 
 """
-Connect to packet router JSON input endpoint
+Connect to packet router frame input endpoint
 """
 zmq_ctx = zmq.Context()
 sock = zmq_ctx.socket(zmq.PUB)
@@ -43,15 +43,16 @@ sock.connect("tcp://128.0.0.1:57000")
 
 def submit_frame(timestamp: datetime, telemetry: bytes, metadata: dict) -> None:
     """
-    Submit frame to Packet Router
+    Submit frame to Packet Router in the binary frame format
     """
-    frame = {
-        "timestamp": timestamp.toisoformat(),
-        "data": telemetry.tohex(),
-        "source": "satnogs",
-        "metadata": metadata
-    }
-    sock.send(json.dumps(frame))
+    frame = Frame(
+        satellite=None,
+        source="satnogs",
+        timestamp=timestamp,
+        metadata=metadata,
+        data=telemetry
+    )
+    sock.send(frame.to_bytes())
 
 
 
@@ -0,0 +1,85 @@
+import logging
+import unittest
+from datetime import datetime, timedelta
+
+from porthouse.core import db_tools
+from .database import AsyncPacketsDatabase, PacketsDatabaseError
+
+
+class FakeDatabase:
+    """ Database recording the executed queries and their arguments """
+
+    def __init__(self, value=None):
+        self.value = value
+        self.queries = []
+        self.log = logging.getLogger("test_packets_database")
+
+    async def connect(self):
+        return self
+
+    async def fetch(self, query, *args):
+        self.queries.append((" ".join(query.split()), args))
+        return []
+
+    async def fetchval(self, query, *args):
+        self.queries.append((" ".join(query.split()), args))
+        return self.value
+
+    async def execute(self, query, *args):
+        self.queries.append((" ".join(query.split()), args))
+        if "create_hypertable" in query:
+            raise RuntimeError("extension \"timescaledb\" is not installed")
+        return "OK"
+
+
+class TestAsyncPacketsDatabase(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        url = "postgres://test@localhost/test_packets"
+        self.addCleanup(db_tools._databases.pop, url, None)
+        self.packets = AsyncPacketsDatabase(url)
+        self.packets.db = self.db = FakeDatabase()
+        self.start = datetime(2026, 10, 15, 12, 0, 0)
+        self.end = self.start + timedelta(hours=1)
+
+    async def test_connect(self):
+        with self.assertRaises(PacketsDatabaseError):
+            await self.packets.connect()
+
+        self.db.value = True
+        with self.assertLogs(self.db.log, "WARNING") as logs:
+            await self.packets.connect(create_tables=True)
+        self.assertIn("Failed to create hypertable", logs.output[0])
+
+    async def test_query(self):
+        await self.packets.query("Foresail-1")
+        self.assertEqual(self.db.queries[-1], (
+            "SELECT timestamp, type, source, data FROM packets WHERE satellite = $1 "
+            "ORDER BY timestamp ASC LIMIT $2;", ("Foresail-1", 50)))
+
+        await self.packets.query("Foresail-1", packet_type="tm", source="uhf", start_date=self.start,
+                                 end_date=self.end.isoformat(), with_id=True, with_metadata=True, limit="10")
+        self.assertEqual(self.db.queries[-1], (
+            "SELECT timestamp, type, source, data, metadata, id FROM packets "
+            "WHERE satellite = $1 AND type = $2 AND source = $3 AND timestamp <= $4 AND timestamp >= $5 "
+            "ORDER BY timestamp ASC LIMIT $6;",
+            ("Foresail-1", "tm", "uhf", self.end, self.start, 10)))
+
+    async def test_store_packet(self):
+        self.db.value = 42
+        packet_id = await self.packets.store_packet("uhf", "Foresail-1", "tm", memoryview(b"\x01\x02"),
+                                                    timestamp=self.start.isoformat() + "Z",
+                                                    metadata='{"rssi": -100}', vc=1)
+        self.assertEqual(packet_id, 42)
+        query, args = self.db.queries[-1]
+        self.assertEqual(query, "INSERT INTO packets(satellite, source, timestamp, type, data, metadata) "
+                                "VALUES ($1, $2, $3, $4, $5, $6) RETURNING id;")
+        self.assertEqual(args, ("Foresail-1", "uhf", self.start, "tm", b"\x01\x02", { "rssi": -100, "vc": 1 }))
+
+        self.db.value = None
+        with self.assertRaises(PacketsDatabaseError):
+            await self.packets.store_packet("uhf", "Foresail-1", "tm", b"")
+
+
+if __name__ == '__main__':
+    unittest.main()
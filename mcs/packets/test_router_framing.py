@@ -0,0 +1,81 @@
+import random
+import asyncio
+import logging
+import unittest
+from types import SimpleNamespace
+
+from porthouse.mcs.packets.router_framing import FRAMINGS, FramingError, LengthPrefixFraming
+from porthouse.mcs.packets.router_endpoints import TCPEndpoint
+
+
+def random_frames(rnd, count, newlines=True):
+    special = b"\xC0\xDB\xDC\xDD\x7E\x7D\x5E\x5D\r" + (b"\n" if newlines else b"")
+    alphabet = special + bytes(range(32, 127))
+    return [ bytes(rnd.choice(alphabet) for _ in range(rnd.randint(1, 300))).lstrip(b"\r").rstrip(b"\r") or b"x"
+             for _ in range(count) ]
+
+
+class TestFraming(unittest.TestCase):
+
+    def test_roundtrip(self):
+        rnd = random.Random(1)
+        for name, framing_class in FRAMINGS.items():
+            frames = random_frames(rnd, 200, newlines=name != "newline")
+            stream = b"".join(b"".join(framing_class().encode(frame)) for frame in frames)
+
+            # Feed the stream in random sized chunks
+            parser, received, pos = framing_class(), [], 0
+            while pos < len(stream):
+                chunk = rnd.randint(1, 700)
+                received.extend(parser.feed(memoryview(stream)[pos:pos + chunk]))
+                pos += chunk
+            self.assertEqual(received, frames, name)
+
+    def test_errors(self):
+        with self.assertRaises(FramingError):
+            LengthPrefixFraming(max_frame_size=100).feed(b"\x00\x01\x00\x00")
+        with self.assertRaises(FramingError):
+            FRAMINGS["newline"]().encode(b"a\nb")
+        self.assertEqual(FRAMINGS["kiss"]().feed(b"\xC0\x01abc\xC0\xC0\x00abc\xC0"), [b"abc"])
+
+
+class TestTCPEndpoint(unittest.IsolatedAsyncioTestCase):
+
+    def make_endpoint(self, name, received, **kwargs):
+        async def route_frames(source, frames):
+            received.extend(frames)
+        m = SimpleNamespace(log=logging.getLogger(name), metrics=None, route_frames=route_frames)
+        endpoint = TCPEndpoint(m, **kwargs)
+        endpoint.name = name
+        return endpoint
+
+    async def test_loopback(self):
+        for framing in FRAMINGS:
+            server_received, client_received = [], [ [] for _ in range(3) ]
+            server = self.make_endpoint("server", server_received, bind="127.0.0.1:0", framing=framing)
+            await server.connect()
+            port = server._server.sockets[0].getsockname()[1]
+            clients = [ self.make_endpoint(f"client{i}", client_received[i], connect=f"127.0.0.1:{port}",
+                                           framing=framing) for i in range(3) ]
+            for client in clients:
+                await client.connect()
+            while len(server._connections) < len(clients) or any(not c._connections for c in clients):
+                await asyncio.sleep(0.01)
+
+            frames = random_frames(random.Random(2), 100, newlines=False)
+            for frame in frames:
+                await server.send(frame)
+                await clients[0].send(frame)
+            while any(len(r) < len(frames) for r in client_received) or len(server_received) < len(frames):
+                await asyncio.sleep(0.01)
+
+            self.assertEqual(server_received, frames, framing)
+            for received in client_received:
+                self.assertEqual(received, frames, framing)
+            for client in clients:
+                await client.disconnect()
+            await server.disconnect()
+
+
+if __name__ == '__main__':
+    unittest.main()
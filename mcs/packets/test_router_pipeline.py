@@ -0,0 +1,154 @@
+import json
+import asyncio
+import logging
+import unittest
+
+from porthouse.core.frame import Frame
+from porthouse.mcs.packets.packet_router import PacketRouter
+
+
+FORMATTERS = "porthouse.mcs.packets."
+
+
+class InputEndpoint:
+    type_identifier = "test-in"
+
+    def __init__(self, m, **kwargs):
+        self.m = m
+
+
+class OutputEndpoint:
+    type_identifier = "test-out"
+
+    def __init__(self, m, **kwargs):
+        self.m = m
+        self.sent = []
+
+    def send(self, pkt):
+        self.sent.append(pkt)
+
+
+class BlockedEndpoint(OutputEndpoint):
+    type_identifier = "test-blocked"
+
+    def __init__(self, m, **kwargs):
+        super().__init__(m, **kwargs)
+        self.gate = asyncio.Event()
+
+    async def send(self, pkt):
+        await self.gate.wait()
+        self.sent.append(pkt)
+
+
+class TestRoutePipelines(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        # Skip the AMQP connection of the module __init__
+        self.router = PacketRouter.__new__(PacketRouter)
+        self.router.log = logging.getLogger("test_router_pipeline")
+        self.router.endpoint_factors = { "in": InputEndpoint, "out": OutputEndpoint, "blocked": BlockedEndpoint }
+        self.router.endpoints = { }
+
+    async def route(self, source_params, destination_params, frames):
+        """ Route frames through a single route and return the route kind and the sent frames """
+        await self.router.load_endpoints([
+            { "name": "a", "type": "in", **source_params },
+            { "name": "b", "type": "out", **destination_params },
+        ], [ "a > b" ])
+        a, b = self.router.endpoints["a"], self.router.endpoints["b"]
+        await self.router.route_frames(a, frames)
+        while len(b.queue):
+            await asyncio.sleep(0.001)
+        await asyncio.sleep(0.001)
+        return a.links["b"].kind, b.sent
+
+    async def test_raw_passthrough(self):
+        kind, sent = await self.route({ "formatter": FORMATTERS + "router_formatter_raw.raw_to_json" },
+                                      { "formatter": FORMATTERS + "router_formatter_raw.json_to_raw" },
+                                      [ b"\x01\x02", b"", memoryview(b"\x03") ])
+        self.assertEqual(kind, "passthrough")
+        self.assertEqual([ bytes(pkt) for pkt in sent ], [ b"\x01\x02", b"\x03" ])
+
+    async def test_frame_passthrough(self):
+        frame = Frame("sat", "gs", None, { "rssi": -100 }, b"\xaa\xbb")
+        kind, sent = await self.route({ }, { "frame_format": "binary" }, [ frame.to_bytes(), frame.to_json() ])
+        self.assertEqual(kind, "passthrough")
+        self.assertEqual([ Frame.from_bytes(pkt) for pkt in sent ], [ frame, frame ])
+
+    async def test_raw(self):
+        kind, sent = await self.route({ "formatter": FORMATTERS + "router_formatter_raw.raw_to_json",
+                                        "metadata": { "station": "oh2ags" } },
+                                      { }, [ b"\xaa\xbb" ])
+        self.assertEqual(kind, "raw")
+        frame = Frame.from_json(sent[0])
+        self.assertEqual(frame.data, b"\xaa\xbb")
+        self.assertEqual(frame.metadata, { "station": "oh2ags" })
+
+    async def test_decode_to_skylink(self):
+        kind, sent = await self.route({ }, { "formatter": FORMATTERS + "router_formatter_skylink.to_skylink" },
+                                      [ json.dumps({ "vc": 2, "data": "aabb" }).encode() ])
+        self.assertEqual(kind, "decode")
+        self.assertEqual(sent, [ b"\x02\xaa\xbb" ])
+
+    async def test_decode_from_skylink(self):
+        kind, sent = await self.route({ "formatter": FORMATTERS + "router_formatter_skylink.from_skylink" },
+                                      { "metadata": { "satellite_id": 1 } }, [ b"\x05\xaa\xbb" ])
+        self.assertEqual(kind, "decode")
+        frame = Frame.from_json(sent[0])
+        self.assertEqual(frame.data, b"\xaa\xbb")
+        self.assertEqual(frame.metadata, { "vc": 1, "type": "downlink", "satellite_id": 1 })
+
+    async def test_formatter_gets_bytes(self):
+        # Zero-copy receivers pass memoryviews which must be copied for the formatters
+        kind, sent = await self.route({ "formatter": FORMATTERS + "router_formatter_skylink.from_skylink" },
+                                      { }, [ memoryview(b"\x11key=1"), memoryview(b"\x04\xaa") ])
+        self.assertEqual(kind, "decode")
+        self.assertEqual([ Frame.from_json(pkt).metadata for pkt in sent ],
+                         [ { "type": "control", "rsp": "config", "val": "key=1" }, { "type": "downlink", "vc": 0 } ])
+
+    async def test_blocked_destination(self):
+        await self.router.load_endpoints([
+            { "name": "a", "type": "in" },
+            { "name": "slow", "type": "blocked", "queue_size": 1 },
+            { "name": "fast", "type": "out" },
+        ], [ "a > slow", "a > fast" ])
+        a, slow, fast = (self.router.endpoints[name] for name in ("a", "slow", "fast"))
+        frames = [ Frame("sat", "gs", None, { "n": i }, b"").to_json() for i in range(4) ]
+
+        # The full queue of the first destination doesn't delay the frame to the second one
+        routing = asyncio.get_running_loop().create_task(self.router.route_frames(a, frames))
+        await asyncio.sleep(0.01)
+        self.assertFalse(routing.done())
+        self.assertEqual(len(fast.sent), 3)
+        self.assertEqual(slow.sent, [])
+
+        slow.gate.set()
+        await routing
+        while len(slow.queue) or len(fast.queue):
+            await asyncio.sleep(0.001)
+        await asyncio.sleep(0.001)
+        self.assertEqual(slow.sent, frames)
+        self.assertEqual(fast.sent, frames)
+        self.assertEqual(slow.queue.dropped, 0)
+
+    async def test_undecodable_frame(self):
+        await self.router.load_endpoints([
+            { "name": "a", "type": "in" },
+            { "name": "all", "type": "out" },
+            { "name": "matched", "type": "out", "metadata": { "station": "oh2ags" } },
+        ], [ "a > all", { "route": "a > matched", "match": { "satellite": "sat" } } ])
+        a, everything, matched = (self.router.endpoints[name] for name in ("a", "all", "matched"))
+        frame = Frame("sat", "gs", None, { }, b"\xaa").to_json()
+
+        # The frame which can't be decoded for the match rules is still passed through the unconditional route
+        with self.assertLogs(self.router.log, "ERROR"):
+            await self.router.route_frames(a, [ b"not json", frame ])
+        while len(everything.queue) or len(matched.queue):
+            await asyncio.sleep(0.001)
+        await asyncio.sleep(0.001)
+        self.assertEqual(everything.sent, [ b"not json", frame ])
+        self.assertEqual([ Frame.from_json(pkt).metadata for pkt in matched.sent ], [ { "station": "oh2ags" } ])
+
+
+if __name__ == '__main__':
+    unittest.main()
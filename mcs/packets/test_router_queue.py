@@ -0,0 +1,63 @@
+import asyncio
+import unittest
+
+from porthouse.mcs.packets.router_queue import SendQueue
+
+
+class SlowEndpoint:
+    name = "slow"
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.sent = []
+
+    async def send(self, frame):
+        await asyncio.sleep(self.delay)
+        self.sent.append(frame)
+
+
+class TestSendQueue(unittest.IsolatedAsyncioTestCase):
+
+    async def test_order(self):
+        endpoint = SlowEndpoint()
+        queue = SendQueue(endpoint, size=4)
+        queue.start()
+        for i in range(20):
+            await queue.put(i)
+        while len(endpoint.sent) < 20:
+            await asyncio.sleep(0.001)
+        queue.stop()
+        self.assertEqual(endpoint.sent, list(range(20)))
+        self.assertEqual(queue.stats()["dropped"], 0)
+        self.assertEqual(queue.stats()["latency"]["count"], 20)
+
+    async def test_drop_policies(self):
+        for overflow, expected in (("drop-oldest", [6, 7, 8, 9]), ("drop-newest", [0, 1, 2, 3])):
+            endpoint = SlowEndpoint()
+            queue = SendQueue(endpoint, size=4, overflow=overflow)
+            for i in range(10):
+                await queue.put(i)
+            self.assertEqual(len(queue), 4)
+            self.assertEqual(queue.dropped, 6)
+            queue.start()
+            while len(endpoint.sent) < 4:
+                await asyncio.sleep(0.001)
+            queue.stop()
+            self.assertEqual(endpoint.sent, expected)
+
+    async def test_block(self):
+        endpoint = SlowEndpoint(delay=0.01)
+        queue = SendQueue(endpoint, size=2, overflow="block")
+        for i in range(2):
+            await queue.put(i)
+        put = asyncio.ensure_future(queue.put(2))
+        await asyncio.sleep(0.005)
+        self.assertFalse(put.done())
+        queue.start()
+        await asyncio.wait_for(put, 1.0)
+        self.assertLessEqual(len(queue), 2)
+        queue.stop()
+
+
+if __name__ == '__main__':
+    unittest.main()
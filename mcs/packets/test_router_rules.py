@@ -0,0 +1,57 @@
+import random
+import unittest
+from types import SimpleNamespace
+
+from porthouse.core.frame import Frame
+from porthouse.mcs.packets.router_rules import DispatchTable, MatchRule
+
+
+SATELLITES = ["foresail1p", "suomi100", "aalto1"]
+
+
+def random_match(rnd):
+    match = {}
+    if rnd.random() < 0.7:
+        match["satellite"] = rnd.choice(SATELLITES)
+    if rnd.random() < 0.5:
+        match["vc"] = rnd.choice([rnd.randint(0, 3), rnd.sample(range(4), 2)])
+    if rnd.random() < 0.3:
+        match["metadata.rssi"] = {"min": rnd.randint(-120, -90)}
+    if rnd.random() < 0.2:
+        match["type"] = {"not": "control"}
+    return match
+
+
+def random_frame(rnd):
+    metadata = {"vc": rnd.randint(0, 3), "rssi": rnd.randint(-130, -80), "type": rnd.choice(["downlink", "control"])}
+    if rnd.random() < 0.2:
+        del metadata["vc"]
+    return Frame(rnd.choice(SATELLITES), "gs", None, metadata, b"")
+
+
+class TestDispatchTable(unittest.TestCase):
+
+    def test_select(self):
+        rnd = random.Random(1)
+        routes = [ SimpleNamespace(name=i, rule=MatchRule(random_match(rnd)) if i % 5 else None)
+                   for i in range(200) ]
+        table = DispatchTable(routes)
+        for _ in range(500):
+            frame = random_frame(rnd)
+            expected = [ route for route in routes if route.rule is None or route.rule(frame) ]
+            self.assertEqual(table.select(frame), expected)
+
+    def test_unconditional(self):
+        routes = [ SimpleNamespace(rule=None) for _ in range(3) ]
+        table = DispatchTable(routes)
+        self.assertFalse(table.conditional)
+        self.assertEqual(table.select(None), routes)
+
+    def test_malformed(self):
+        for match in ({"vc": {"between": 1}}, {"vc": []}, {"vc": [[1]]}, ["vc"]):
+            with self.assertRaises(ValueError):
+                MatchRule(match)
+
+
+if __name__ == '__main__':
+    unittest.main()
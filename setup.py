@@ -45,6 +45,10 @@ setuptools.setup(
         "skyfield",
         "sortedcontainers",
     ],
+    extras_require={
+        "msgpack": ["msgpack"],
+        "db": ["asyncpg"],
+    },
     classifiers=[
         "Programming Language :: Python :: 3",
         "License :: OSI Approved :: GPLv3 License",
@@ -0,0 +1,188 @@
+import json
+import logging
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+from porthouse.launcher import Launcher, LaunchUnit, ModuleValidationError, process_memory, format_memory
+
+
+preload_calls = []
+
+def preload_call():
+    preload_calls.append(True)
+
+
+class FakeProcess:
+    def __init__(self):
+        self.alive = True
+        self.exitcode = None
+        self.pid = -1
+
+    def is_alive(self):
+        return self.alive
+
+    def kill(self, exitcode=1):
+        self.alive, self.exitcode = False, exitcode
+
+
+class TestLauncher(unittest.TestCase):
+
+    def setUp(self):
+        # Skip the broker connection and the configuration file of the __init__
+        self.launcher = Launcher.__new__(Launcher)
+        self.launcher.log = logging.getLogger("test_launcher")
+        self.launcher.log.addHandler(logging.NullHandler())
+        self.launcher.units = {}
+        self.launcher.globals = {}
+        self.launcher.prefix = None
+        self.launcher.debug = False
+        self.launcher.threads = []
+        self.launcher.heartbeat_channel = None
+
+        self.now = 0.0
+        self.started = []
+        def start_unit(unit):
+            unit.process = FakeProcess()
+            unit.started_at = self.now
+            self.started.append((self.now, unit.name))
+        self.launcher.start_unit = start_unit
+
+    def run_launcher(self, steps):
+        """ Run the launcher's wait loop with the given actions executed on each 0.5 s heartbeat poll """
+        steps = iter(steps)
+        def poll_heartbeats(timeout):
+            self.now += timeout
+            try:
+                action = next(steps)
+            except StopIteration:
+                raise KeyboardInterrupt()
+            if action is not None:
+                action()
+        self.launcher.poll_heartbeats = poll_heartbeats
+        with mock.patch("porthouse.launcher.time", SimpleNamespace(monotonic=lambda: self.now)):
+            self.launcher.wait()
+
+    def heartbeat(self, module, ready=True, prefix=None):
+        return lambda: self.launcher.heartbeat_callback(SimpleNamespace(
+            properties={ "content_type": "application/json" },
+            body=json.dumps({ "module": module, "prefix": prefix, "ready": ready }).encode()))
+
+    def test_dependencies(self):
+        self.launcher.setup_modules([
+            { "module": "porthouse.gs.tracking.tle_server.TLEServer" },
+            { "module": "porthouse.gs.scheduler.scheduler.Scheduler", "depends": [ "TLEServer" ] },
+            { "name": "uhf", "module": "porthouse.gs.hardware.rotator.Rotator", "group": "hardware",
+              "depends": [ "porthouse.gs.scheduler.scheduler.Scheduler" ] },
+            { "name": "vhf", "module": "porthouse.gs.hardware.rotator.Rotator", "group": "hardware",
+              "depends": [ "uhf" ] },
+        ])
+        units = self.launcher.units
+        self.assertEqual(set(units), { "porthouse.gs.tracking.tle_server.TLEServer",
+                                       "porthouse.gs.scheduler.scheduler.Scheduler", "hardware" })
+        self.assertEqual(units["hardware"].members, [ "uhf", "vhf" ])
+        self.assertTrue(units["hardware"].group)
+        # Dependencies inside a group are ignored
+        self.assertEqual(units["hardware"].depends, { "porthouse.gs.scheduler.scheduler.Scheduler" })
+
+        self.run_launcher([ None, self.heartbeat("TLEServer"), None, self.heartbeat("Scheduler"), None ])
+        self.assertEqual(self.started, [
+            (0.5, "porthouse.gs.tracking.tle_server.TLEServer"),
+            (1.0, "porthouse.gs.scheduler.scheduler.Scheduler"),
+            (2.0, "hardware"),
+        ])
+
+    def test_readiness(self):
+        self.launcher.setup_modules([
+            { "name": "exec", "module": "porthouse.mcs.exec.Exec", "readiness": "process" },
+            { "name": "slow", "module": "porthouse.gs.tracking.tle_server.TLEServer", "ready_timeout": 2 },
+            { "name": "a", "module": "porthouse.gs.scheduler.scheduler.Scheduler", "depends": [ "exec" ] },
+            { "name": "b", "module": "porthouse.gs.hardware.rotator.Rotator", "depends": [ "slow" ] },
+        ])
+        self.run_launcher([ None ] * 6)
+        self.assertEqual(self.started, [ (0.5, "exec"), (0.5, "slow"), (1.0, "a"), (3.0, "b") ])
+
+    def test_validation(self):
+        with self.assertRaisesRegex(ModuleValidationError, "unknown module"):
+            self.launcher.setup_modules([
+                { "module": "porthouse.gs.scheduler.scheduler.Scheduler", "depends": [ "Nonexistent" ] } ])
+
+        self.launcher.units = {}
+        with self.assertRaisesRegex(ModuleValidationError, "Circular module dependency"):
+            self.launcher.setup_modules([
+                { "name": "a", "module": "porthouse.x.A", "depends": [ "c" ] },
+                { "name": "b", "module": "porthouse.x.B", "depends": [ "a" ] },
+                { "name": "c", "module": "porthouse.x.C", "depends": [ "b" ] },
+            ])
+
+        self.launcher.units = {}
+        with self.assertRaisesRegex(ModuleValidationError, "Duplicate module name"):
+            self.launcher.setup_modules([ { "module": "porthouse.x.A" }, { "module": "porthouse.x.A" } ])
+
+        self.launcher.units = {}
+        with self.assertRaisesRegex(ModuleValidationError, "Unknown readiness"):
+            self.launcher.setup_modules([ { "module": "porthouse.x.A", "readiness": "never" } ])
+
+    def test_restart_backoff(self):
+        self.launcher.setup_modules([ { "name": "a", "module": "porthouse.x.A", "readiness": "process" } ])
+        unit = self.launcher.units["a"]
+        kill = lambda: unit.process.kill()
+
+        # Crashes right after the starts: restarted after 1, 2 and 4 seconds
+        self.run_launcher([ None, kill, None, None, kill, None, None, None, None, kill ] + [ None ] * 9)
+        self.assertEqual([ t for t, _ in self.started ], [ 0.5, 2.0, 4.5, 9.0 ])
+        self.assertEqual(unit.restarts, 3)
+        self.assertEqual(unit.backoff, 8.0)
+
+        # The backoff is reset after running longer than the maximum backoff
+        self.now += LaunchUnit.MAX_BACKOFF
+        killed_at = self.now + 0.5
+        self.run_launcher([ kill ] + [ None ] * 3)
+        self.assertEqual(self.started[-1][0], killed_at + LaunchUnit.MIN_BACKOFF)
+        self.assertEqual(unit.backoff, 2.0)
+
+    def test_no_restart(self):
+        self.launcher.setup_modules([ { "module": "porthouse.x.A", "restart": False } ])
+        unit = self.launcher.units["porthouse.x.A"]
+        polls = []
+        self.run_launcher([ None, lambda: unit.process.kill() ] + [ lambda: polls.append(1) ] * 5)
+        self.assertEqual(len(self.started), 1)
+        self.assertEqual(polls, [])
+
+
+class TestPreload(unittest.TestCase):
+
+    def test_resolve_attribute(self):
+        import os.path
+        self.assertIs(Launcher.resolve_attribute("os.path.join"), os.path.join)
+        self.assertEqual(Launcher.resolve_attribute("porthouse.launcher.LaunchUnit.MIN_BACKOFF"), LaunchUnit.MIN_BACKOFF)
+        with self.assertRaises(AttributeError):
+            Launcher.resolve_attribute("os.path.nonexistent")
+        with self.assertRaises(ImportError):
+            Launcher.resolve_attribute("nonexistent_package.attribute")
+
+    def test_preload(self):
+        launcher = Launcher.__new__(Launcher)
+        launcher.log = logging.getLogger("test_preload")
+        launcher.threads = []
+        with self.assertLogs(launcher.log) as logs:
+            launcher.preload({
+                "modules": [ "json", "nonexistent_package" ],
+                "calls": [ "porthouse.test_launcher.preload_call", "os.path.nonexistent" ],
+            })
+        self.assertEqual(launcher.mp_context.get_start_method(), "fork")
+        self.assertEqual(preload_calls, [ True ])
+        self.assertEqual(sum("WARNING" in line for line in logs.output), 2)
+        self.assertIn("Preloaded 1 modules", logs.output[-1])
+
+    def test_process_memory(self):
+        usage = process_memory()
+        if usage: # Not available on every platform
+            self.assertGreater(usage["rss"], 0)
+            self.assertIn("RSS", format_memory(usage))
+        self.assertEqual(process_memory(-1), {})
+        self.assertEqual(format_memory({}), "memory usage not available")
+
+
+if __name__ == '__main__':
+    unittest.main()